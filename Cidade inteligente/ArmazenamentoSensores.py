@@ -0,0 +1,804 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+# Timestamps são guardados como inteiros de microssegundos (hora local, sem fuso)
+# para que a conversão ida e volta com o ISO enviado pelos sensores seja exata
+EPOCA = datetime(1970, 1, 1)
+UM_MICROSSEGUNDO = timedelta(microseconds=1)
+
+def iso_para_us(timestamp_iso):
+    """Converte timestamp ISO (formato dos sensores) em microssegundos desde a época"""
+    dt = datetime.fromisoformat(timestamp_iso)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return (dt - EPOCA) // UM_MICROSSEGUNDO
+
+def us_para_iso(microssegundos):
+    return (EPOCA + timedelta(microseconds=microssegundos)).isoformat()
+
+def agora_us():
+    return (datetime.now() - EPOCA) // UM_MICROSSEGUNDO
+
+# ================================
+# BUFFER CIRCULAR COLUNAR
+# ================================
+class BufferCircularSensor:
+    """Buffer circular de capacidade fixa com um array pré-alocado por campo.
+
+    - campos numéricos (valor, co2, pm25, pm10) ficam em array('d')
+    - campos categóricos (sensor_id, qualidade, localizacao...) são internados
+      em um vocabulário e guardados como índices em array('i')
+    - campos fixos (ex.: tipo) são iguais para todas as leituras e não ocupam memória
+
+    Escrita é O(1) e a memória não cresce com o número de leituras recebidas.
+    """
+    def __init__(self, capacidade, campos_numericos, campos_categoricos, campos_fixos=None):
+        if capacidade <= 0:
+            raise ValueError("capacidade deve ser positiva")
+        self.capacidade = capacidade
+        self.campos_fixos = dict(campos_fixos or {})
+        self.timestamps = array('q', bytes(8 * capacidade))
+        self.numericos = {campo: array('d', bytes(8 * capacidade)) for campo in campos_numericos}
+        self.categoricos = {campo: array('i', bytes(4 * capacidade)) for campo in campos_categoricos}
+        # Vocabulário por campo categórico: lista de valores + índice reverso (0 = ausente)
+        self._vocabulario = {campo: ([None], {None: 0}) for campo in campos_categoricos}
+        self.proximo = 0  # posição da próxima escrita
+        self.tamanho = 0  # leituras válidas no buffer (<= capacidade)
+        self.total = 0    # leituras recebidas desde o início
+        self._lock = threading.Lock()
+
+    def _internar(self, campo, valor):
+        valores, indice = self._vocabulario[campo]
+        codigo = indice.get(valor)
+        if codigo is None:
+            codigo = len(valores)
+            valores.append(valor)
+            indice[valor] = codigo
+        return codigo
+
+    def adicionar(self, leitura, timestamp_us=None):
+        """Adiciona uma leitura (dict no formato publicado pelos sensores) em O(1)"""
+        if timestamp_us is None:
+            timestamp = leitura.get('timestamp')
+            timestamp_us = iso_para_us(timestamp) if timestamp else agora_us()
+
+        with self._lock:
+            posicao = self.proximo
+            self.timestamps[posicao] = timestamp_us
+            for campo, coluna in self.numericos.items():
+                valor = leitura.get(campo)
+                coluna[posicao] = float(valor) if valor is not None else math.nan
+            for campo, coluna in self.categoricos.items():
+                coluna[posicao] = self._internar(campo, leitura.get(campo))
+
+            self.proximo = (posicao + 1) % self.capacidade
+            if self.tamanho < self.capacidade:
+                self.tamanho += 1
+            self.total += 1
+
+    def __len__(self):
+        return self.tamanho
+
+    def _intervalos(self, n):
+        """Intervalos [inicio, fim) das últimas n leituras, em ordem cronológica (no máximo 2)"""
+        n = min(n, self.tamanho)
+        if n <= 0:
+            return []
+        inicio = self.proximo - n
+        if inicio >= 0:
+            return [(inicio, self.proximo)]
+        return [(inicio + self.capacidade, self.capacidade), (0, self.proximo)]
+
+    def janela(self, n):
+        """Visões sem cópia (memoryview) das últimas n leituras, por campo.
+
+        Cada campo mapeia para 1 ou 2 segmentos em ordem cronológica (2 quando a
+        janela atravessa o fim do buffer). As visões apontam para o buffer vivo:
+        quem precisar de estabilidade após novas escritas deve copiá-las.
+        """
+        with self._lock:
+            intervalos = self._intervalos(n)
+        colunas = {'timestamp': self.timestamps, **self.numericos, **self.categoricos}
+        return {
+            campo: [memoryview(coluna)[inicio:fim] for inicio, fim in intervalos]
+            for campo, coluna in colunas.items()
+        }
+
+    def vocabulario(self, campo):
+        """Valores do campo categórico indexados pelo código guardado nas colunas (0 = ausente)"""
+        with self._lock:
+            return list(self._vocabulario[campo][0])
+
+    def _leitura(self, posicao):
+        leitura = dict(self.campos_fixos)
+        leitura['timestamp'] = us_para_iso(self.timestamps[posicao])
+        for campo, coluna in self.numericos.items():
+            valor = coluna[posicao]
+            if not math.isnan(valor):
+                leitura[campo] = valor
+        for campo, coluna in self.categoricos.items():
+            valor = self._vocabulario[campo][0][coluna[posicao]]
+            if valor is not None:
+                leitura[campo] = valor
+        return leitura
+
+    def ultimos(self, n):
+        """Materializa as últimas n leituras como dicts (ordem cronológica) para a API"""
+        with self._lock:
+            return [
+                self._leitura(posicao)
+                for inicio, fim in self._intervalos(n)
+                for posicao in range(inicio, fim)
+            ]
+
+    def ultimo(self):
+        """Última leitura como dict, ou None se o buffer estiver vazio"""
+        with self._lock:
+            if not self.tamanho:
+                return None
+            return self._leitura((self.proximo - 1) % self.capacidade)
+
+# ================================
+# AGREGADOS MULTI-RESOLUÇÃO (ROLLUPS)
+# ================================
+# (nome, segundos por balde, baldes retidos): 1h em 1s, 1 dia em 1m, 30 dias em 1h
+RESOLUCOES_PADRAO = [('1s', 1, 3600), ('1m', 60, 1440), ('1h', 3600, 720)]
+
+class SerieAgregada:
+    """Baldes de tempo de tamanho fixo (anel) com count/min/max/soma/último por métrica"""
+    def __init__(self, segundos, retencao, metricas):
+        self.segundos = segundos
+        self.retencao = retencao
+        self.largura_us = segundos * 1_000_000
+        # Índice absoluto do balde guardado em cada posição (-1 = vazio)
+        self.baldes = array('q', [-1]) * retencao
+        self.colunas = {
+            metrica: {
+                'count': array('q', bytes(8 * retencao)),
+                'min': array('d', bytes(8 * retencao)),
+                'max': array('d', bytes(8 * retencao)),
+                'soma': array('d', bytes(8 * retencao)),
+                'ultimo': array('d', bytes(8 * retencao))
+            }
+            for metrica in metricas
+        }
+        self.balde_mais_recente = -1
+        self._lock = threading.Lock()
+
+    def adicionar(self, timestamp_us, valores):
+        balde = timestamp_us // self.largura_us
+        if balde <= self.balde_mais_recente - self.retencao:
+            return  # mais antigo que a retenção desta resolução
+        posicao = balde % self.retencao
+
+        with self._lock:
+            if self.baldes[posicao] != balde:
+                # Reaproveita a posição de um balde que saiu da janela
+                self.baldes[posicao] = balde
+                for colunas in self.colunas.values():
+                    colunas['count'][posicao] = 0
+            if balde > self.balde_mais_recente:
+                self.balde_mais_recente = balde
+
+            for metrica, valor in valores.items():
+                colunas = self.colunas[metrica]
+                if colunas['count'][posicao] == 0:
+                    colunas['min'][posicao] = valor
+                    colunas['max'][posicao] = valor
+                    colunas['soma'][posicao] = 0.0
+                else:
+                    if valor < colunas['min'][posicao]:
+                        colunas['min'][posicao] = valor
+                    if valor > colunas['max'][posicao]:
+                        colunas['max'][posicao] = valor
+                colunas['count'][posicao] += 1
+                colunas['soma'][posicao] += valor
+                colunas['ultimo'][posicao] = valor
+
+    def consultar(self, metrica, inicio_us, fim_us):
+        """Pontos (um por balde preenchido) no intervalo [inicio_us, fim_us]"""
+        colunas = self.colunas[metrica]
+        primeiro = max(inicio_us // self.largura_us, self.balde_mais_recente - self.retencao + 1)
+        ultimo = min(fim_us // self.largura_us, self.balde_mais_recente)
+        pontos = []
+        with self._lock:
+            for balde in range(primeiro, ultimo + 1):
+                posicao = balde % self.retencao
+                count = colunas['count'][posicao]
+                if self.baldes[posicao] != balde or count == 0:
+                    continue
+                pontos.append({
+                    'inicio': us_para_iso(balde * self.largura_us),
+                    'count': count,
+                    'min': colunas['min'][posicao],
+                    'max': colunas['max'][posicao],
+                    'media': round(colunas['soma'][posicao] / count, 3),
+                    'ultimo': colunas['ultimo'][posicao]
+                })
+        return pontos
+
+class AgregadorMultiResolucao:
+    """Mantém rollups incrementais de várias métricas em várias resoluções"""
+    def __init__(self, metricas, resolucoes=None):
+        self.metricas = list(metricas)
+        self.series = {
+            nome: SerieAgregada(segundos, retencao, self.metricas)
+            for nome, segundos, retencao in (resolucoes or RESOLUCOES_PADRAO)
+        }
+
+    def adicionar(self, timestamp_us, valores):
+        for serie in self.series.values():
+            serie.adicionar(timestamp_us, valores)
+
+    def escolher_resolucao(self, inicio_us, fim_us, max_pontos=500):
+        """Resolução mais fina que cobre o intervalo sem passar de max_pontos baldes"""
+        duracao_s = max(0, fim_us - inicio_us) / 1_000_000
+        candidatas = sorted(self.series.items(), key=lambda item: item[1].segundos)
+        for nome, serie in candidatas:
+            if duracao_s / serie.segundos <= max_pontos and duracao_s <= serie.segundos * serie.retencao:
+                return nome
+        return candidatas[-1][0]
+
+    def consultar(self, metrica, inicio_us, fim_us, resolucao=None):
+        if metrica not in self.metricas:
+            raise KeyError(metrica)
+        resolucao = resolucao or self.escolher_resolucao(inicio_us, fim_us)
+        pontos = self.series[resolucao].consultar(metrica, inicio_us, fim_us)
+        return resolucao, pontos
+
+    @staticmethod
+    def resumir(pontos):
+        """Combina pontos de rollup em um único count/min/max/média/último"""
+        if not pontos:
+            return None
+        count = sum(p['count'] for p in pontos)
+        return {
+            'count': count,
+            'min': min(p['min'] for p in pontos),
+            'max': max(p['max'] for p in pontos),
+            'media': round(sum(p['media'] * p['count'] for p in pontos) / count, 3),
+            'ultimo': pontos[-1]['ultimo']
+        }
+
+# ================================
+# HISTÓRICO PARTICIONADO POR SENSOR
+# ================================
+class HistoricoSensores:
+    """Histórico de um tipo de sensor particionado por sensor_id.
+
+    Mantém um buffer geral (todas as leituras, para o feed da API), um buffer
+    por sensor e índices O(1) de última leitura e último contato por sensor,
+    de modo que listagem, health check e status não dependem de varrer leituras.
+    """
+    def __init__(self, capacidade, capacidade_por_sensor, campos_numericos, campos_categoricos,
+                 campos_fixos=None, metricas_agregadas=None):
+        self.capacidade_por_sensor = capacidade_por_sensor
+        self.campos_numericos = list(campos_numericos)
+        self.campos_categoricos = list(campos_categoricos)
+        self.campos_fixos = dict(campos_fixos or {})
+        self.geral = BufferCircularSensor(capacidade, campos_numericos, campos_categoricos, campos_fixos)
+        self.particoes = {}      # sensor_id -> BufferCircularSensor
+        self._ultimas = {}       # sensor_id -> última leitura (dict)
+        self._visto_em = {}      # sensor_id -> time.time() da última leitura recebida
+        self._lock = threading.Lock()
+        # Versão monotônica do stream (validador para ETag/304 na API)
+        self.versao = 0
+        self.modificado_em = time.time()
+        # Rollups: nome público da métrica -> campo da leitura (ex.: 'temperatura' -> 'valor')
+        self.metricas_agregadas = dict(metricas_agregadas or {})
+        self.agregados = AgregadorMultiResolucao(self.metricas_agregadas.keys())
+
+    def _particao(self, sensor_id):
+        particao = self.particoes.get(sensor_id)
+        if particao is None:
+            with self._lock:
+                particao = self.particoes.get(sensor_id)
+                if particao is None:
+                    # sensor_id é constante dentro da partição: vira campo fixo
+                    particao = BufferCircularSensor(
+                        self.capacidade_por_sensor,
+                        self.campos_numericos,
+                        [c for c in self.campos_categoricos if c != 'sensor_id'],
+                        {**self.campos_fixos, 'sensor_id': sensor_id}
+                    )
+                    self.particoes[sensor_id] = particao
+        return particao
+
+    def adicionar(self, leitura):
+        sensor_id = leitura.get('sensor_id')
+        timestamp = leitura.get('timestamp')
+        timestamp_us = iso_para_us(timestamp) if timestamp else agora_us()
+
+        self.geral.adicionar(leitura, timestamp_us)
+        valores = {
+            metrica: float(leitura[campo])
+            for metrica, campo in self.metricas_agregadas.items()
+            if leitura.get(campo) is not None
+        }
+        if valores:
+            self.agregados.adicionar(timestamp_us, valores)
+        if sensor_id is not None:
+            self._particao(sensor_id).adicionar(leitura, timestamp_us)
+            self._ultimas[sensor_id] = leitura
+            self._visto_em[sensor_id] = time.time()
+        self.versao += 1
+        self.modificado_em = time.time()
+
+    # Feed geral (todas as leituras do tipo, em ordem de chegada)
+    def __len__(self):
+        return len(self.geral)
+
+    def ultimos(self, n):
+        return self.geral.ultimos(n)
+
+    def ultimo(self):
+        return self.geral.ultimo()
+
+    def janela(self, n):
+        return self.geral.janela(n)
+
+    def vocabulario(self, campo):
+        return self.geral.vocabulario(campo)
+
+    def resumo_janela(self, n, categorias=()):
+        """count/min/max/média dos campos numéricos e contagem por valor das `categorias`
+        nas últimas n leituras, lidos direto das colunas (sem montar dicts)"""
+        visoes = self.janela(n)
+        resumo = {'leituras': sum(len(v) for v in visoes['timestamp']), 'campos': {}, 'categorias': {}}
+        for campo in self.campos_numericos:
+            valores = [valor for visao in visoes[campo] for valor in visao if not math.isnan(valor)]
+            resumo['campos'][campo] = {
+                'count': len(valores),
+                'min': min(valores),
+                'max': max(valores),
+                'media': round(sum(valores) / len(valores), 3)
+            } if valores else None
+        for campo in categorias:
+            contagem = {}
+            for visao in visoes[campo]:
+                for codigo in visao:
+                    contagem[codigo] = contagem.get(codigo, 0) + 1
+            # Vocabulário lido depois das colunas: cobre todo código já gravado nelas
+            valores = self.vocabulario(campo)
+            resumo['categorias'][campo] = {
+                valores[codigo]: total for codigo, total in contagem.items() if valores[codigo] is not None
+            }
+        for lista in visoes.values():
+            for visao in lista:
+                visao.release()
+        return resumo
+
+    # Consultas por sensor (O(1) por sensor)
+    def sensores(self):
+        return list(self._ultimas.keys())
+
+    def ultimo_do_sensor(self, sensor_id):
+        return self._ultimas.get(sensor_id)
+
+    def visto_em(self, sensor_id):
+        """Momento (time.time()) da última leitura recebida do sensor, ou None"""
+        return self._visto_em.get(sensor_id)
+
+    def historico_do_sensor(self, sensor_id, n):
+        particao = self.particoes.get(sensor_id)
+        return particao.ultimos(n) if particao else []
+
+# ================================
+# ARMAZENAMENTO DURÁVEL EM SEGMENTOS
+# ================================
+MAGICO_SEGMENTO = b'SCSG'
+VERSAO_SEGMENTO = 1
+# magico, versao, capacidade, tamanho do bloco, count, ts_min, ts_max
+CABECALHO = struct.Struct('<4sIqqqqq')
+TAMANHO_CABECALHO = 64
+ENTRADA_INDICE = struct.Struct('<qq')  # (ts_min, ts_max) de cada bloco
+
+class SegmentoSensor:
+    """Arquivo de segmento colunar de largura fixa, acessado via mmap.
+
+    Layout: cabeçalho | índice esparso (min/max de timestamp por bloco) |
+    coluna timestamp (int64) | colunas numéricas (float64) | colunas categóricas (int32).
+    O arquivo é pré-alocado com a capacidade total e só recebe anexos.
+    """
+    def __init__(self, caminho, capacidade, bloco, campos_numericos, campos_categoricos, somente_leitura=False):
+        self.caminho = caminho
+        self.somente_leitura = somente_leitura
+        self.campos_numericos = list(campos_numericos)
+        self.campos_categoricos = list(campos_categoricos)
+
+        novo = not os.path.exists(caminho)
+        if novo:
+            self.capacidade = capacidade
+            self.bloco = bloco
+        else:
+            with open(caminho, 'rb') as f:
+                magico, versao, self.capacidade, self.bloco, _, _, _ = CABECALHO.unpack(f.read(CABECALHO.size))
+            if magico != MAGICO_SEGMENTO or versao != VERSAO_SEGMENTO:
+                raise ValueError(f"Segmento inválido: {caminho}")
+
+        self.num_blocos = -(-self.capacidade // self.bloco)
+        self.offset_indice = TAMANHO_CABECALHO
+        offset = self.offset_indice + self.num_blocos * ENTRADA_INDICE.size
+        self.offsets = {'timestamp': offset}
+        offset += 8 * self.capacidade
+        for campo in self.campos_numericos:
+            self.offsets[campo] = offset
+            offset += 8 * self.capacidade
+        for campo in self.campos_categoricos:
+            self.offsets[campo] = offset
+            offset += 4 * self.capacidade
+        tamanho_arquivo = offset
+
+        if somente_leitura:
+            # Outro processo escreve o segmento; o cabeçalho é relido em atualizar()
+            self._arquivo = open(caminho, 'rb')
+            self.mm = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            self.atualizar()
+            return
+        if novo:
+            with open(caminho, 'wb') as f:
+                f.truncate(tamanho_arquivo)
+        self._arquivo = open(caminho, 'r+b')
+        self.mm = mmap.mmap(self._arquivo.fileno(), 0)
+        if novo:
+            self.count, self.ts_min, self.ts_max = 0, 0, 0
+            self._gravar_cabecalho()
+        else:
+            self.atualizar()
+
+    def atualizar(self):
+        """Relê contagem e limites de tempo do cabeçalho"""
+        _, _, _, _, self.count, self.ts_min, self.ts_max = CABECALHO.unpack_from(self.mm, 0)
+
+    def _gravar_cabecalho(self):
+        CABECALHO.pack_into(self.mm, 0, MAGICO_SEGMENTO, VERSAO_SEGMENTO, self.capacidade,
+                            self.bloco, self.count, self.ts_min, self.ts_max)
+
+    @property
+    def cheio(self):
+        return self.count >= self.capacidade
+
+    def anexar(self, timestamp_us, numericos, categoricos):
+        posicao = self.count
+        struct.pack_into('<q', self.mm, self.offsets['timestamp'] + 8 * posicao, timestamp_us)
+        for campo, valor in zip(self.campos_numericos, numericos):
+            struct.pack_into('<d', self.mm, self.offsets[campo] + 8 * posicao, valor)
+        for campo, codigo in zip(self.campos_categoricos, categoricos):
+            struct.pack_into('<i', self.mm, self.offsets[campo] + 4 * posicao, codigo)
+
+        # Índice esparso: min/max de timestamp do bloco atual
+        bloco, offset_bloco = divmod(posicao, self.bloco)
+        offset_entrada = self.offset_indice + bloco * ENTRADA_INDICE.size
+        if offset_bloco == 0:
+            ENTRADA_INDICE.pack_into(self.mm, offset_entrada, timestamp_us, timestamp_us)
+        else:
+            minimo, maximo = ENTRADA_INDICE.unpack_from(self.mm, offset_entrada)
+            ENTRADA_INDICE.pack_into(self.mm, offset_entrada, min(minimo, timestamp_us), max(maximo, timestamp_us))
+
+        self.ts_min = timestamp_us if posicao == 0 else min(self.ts_min, timestamp_us)
+        self.ts_max = timestamp_us if posicao == 0 else max(self.ts_max, timestamp_us)
+        self.count = posicao + 1
+        self._gravar_cabecalho()
+
+    def _intervalo_candidato(self, inicio_us, fim_us):
+        """Busca binária no índice esparso; retorna [r0, r1) de registros que podem estar no intervalo"""
+        blocos = -(-self.count // self.bloco)
+        entradas = list(ENTRADA_INDICE.iter_unpack(
+            self.mm[self.offset_indice:self.offset_indice + blocos * ENTRADA_INDICE.size]))
+        # Máximo acumulado (não decrescente) e mínimo dos sufixos (não decrescente)
+        # continuam ordenados mesmo com leituras levemente fora de ordem
+        maximos, maximo = [], None
+        for _, bloco_max in entradas:
+            maximo = bloco_max if maximo is None else max(maximo, bloco_max)
+            maximos.append(maximo)
+        minimos, minimo = [0] * blocos, None
+        for i in range(blocos - 1, -1, -1):
+            minimo = entradas[i][0] if minimo is None else min(minimo, entradas[i][0])
+            minimos[i] = minimo
+        b0 = bisect_left(maximos, inicio_us)
+        b1 = bisect_right(minimos, fim_us)
+        return b0 * self.bloco, min(b1 * self.bloco, self.count)
+
+    def consultar(self, inicio_us, fim_us, codigo_sensor=None):
+        """Retorna (timestamp, numéricos, categóricos) dos registros no intervalo"""
+        if not self.count or self.ts_max < inicio_us or self.ts_min > fim_us:
+            return []
+        r0, r1 = self._intervalo_candidato(inicio_us, fim_us)
+        return self._ler(r0, r1, inicio_us, fim_us, codigo_sensor)
+
+    def cauda(self, n):
+        """Os últimos n registros na ordem de gravação, lidos direto do fim das colunas"""
+        return self._ler(max(self.count - n, 0), self.count) if n > 0 else []
+
+    def _ler(self, r0, r1, inicio_us=None, fim_us=None, codigo_sensor=None):
+        """Fatia as colunas em [r0, r1), filtrando por tempo e sensor quando informados"""
+        if r0 >= r1:
+            return []
+
+        visao = memoryview(self.mm)
+        try:
+            def coluna(campo, tamanho, formato):
+                offset = self.offsets[campo]
+                return visao[offset + tamanho * r0:offset + tamanho * r1].cast(formato)
+
+            timestamps = coluna('timestamp', 8, 'q')
+            numericos = [coluna(c, 8, 'd') for c in self.campos_numericos]
+            categoricos = [coluna(c, 4, 'i') for c in self.campos_categoricos]
+            try:
+                indice_sensor = self.campos_categoricos.index('sensor_id')
+            except ValueError:
+                indice_sensor = None
+
+            registros = []
+            for i, ts in enumerate(timestamps):
+                if inicio_us is not None and (ts < inicio_us or ts > fim_us):
+                    continue
+                if codigo_sensor is not None and categoricos[indice_sensor][i] != codigo_sensor:
+                    continue
+                registros.append((ts, [c[i] for c in numericos], [c[i] for c in categoricos]))
+
+            for v in [timestamps, *numericos, *categoricos]:
+                v.release()
+            return registros
+        finally:
+            visao.release()
+
+    def sincronizar(self):
+        if not self.somente_leitura:
+            self.mm.flush()
+
+    def fechar(self):
+        self.sincronizar()
+        self.mm.close()
+        self._arquivo.close()
+
+class ArmazemSegmentos:
+    """Histórico durável de um tipo de sensor em segmentos append-only no disco.
+
+    Leituras são anexadas ao segmento ativo; ao encher, um novo segmento é
+    criado (rotação) e segmentos mais antigos que a retenção são apagados.
+    O vocabulário dos campos categóricos fica em um arquivo JSON Lines
+    append-only ao lado dos segmentos.
+    """
+    def __init__(self, diretorio, campos_numericos, campos_categoricos, campos_fixos=None,
+                 capacidade_segmento=100_000, bloco_indice=1024, retencao_dias=14, intervalo_flush=5,
+                 somente_leitura=False):
+        self.diretorio = diretorio
+        self.somente_leitura = somente_leitura  # leitor de um armazém escrito por outro processo
+        self.campos_numericos = list(campos_numericos)
+        self.campos_categoricos = list(campos_categoricos)
+        self.campos_fixos = dict(campos_fixos or {})
+        self.capacidade_segmento = capacidade_segmento
+        self.bloco_indice = bloco_indice
+        self.retencao_us = int(retencao_dias * 86400 * 1_000_000)
+        self.intervalo_flush = intervalo_flush
+        self._ultimo_flush = time.time()
+        self._lock = threading.Lock()
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._caminho_vocabulario = os.path.join(diretorio, 'vocabulario.jsonl')
+        self._vocabulario = {campo: ([None], {None: 0}) for campo in self.campos_categoricos}
+        self._offset_vocabulario = 0
+        self._carregar_vocabulario()
+        self._arquivo_vocabulario = None
+        if not somente_leitura:
+            self._arquivo_vocabulario = open(self._caminho_vocabulario, 'a', encoding='utf-8')
+
+        self.segmentos = []
+        for nome in self._arquivos_segmentos():
+            self.segmentos.append(self._abrir_segmento(os.path.join(diretorio, nome)))
+        if not somente_leitura:
+            self._expirar_segmentos(agora_us())
+
+    def _arquivos_segmentos(self):
+        """Nomes dos segmentos na ordem de criação (número de sequência no nome)"""
+        nomes = [n for n in os.listdir(self.diretorio) if n.startswith('seg_') and n.endswith('.col')]
+        return sorted(nomes, key=self._sequencia)
+
+    @staticmethod
+    def _sequencia(nome):
+        return int(os.path.basename(nome)[4:-4])
+
+    def _abrir_segmento(self, caminho):
+        return SegmentoSensor(caminho, self.capacidade_segmento, self.bloco_indice,
+                              self.campos_numericos, self.campos_categoricos, self.somente_leitura)
+
+    def _carregar_vocabulario(self):
+        """Lê as entradas novas do vocabulário (só linhas completas, a partir do último offset)"""
+        if not os.path.exists(self._caminho_vocabulario):
+            return
+        with open(self._caminho_vocabulario, 'rb') as f:
+            f.seek(self._offset_vocabulario)
+            conteudo = f.read()
+        fim = conteudo.rfind(b'\n') + 1
+        self._offset_vocabulario += fim
+        for linha in conteudo[:fim].decode('utf-8').splitlines():
+            if linha.strip():
+                entrada = json.loads(linha)
+                valores, indice = self._vocabulario.get(entrada['campo'], (None, None))
+                if valores is None:
+                    continue
+                while len(valores) <= entrada['codigo']:
+                    valores.append(None)
+                valores[entrada['codigo']] = entrada['valor']
+                indice[entrada['valor']] = entrada['codigo']
+
+    def _sincronizar_leitura(self):
+        """Modo leitura: acompanha segmentos criados/apagados e o crescimento do escritor"""
+        if not self.somente_leitura:
+            return
+        nomes = set(self._arquivos_segmentos())
+        abertos = {os.path.basename(s.caminho): s for s in self.segmentos}
+        for nome, segmento in abertos.items():
+            if nome not in nomes:
+                segmento.fechar()
+        self.segmentos = [s for n, s in abertos.items() if n in nomes]
+        for nome in sorted(nomes - set(abertos), key=self._sequencia):
+            try:
+                self.segmentos.append(self._abrir_segmento(os.path.join(self.diretorio, nome)))
+            except (ValueError, OSError, struct.error):
+                continue   # segmento ainda sendo criado pelo escritor
+        self.segmentos.sort(key=lambda s: self._sequencia(s.caminho))
+        for segmento in self.segmentos:
+            segmento.atualizar()
+        # Vocabulário por último: o escritor grava o termo antes do registro que o usa
+        self._carregar_vocabulario()
+
+    def _internar(self, campo, valor):
+        valores, indice = self._vocabulario[campo]
+        codigo = indice.get(valor)
+        if codigo is None:
+            codigo = len(valores)
+            valores.append(valor)
+            indice[valor] = codigo
+            self._arquivo_vocabulario.write(json.dumps(
+                {'campo': campo, 'codigo': codigo, 'valor': valor}, ensure_ascii=False) + '\n')
+            self._arquivo_vocabulario.flush()
+        return codigo
+
+    def _segmento_ativo(self, timestamp_us):
+        if not self.segmentos or self.segmentos[-1].cheio:
+            # Rotação: o nome carrega um número de sequência crescente, não o timestamp
+            # da leitura (que pode chegar fora de ordem), para manter a ordem de criação
+            sequencia = self._sequencia(self.segmentos[-1].caminho) + 1 if self.segmentos else 1
+            caminho = os.path.join(self.diretorio, f"seg_{sequencia:020d}.col")
+            if self.segmentos:
+                self.segmentos[-1].sincronizar()
+            self.segmentos.append(self._abrir_segmento(caminho))
+            self._expirar_segmentos(timestamp_us)
+        return self.segmentos[-1]
+
+    def _expirar_segmentos(self, referencia_us):
+        """Apaga segmentos fechados cujo registro mais novo saiu da retenção"""
+        limite = referencia_us - self.retencao_us
+        while len(self.segmentos) > 1 and self.segmentos[0].ts_max < limite:
+            segmento = self.segmentos.pop(0)
+            segmento.fechar()
+            os.remove(segmento.caminho)
+
+    def adicionar(self, leitura, timestamp_us=None):
+        if self.somente_leitura:
+            raise RuntimeError("Armazém aberto somente para leitura")
+        if timestamp_us is None:
+            timestamp = leitura.get('timestamp')
+            timestamp_us = iso_para_us(timestamp) if timestamp else agora_us()
+        numericos = []
+        for campo in self.campos_numericos:
+            valor = leitura.get(campo)
+            numericos.append(float(valor) if valor is not None else math.nan)
+
+        with self._lock:
+            categoricos = [self._internar(campo, leitura.get(campo)) for campo in self.campos_categoricos]
+            self._segmento_ativo(timestamp_us).anexar(timestamp_us, numericos, categoricos)
+            if time.time() - self._ultimo_flush >= self.intervalo_flush:
+                self.segmentos[-1].sincronizar()
+                self._ultimo_flush = time.time()
+
+    def consultar(self, inicio_us, fim_us, sensor_id=None, limite=None):
+        """Leituras no intervalo [inicio_us, fim_us] como dicts (as mais recentes se houver limite)"""
+        with self._lock:
+            self._sincronizar_leitura()
+            codigo_sensor = None
+            if sensor_id is not None:
+                codigo_sensor = self._vocabulario.get('sensor_id', ([], {}))[1].get(sensor_id)
+                if codigo_sensor is None:
+                    return []
+            if limite is not None and limite <= 0:
+                return []
+            # Do segmento mais novo para o mais antigo, parando ao atingir o limite
+            registros = []
+            for segmento in reversed(self.segmentos):
+                registros = segmento.consultar(inicio_us, fim_us, codigo_sensor) + registros
+                if limite is not None and len(registros) >= limite:
+                    registros = registros[-limite:]
+                    break
+            vocabularios = [self._vocabulario[c][0] for c in self.campos_categoricos]
+        return self._para_leituras(registros, vocabularios)
+
+    def _para_leituras(self, registros, vocabularios):
+        """Converte registros (timestamp, numéricos, categóricos) em dicts de leitura"""
+        leituras = []
+        for timestamp_us, numericos, categoricos in registros:
+            leitura = dict(self.campos_fixos)
+            leitura['timestamp'] = us_para_iso(timestamp_us)
+            for campo, valor in zip(self.campos_numericos, numericos):
+                if not math.isnan(valor):
+                    leitura[campo] = valor
+            for campo, vocabulario, codigo in zip(self.campos_categoricos, vocabularios, categoricos):
+                if codigo < len(vocabulario) and vocabulario[codigo] is not None:
+                    leitura[campo] = vocabulario[codigo]
+            leituras.append(leitura)
+        return leituras
+
+    def ultimos(self, n):
+        """Últimas n leituras gravadas (usado para reidratar a memória ao reiniciar)"""
+        if n <= 0:
+            return []
+        with self._lock:
+            self._sincronizar_leitura()
+            registros = []
+            for segmento in reversed(self.segmentos):
+                registros = segmento.cauda(n - len(registros)) + registros
+                if len(registros) >= n:
+                    break
+            vocabularios = [self._vocabulario[c][0] for c in self.campos_categoricos]
+        return self._para_leituras(registros, vocabularios)
+
+    def estatisticas(self):
+        with self._lock:
+            self._sincronizar_leitura()
+            return {
+                'segmentos': len(self.segmentos),
+                'registros': sum(s.count for s in self.segmentos),
+                'capacidade_segmento': self.capacidade_segmento,
+                'retencao_dias': self.retencao_us / 86400 / 1_000_000
+            }
+
+    def fechar(self):
+        with self._lock:
+            for segmento in self.segmentos:
+                segmento.fechar()
+            self.segmentos = []
+            if self._arquivo_vocabulario:
+                self._arquivo_vocabulario.close()
+
+class ArmazemParticionado:
+    """Consulta vários armazéns do mesmo tipo (um por processo de ingestão) como se fossem um só"""
+    def __init__(self, armazens):
+        self.armazens = list(armazens)
+
+    def consultar(self, inicio_us, fim_us, sensor_id=None, limite=None):
+        leituras = []
+        for armazem in self.armazens:
+            leituras.extend(armazem.consultar(inicio_us, fim_us, sensor_id, limite))
+        leituras.sort(key=lambda leitura: leitura['timestamp'])
+        if limite is not None:
+            leituras = leituras[-limite:] if limite > 0 else []
+        return leituras
+
+    def ultimos(self, n):
+        leituras = []
+        for armazem in self.armazens:
+            leituras.extend(armazem.ultimos(n))
+        leituras.sort(key=lambda leitura: leitura['timestamp'])
+        return leituras[-n:] if n > 0 else []
+
+    def estatisticas(self):
+        parciais = [armazem.estatisticas() for armazem in self.armazens]
+        return {
+            'particoes': len(parciais),
+            'segmentos': sum(p['segmentos'] for p in parciais),
+            'registros': sum(p['registros'] for p in parciais)
+        }
+
+    def fechar(self):
+        for armazem in self.armazens:
+            armazem.fechar()
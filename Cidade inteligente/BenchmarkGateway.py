@@ -0,0 +1,423 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import queue
+import random
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime
+import grpc
+import requests
+from werkzeug.serving import make_server
+from Dispositivos import HostDispositivos
+from Gateway import GatewayInteligente, PoolCanaisGRPC
+from LogCidade import configurar_logs, encerrar_logs
+from SensoresCidade import FrotaSensores
+
+# ================================
+# BENCHMARK DO GATEWAY
+# ================================
+# Sobe o Gateway (Flask + gRPC + ingestão) contra substitutos locais:
+#   - BrokerLocal no lugar do RabbitMQ (mesma interface do ConsumidorSensores)
+#   - HostDispositivos com N dispositivos virtuais em uma porta gRPC
+#   - descoberta injetada direto no Gateway, sem multicast
+# e mede vazão e latência (p50/p95/p99) por endpoint REST, por método gRPC e
+# da ingestão. O resultado vai para um JSON que pode ser comparado com rodadas
+# anteriores (--comparar).
+#
+# Uso:
+#   python BenchmarkGateway.py --duracao 30 --dispositivos 300 --ingestao 2000 --comandos 50 --leitores 20
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+class Medidor:
+    """Latências (em segundos) e erros por nome de operação"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.latencias = {}
+            self.erros = {}
+            self.inicio = time.perf_counter()
+
+    def registrar(self, nome, segundos, erro=False):
+        with self._lock:
+            self.latencias.setdefault(nome, []).append(segundos)
+            if erro:
+                self.erros[nome] = self.erros.get(nome, 0) + 1
+
+    def resumo(self):
+        with self._lock:
+            duracao = time.perf_counter() - self.inicio
+            resultado = {}
+            for nome, valores in sorted(self.latencias.items()):
+                ordenados = sorted(valores)
+                def em_ms(valor):
+                    return round(valor * 1000, 3) if valor is not None else None
+                resultado[nome] = {
+                    'total': len(ordenados),
+                    'erros': self.erros.get(nome, 0),
+                    'por_segundo': round(len(ordenados) / duracao, 1) if duracao else 0,
+                    'p50_ms': em_ms(_percentil(ordenados, 0.50)),
+                    'p95_ms': em_ms(_percentil(ordenados, 0.95)),
+                    'p99_ms': em_ms(_percentil(ordenados, 0.99)),
+                    'max_ms': em_ms(ordenados[-1])
+                }
+            return resultado, duracao
+
+# ================================
+# SUBSTITUTOS LOCAIS
+# ================================
+class InterceptadorLatencia(grpc.UnaryUnaryClientInterceptor):
+    """Mede cada chamada gRPC do Gateway, por método"""
+    def __init__(self, medidor):
+        self.medidor = medidor
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        inicio = time.perf_counter()
+        resposta = continuation(client_call_details, request)
+        erro = resposta.exception() is not None   # espera a resposta
+        self.medidor.registrar(f"grpc {client_call_details.method}", time.perf_counter() - inicio, erro)
+        return resposta
+
+class PoolCanaisMedido(PoolCanaisGRPC):
+    """Pool de canais do Gateway com o interceptador de latência em cada canal"""
+    def __init__(self, interceptador, idle_timeout=300):
+        super().__init__(idle_timeout)
+        self.interceptador = interceptador
+
+    def _obter_entrada(self, endereco):
+        nova = endereco not in self._canais
+        entrada = super()._obter_entrada(endereco)
+        if nova:
+            entrada['canal'] = grpc.intercept_channel(entrada['canal'], self.interceptador)
+        return entrada
+
+class BrokerLocal:
+    """Fila em memória no lugar do RabbitMQ, com a interface do ConsumidorSensores.
+
+    `publicar` tem a assinatura do PublicadorSensores, então a FrotaSensores
+    publica direto aqui; `consumidores` threads entregam as mensagens aos
+    processadores do Gateway e medem publicação -> processamento.
+    """
+    def __init__(self, processadores, medidor, consumidores=1, capacidade=100000):
+        self.processadores = dict(processadores)
+        self.medidor = medidor
+        self.consumidores = consumidores
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._parando = threading.Event()
+        self._threads = []
+        self.estado = 'parado'
+        self.ultimo_erro = None
+        self.estatisticas_consumo = {'publicadas': 0, 'processadas': 0, 'falhas': 0, 'descartadas': 0}
+
+    def publicar(self, fila, body, content_type=None):
+        try:
+            self._fila.put_nowait((fila, body, types.SimpleNamespace(content_type=content_type, headers=None), time.perf_counter()))
+        except queue.Full:
+            self.estatisticas_consumo['descartadas'] += 1
+            return False
+        self.estatisticas_consumo['publicadas'] += 1
+        return True
+
+    def iniciar(self):
+        self.estado = 'consumindo'
+        for indice in range(self.consumidores):
+            thread = threading.Thread(target=self._consumir, name=f'broker_local_{indice}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def aguardar_conexao(self, timeout=None):
+        return True
+
+    def _consumir(self):
+        while not self._parando.is_set() or not self._fila.empty():
+            try:
+                fila, body, propriedades, publicada_em = self._fila.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            erro = False
+            try:
+                self.processadores[fila](body, propriedades)
+                self.estatisticas_consumo['processadas'] += 1
+            except Exception as e:
+                erro = True
+                self.ultimo_erro = str(e)
+                self.estatisticas_consumo['falhas'] += 1
+            self.medidor.registrar(f"ingestao {fila}", time.perf_counter() - publicada_em, erro)
+
+    def parar(self):
+        self._parando.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.estado = 'parado'
+
+    def estatisticas(self):
+        # Chaves do PublicadorSensores, usadas pelo relatório da FrotaSensores
+        return {
+            **self.estatisticas_consumo,
+            'estado': self.estado,
+            'confirmadas': self.estatisticas_consumo['processadas'],
+            'em_voo': 0,
+            'no_buffer': self._fila.qsize(),
+            'latencia_confirmacao_ms': {'p50': None, 'p95': None, 'max': None}
+        }
+
+def anunciar_dispositivos(gateway, host):
+    """Descoberta sem multicast: entrega ao Gateway a resposta em lote que o host enviaria"""
+    mensagem = {
+        'type': 'DISCOVERY_RESPONSE_LOTE',
+        'host_id': host.host_id,
+        'ip': '127.0.0.1',
+        'grpc_port': host.port,
+        'timestamp': datetime.now().isoformat(),
+        'devices': [{'device_id': device_id, 'device_type': device_type} for device_id, device_type in host.listar()]
+    }
+    for resposta in gateway._respostas_descoberta(mensagem):
+        gateway._registrar_dispositivo(resposta)
+
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# ================================
+# CARGAS
+# ================================
+def _em_ritmo(taxa, parar, acao):
+    """Chama `acao` `taxa` vezes por segundo (sem acumular atraso) até `parar`"""
+    intervalo = 1.0 / taxa
+    proximo = time.perf_counter()
+    while not parar.is_set():
+        acao()
+        proximo += intervalo
+        espera = proximo - time.perf_counter()
+        if espera > 0:
+            parar.wait(espera)
+        else:
+            proximo = time.perf_counter()
+
+COMANDOS = {
+    'CAMERA': lambda: ('camera', {'acao': 'resolucao', 'resolucao': random.choice(['HD', 'FullHD', '4K'])}),
+    'POSTE': lambda: ('poste', {'acao': 'intensidade', 'intensidade': random.randint(10, 100)}),
+    'SEMAFORO': lambda: ('semaforo', {'acao': 'tempos', 'tempos': {'tempo_vermelho': 30, 'tempo_verde': random.randint(15, 40), 'tempo_amarelo': 5}})
+}
+
+def carga_comandos(url, dispositivos, medidor, parar, taxa):
+    """Um cliente enviando comandos de controle a dispositivos aleatórios"""
+    sessao = requests.Session()
+    def enviar():
+        device_id, device_type = random.choice(dispositivos)
+        rota, corpo = COMANDOS[device_type]()
+        nome = f"POST /api/{rota}/<id>/controle"
+        inicio = time.perf_counter()
+        try:
+            resposta = sessao.post(f"{url}/api/{rota}/{device_id}/controle", json=corpo, timeout=10)
+            erro = resposta.status_code != 200 or not resposta.json().get('sucesso')
+        except requests.RequestException:
+            erro = True
+        medidor.registrar(nome, time.perf_counter() - inicio, erro)
+    _em_ritmo(taxa, parar, enviar)
+
+def carga_leitor(url, medidor, parar, intervalo, contagem):
+    """Um dashboard consultando os endpoints de leitura com ETag, como o navegador"""
+    sessao = requests.Session()
+    validadores = {}
+    def ler():
+        for caminho in ('/api/dispositivos', '/api/sensores/dados'):
+            inicio = time.perf_counter()
+            try:
+                resposta = sessao.get(f"{url}{caminho}", headers=validadores.get(caminho, {}), timeout=10)
+                erro = resposta.status_code not in (200, 304)
+                if resposta.status_code == 200 and resposta.headers.get('ETag'):
+                    validadores[caminho] = {'If-None-Match': resposta.headers['ETag']}
+                contagem[resposta.status_code] = contagem.get(resposta.status_code, 0) + 1
+            except requests.RequestException:
+                erro = True
+            medidor.registrar(f"GET {caminho}", time.perf_counter() - inicio, erro)
+    _em_ritmo(1.0 / intervalo, parar, ler)
+
+# ================================
+# EXECUÇÃO
+# ================================
+def _versao():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def executar_benchmark(args):
+    configurar_logs(nivel=args.log)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    medidor = Medidor()
+
+    # Dispositivos virtuais em uma porta gRPC
+    host = HostDispositivos(_porta_livre(), max_workers=args.workers_grpc)
+    por_tipo = args.dispositivos // 3
+    host.adicionar_varios('CAMERA', por_tipo)
+    host.adicionar_varios('POSTE', por_tipo)
+    host.adicionar_varios('SEMAFORO', args.dispositivos - 2 * por_tipo)
+    host.iniciar()
+
+    # Gateway com pool de canais medido e broker local
+    gateway = GatewayInteligente(diretorio_dados=tempfile.mkdtemp(prefix='benchmark_'))
+    gateway.pool_canais = PoolCanaisMedido(InterceptadorLatencia(medidor))
+    broker = BrokerLocal(
+        {'sensor_temperatura': gateway._processar_temperatura, 'sensor_qualidade_ar': gateway._processar_qualidade_ar},
+        medidor, consumidores=args.consumidores
+    )
+    gateway.consumidor = broker
+    broker.iniciar()
+
+    inicio_descoberta = time.perf_counter()
+    anunciar_dispositivos(gateway, host)
+    medidor.registrar('descoberta (registro em lote)', time.perf_counter() - inicio_descoberta)
+
+    servidor = make_server('127.0.0.1', 0, gateway.app, threaded=True)
+    url = f"http://127.0.0.1:{servidor.server_port}"
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    parar = threading.Event()
+    threads = []
+
+    # Ingestão: a frota de sensores virtuais publicando no broker local
+    frota = None
+    if args.ingestao:
+        sensores = max(1, args.sensores)
+        frota = FrotaSensores(
+            temperatura=sensores - sensores // 2, qualidade_ar=sensores // 2,
+            taxa=args.ingestao / sensores, formato=args.formato
+        )
+        frota.publicadores = [broker]
+        threads.append(threading.Thread(
+            target=lambda: asyncio.run(frota._principal(args.aquecimento + args.duracao, 3600)), daemon=True
+        ))
+
+    dispositivos = host.listar()
+    if args.comandos:
+        por_cliente = args.comandos / args.clientes_comandos
+        for _ in range(args.clientes_comandos):
+            threads.append(threading.Thread(target=carga_comandos, args=(url, dispositivos, medidor, parar, por_cliente), daemon=True))
+
+    respostas_leitores = {}
+    for _ in range(args.leitores):
+        threads.append(threading.Thread(target=carga_leitor, args=(url, medidor, parar, args.intervalo_leitor, respostas_leitores), daemon=True))
+
+    print(f"🏁 Benchmark: {args.dispositivos} dispositivos | ingestão {args.ingestao}/s ({args.formato}) | "
+          f"{args.comandos} comandos/s | {args.leitores} leitores | {args.duracao}s (+{args.aquecimento}s de aquecimento)")
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.aquecimento)
+    medidor.zerar()
+    respostas_leitores.clear()
+    ingeridas_antes = broker.estatisticas_consumo['processadas']
+    time.sleep(args.duracao)
+    ingeridas = broker.estatisticas_consumo['processadas'] - ingeridas_antes
+    resultados, duracao = medidor.resumo()
+
+    parar.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # Uma varredura de health check com todos os dispositivos registrados
+    gateway._verificar_saude_dispositivos()
+
+    servidor.shutdown()
+    broker.parar()
+    host.server.stop(0)
+    gateway.running = False
+    gateway.pool_canais.fechar_todos()
+    for armazem in gateway.armazem_sensores.values():
+        armazem.fechar()
+
+    return {
+        'benchmark': 'gateway',
+        'data': datetime.now().isoformat(),
+        'versao': _versao(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'configuracao': vars(args),
+        'duracao_s': round(duracao, 2),
+        'resultados': resultados,
+        'ingestao': {
+            **broker.estatisticas_consumo,
+            'processadas_por_segundo': round(ingeridas / duracao, 1) if duracao else 0,
+            'geradas_frota': frota.estatisticas_frota if frota else None
+        },
+        'leitores': {'respostas': {str(status): total for status, total in sorted(respostas_leitores.items())}},
+        'health_check': gateway.ultimo_health_check
+    }
+
+def imprimir(relatorio, anterior=None):
+    print(f"\n{'='*96}")
+    print(f"📊 RESULTADOS ({relatorio['duracao_s']}s, versão {relatorio['versao']})")
+    print(f"{'='*96}")
+    print(f"{'operação':<44}{'total':>8}{'erros':>7}{'/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for nome, r in relatorio['resultados'].items():
+        linha = f"{nome:<44}{r['total']:>8}{r['erros']:>7}{r['por_segundo']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+        if anterior and nome in anterior.get('resultados', {}) and anterior['resultados'][nome]['p95_ms']:
+            antes = anterior['resultados'][nome]['p95_ms']
+            linha += f"   p95 {((r['p95_ms'] - antes) / antes) * 100:+.0f}%"
+        print(linha)
+    ingestao = relatorio['ingestao']
+    print(f"\n📥 Ingestão: {ingestao['processadas_por_segundo']}/s processadas | "
+          f"{ingestao['falhas']} falhas | {ingestao['descartadas']} descartadas")
+    print(f"📖 Leitores: {relatorio['leitores']['respostas']}")
+    health = relatorio['health_check']
+    if health:
+        print(f"🩺 Health check: {health.get('dispositivos_sondados')} dispositivos sondados em {health.get('duracao_ms')} ms "
+              f"({health.get('dispositivos_com_stream', 0)} cobertos por stream)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga e latência do Gateway")
+    parser.add_argument('--duracao', type=float, default=20, help='segundos de medição')
+    parser.add_argument('--aquecimento', type=float, default=3, help='segundos descartados no início')
+    parser.add_argument('--dispositivos', type=int, default=300, help='câmeras + postes + semáforos virtuais')
+    parser.add_argument('--sensores', type=int, default=1000, help='sensores virtuais publicando')
+    parser.add_argument('--ingestao', type=float, default=1000, help='leituras por segundo (total)')
+    parser.add_argument('--formato', choices=['json', 'protobuf'], default='json')
+    parser.add_argument('--consumidores', type=int, default=1, help='threads consumindo o broker local')
+    parser.add_argument('--comandos', type=float, default=20, help='comandos de controle por segundo (total)')
+    parser.add_argument('--clientes-comandos', type=int, default=4, help='clientes HTTP enviando comandos')
+    parser.add_argument('--leitores', type=int, default=10, help='dashboards consultando a API')
+    parser.add_argument('--intervalo-leitor', type=float, default=1.0, help='segundos entre consultas de cada leitor')
+    parser.add_argument('--workers-grpc', type=int, default=32, help='threads do servidor gRPC dos dispositivos')
+    parser.add_argument('--log', default='ERRO', help='nível de log durante a medição')
+    parser.add_argument('--saida', default=None, help='arquivo JSON de resultado (padrão: benchmark_<data>.json)')
+    parser.add_argument('--comparar', default=None, help='JSON de uma rodada anterior para comparar o p95')
+    args = parser.parse_args()
+
+    relatorio = executar_benchmark(args)
+    saida = args.saida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+    imprimir(relatorio, anterior)
+    print(f"\n💾 Resultado salvo em {saida}")
+    encerrar_logs()
+    # Threads de fundo do Gateway (health check, Flask) não são encerradas
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
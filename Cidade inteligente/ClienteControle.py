@@ -2,12 +2,14 @@ import requests
 import json
 import os
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class ClienteControle:
     def __init__(self, gateway_url="http://localhost:5000"):
         self.gateway_url = gateway_url
         self.dispositivos = {}
+        # Respostas GET com validadores (ETag/Last-Modified) para revalidar com 304
+        self.respostas_validadas = {}
         
     def limpar_tela(self):
         """Limpa a tela do terminal"""
@@ -35,12 +37,28 @@ class ClienteControle:
             url = f"{self.gateway_url}/api{endpoint}"
             
             if metodo == 'GET':
-                response = requests.get(url, timeout=10)
+                headers = {}
+                anterior = self.respostas_validadas.get(url)
+                if anterior:
+                    if anterior['etag']:
+                        headers['If-None-Match'] = anterior['etag']
+                    if anterior['last_modified']:
+                        headers['If-Modified-Since'] = anterior['last_modified']
+                response = requests.get(url, headers=headers, timeout=10)
+                if response.status_code == 304 and anterior:
+                    return anterior['dados']
             elif metodo == 'POST':
                 response = requests.post(url, json=dados, timeout=10)
             
             if response.status_code == 200:
-                return response.json()
+                dados_resposta = response.json()
+                if metodo == 'GET' and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+                    self.respostas_validadas[url] = {
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'dados': dados_resposta
+                    }
+                return dados_resposta
             else:
                 print(f"❌ Erro HTTP {response.status_code}: {response.text}")
                 return None
@@ -128,120 +146,58 @@ class ClienteControle:
         status_data = data.get('status', {}) if 'status' in data else data
         
         # Informações básicas
-        print(f"🏷️  Nome: {status_data.get('nome', 'N/A')}")
         print(f"🔧 Tipo: {status_data.get('tipo', 'N/A')}")
         print(f"🌐 Endereço: {status_data.get('endereco', 'N/A')}")
         print(f"🔌 Status: {status_data.get('status_conexao', 'N/A')}")
-        print(f"⏱️  Uptime: {status_data.get('uptime', 'N/A')}")
         print(f"🔄 Última comunicação: {status_data.get('ultima_comunicacao', 'N/A')}")
-        print(f"📦 Firmware: {status_data.get('versao_firmware', 'N/A')}")
-        print(f"🌡️  Temp. interna: {status_data.get('temperatura_interna', 'N/A')}")
+        origem = status_data.get('origem', 'N/A')
+        if 'idade_s' in status_data:
+            origem = f"{origem} ({status_data['idade_s']}s)"
+        print(f"📦 Origem: {origem}")
+        if status_data.get('disjuntor') not in (None, 'fechado'):
+            print(f"⚡ Disjuntor: {status_data['disjuntor'].upper()}")
         
         tipo = status_data.get('tipo', '')
         
         # Status específico por tipo
         if tipo == 'CAMERA':
             print(f"\n📹 INFORMAÇÕES DA CÂMERA:")
+            print(f"   🔋 Ligada: {'✅' if status_data.get('ligada') else '❌'}")
             print(f"   🎬 Resolução: {status_data.get('resolucao', 'N/A')}")
-            print(f"   🎭 FPS: {status_data.get('fps', 'N/A')}")
-            print(f"   🔍 Zoom: {status_data.get('zoom', 'N/A')}")
-            print(f"   📼 Modo gravação: {status_data.get('modo_gravacao', 'N/A')}")
-            print(f"   💾 Storage: {status_data.get('espaco_storage', 'N/A')}")
-            print(f"   🌙 Visão noturna: {'✅' if status_data.get('modo_visao_noturna') else '❌'}")
-            print(f"   👁️  Detecção movimento: {'✅' if status_data.get('deteccao_movimento') else '❌'}")
-            print(f"   📐 Ângulo de visão: {status_data.get('angulo_visao', 'N/A')}")
-            print(f"   🎨 Qualidade: {status_data.get('qualidade_imagem', 'N/A')}")
-            print(f"   🎞️  Codec: {status_data.get('codec_video', 'N/A')}")
-            print(f"   📊 Bitrate: {status_data.get('bitrate', 'N/A')}")
-            
-            if 'status_leds' in status_data:
-                leds = status_data['status_leds']
-                print(f"   💡 LEDs:")
-                print(f"      🔋 Power: {leds.get('led_power', 'N/A')}")
-                print(f"      🌐 Network: {leds.get('led_network', 'N/A')}")
-                print(f"      📹 Recording: {leds.get('led_recording', 'N/A')}")
-        
-        elif tipo == 'POSTE_ILUMINACAO':
+            print(f"   📼 Gravando: {'✅' if status_data.get('gravando') else '❌'}")
+        
+        elif tipo == 'POSTE':
             print(f"\n💡 INFORMAÇÕES DO POSTE:")
-            print(f"   🔆 Intensidade: {status_data.get('intensidade_luz', 'N/A')}")
-            print(f"   ⚙️  Modo: {status_data.get('modo_operacao', 'N/A')}")
-            print(f"   ☀️  Luminosidade: {status_data.get('sensor_luminosidade', 'N/A')}")
-            print(f"   ⚡ Consumo: {status_data.get('consumo_energia', 'N/A')}")
-            print(f"   🌡️  Temp. LED: {status_data.get('temperatura_led', 'N/A')}")
-            print(f"   ⏰ Funcionamento: {status_data.get('horas_funcionamento', 'N/A')}")
-            print(f"   🔋 Vida útil: {status_data.get('vida_util_restante', 'N/A')}")
-            print(f"   💡 Tipo lâmpada: {status_data.get('tipo_lampada', 'N/A')}")
-            print(f"   🎨 Cor temp.: {status_data.get('cor_temperatura', 'N/A')}")
-            print(f"   👁️  Sensor movimento: {'✅' if status_data.get('sensor_movimento') else '❌'}")
-            
-            if 'programacao' in status_data:
-                prog = status_data['programacao']
-                print(f"   📅 Programação:")
-                print(f"      🌅 Acender: {prog.get('acender', 'N/A')}")
-                print(f"      🌙 Apagar: {prog.get('apagar', 'N/A')}")
-                print(f"      🌃 Modo noturno: {prog.get('modo_noturno', 'N/A')}")
+            print(f"   🔌 Poste ativo: {'✅' if status_data.get('poste_ativo') else '❌'}")
+            print(f"   💡 Lâmpada ligada: {'✅' if status_data.get('lampada_ligada') else '❌'}")
+            print(f"   🔆 Intensidade: {status_data.get('intensidade', 'N/A')}%")
         
         elif tipo == 'SEMAFORO':
             print(f"\n🚦 INFORMAÇÕES DO SEMÁFORO:")
             estado = status_data.get('estado_atual', 'N/A')
-            emoji_estado = {'verde': '🟢', 'amarelo': '🟡', 'vermelho': '🔴'}.get(estado, '⚪')
-            print(f"   {emoji_estado} Estado atual: {estado.upper()}")
-            print(f"   ⏱️  Tempo restante: {status_data.get('tempo_restante', 'N/A')}")
-            print(f"   ⚙️  Modo: {status_data.get('modo_operacao', 'N/A')}")
-            print(f"   🔄 Ciclo completo: {status_data.get('ciclo_completo', 'N/A')}")
-            print(f"   🚗 Veículos detectados: {status_data.get('veiculos_detectados', 'N/A')}")
-            print(f"   🚶 Pedestres aguardando: {status_data.get('pedestres_aguardando', 'N/A')}")
+            emoji_estado = {'VERDE': '🟢', 'AMARELO': '🟡', 'VERMELHO': '🔴'}.get(estado, '⚪')
+            print(f"   {emoji_estado} Estado atual: {estado}")
+            print(f"   ⚙️  Funcionando: {'✅' if status_data.get('funcionando') else '❌'}")
             print(f"   🚨 Modo emergência: {'✅' if status_data.get('modo_emergencia') else '❌'}")
-            print(f"   🎛️  Controle central: {'✅' if status_data.get('controle_central') else '❌'}")
-            
-            if 'tempos_programados' in status_data:
-                tempos = status_data['tempos_programados']
-                print(f"   ⏰ Tempos programados:")
-                print(f"      🟢 Verde: {tempos.get('verde', 'N/A')}")
-                print(f"      🟡 Amarelo: {tempos.get('amarelo', 'N/A')}")
-                print(f"      🔴 Vermelho: {tempos.get('vermelho', 'N/A')}")
-            
-            if 'lampadas_status' in status_data:
-                leds = status_data['lampadas_status']
-                print(f"   💡 Status das lâmpadas:")
-                print(f"      🔴 LED Vermelho: {leds.get('led_vermelho', 'N/A')}")
-                print(f"      🟡 LED Amarelo: {leds.get('led_amarelo', 'N/A')}")
-                print(f"      🟢 LED Verde: {leds.get('led_verde', 'N/A')}")
-                print(f"      🚶 LED Pedestre: {leds.get('led_pedestre', 'N/A')}")
-        
-        elif tipo == 'SENSOR':
-            print(f"\n🔬 INFORMAÇÕES DO SENSOR:")
-            
-            if device_id.startswith('TEMP'):
-                print(f"   🌡️  Tipo: {status_data.get('tipo_sensor', 'N/A')}")
-                print(f"   📊 Valor atual: {status_data.get('valor_atual', 'N/A')}")
-                print(f"   📏 Unidade: {status_data.get('unidade', 'N/A')}")
-                print(f"   🎯 Precisão: {status_data.get('precisao', 'N/A')}")
-                print(f"   📐 Faixa operação: {status_data.get('faixa_operacao', 'N/A')}")
-                print(f"   🔧 Calibração: {status_data.get('calibracao', 'N/A')}")
-                print(f"   ⏱️  Intervalo leitura: {status_data.get('intervalo_leitura', 'N/A')}")
-                print(f"   📈 Tendência: {status_data.get('tendencia', 'N/A')}")
-                print(f"   📊 Leituras 24h: {status_data.get('total_leituras_24h', 'N/A')}")
-                print(f"   🔽 Mín. 24h: {status_data.get('valor_minimo_24h', 'N/A')}")
-                print(f"   🔼 Máx. 24h: {status_data.get('valor_maximo_24h', 'N/A')}")
-                
-            elif device_id.startswith('AIR'):
-                print(f"   🌬️  Tipo: {status_data.get('tipo_sensor', 'N/A')}")
-                print(f"   🌍 Qualidade geral: {status_data.get('qualidade_geral', 'N/A')}")
-                print(f"   ⚠️  Nível risco: {status_data.get('nivel_risco', 'N/A')}")
-                print(f"   💨 CO2: {status_data.get('co2', 'N/A')}")
-                print(f"   🌫️  PM2.5: {status_data.get('pm25', 'N/A')}")
-                print(f"   🌫️  PM10: {status_data.get('pm10', 'N/A')}")
-                print(f"   💧 Umidade: {status_data.get('umidade', 'N/A')}")
-                print(f"   🌡️  Temp. ambiente: {status_data.get('temperatura_ambiente', 'N/A')}")
-                print(f"   🌍 Pressão atm.: {status_data.get('pressao_atmosferica', 'N/A')}")
-                
-                if 'indice_qualidade' in status_data:
-                    indice = status_data['indice_qualidade']
-                    print(f"   📊 Índice qualidade:")
-                    print(f"      🔢 AQI: {indice.get('AQI', 'N/A')}")
-                    print(f"      📋 Categoria: {indice.get('categoria', 'N/A')}")
-                    print(f"      💡 Recomendação: {indice.get('recomendacao', 'N/A')}")
+            print(f"   ⏰ Tempos programados:")
+            print(f"      🟢 Verde: {status_data.get('tempo_verde', 'N/A')}s")
+            print(f"      🟡 Amarelo: {status_data.get('tempo_amarelo', 'N/A')}s")
+            print(f"      🔴 Vermelho: {status_data.get('tempo_vermelho', 'N/A')}s")
+        
+        elif 'ultima_leitura' in status_data:
+            leitura = status_data['ultima_leitura']
+            print(f"\n🔬 ÚLTIMA LEITURA DO SENSOR:")
+            if 'valor' in leitura:
+                print(f"   🌡️  Temperatura: {leitura['valor']}{leitura.get('unidade', '°C')}")
+            else:
+                print(f"   🌍 Qualidade geral: {leitura.get('qualidade', 'N/A')}")
+                print(f"   ⚠️  Nível risco: {leitura.get('nivel_risco', 'N/A')}")
+                print(f"   💨 CO2: {leitura.get('co2', 'N/A')} ppm")
+                print(f"   🌫️  PM2.5: {leitura.get('pm25', 'N/A')} µg/m³")
+                print(f"   🌫️  PM10: {leitura.get('pm10', 'N/A')} µg/m³")
+                print(f"   💡 Recomendação: {status_data.get('recomendacao', 'N/A')}")
+            if leitura.get('localizacao'):
+                print(f"   📍 Localização: {leitura['localizacao']}")
         
         print("="*60)
     
@@ -316,6 +272,7 @@ class ClienteControle:
         print("-" * 25)
         
         print("Postes disponíveis:")
+        print(f"0. Todos os postes ({len(postes)})")
         for i, (device_id, dispositivo) in enumerate(postes.items(), 1):
             print(f"{i}. {device_id}")
         
@@ -325,9 +282,13 @@ class ClienteControle:
                 return
                 
             escolha = int(escolha) - 1
-            device_id = list(postes.keys())[escolha]
+            if escolha < -1:
+                print("❌ Escolha inválida")
+                return
+            # "0" = todos os postes: um único comando em lote, executado em paralelo pelo Gateway
+            device_id = list(postes.keys())[escolha] if escolha != -1 else None
             
-            print(f"\nControles para {device_id}:")
+            print(f"\nControles para {device_id or 'todos os postes'}:")
             print("1. Ligar lâmpada")
             print("2. Desligar lâmpada")
             print("3. Intensidade 25%")
@@ -360,6 +321,16 @@ class ClienteControle:
                 print("❌ Ação inválida")
                 return
             
+            if device_id is None:
+                print(f"\n🔄 Executando comando '{data['acao']}' em {len(postes)} postes...")
+                result = self.fazer_requisicao('/comandos/lote', 'POST', {**data, 'tipo': 'POSTE'})
+                if result:
+                    print(f"✅ {result['total']} postes em {result['duracao_ms']:.0f}ms: {result['resumo']}")
+                    for item in result['resultados']:
+                        if item['status'] != 'ok':
+                            print(f"   ❌ {item['device_id']}: {item['resultado']}")
+                return
+            
             print(f"\n🔄 Executando comando '{data['acao']}' em {device_id}...")
             result = self.fazer_requisicao(f'/poste/{device_id}/controle', 'POST', data)
             
@@ -447,6 +418,12 @@ class ClienteControle:
         except (ValueError, IndexError):
             print("❌ Escolha inválida")
     
+    def obter_resumo_sensor(self, metrica, horas=24):
+        """Busca no Gateway o resumo (count/min/max/média) de uma métrica nas últimas horas"""
+        inicio = (datetime.now() - timedelta(hours=horas)).isoformat()
+        data = self.fazer_requisicao(f'/sensores/agregados?metrica={metrica}&inicio={inicio}')
+        return data.get('resumo') if data else None
+    
     def visualizar_dados_sensores(self):
         """Visualiza dados dos sensores"""
         print("\n📊 Dados dos Sensores")
@@ -466,13 +443,13 @@ class ClienteControle:
                 print(f"{i}. {leitura['sensor_id']}: {leitura['valor']}°C ({timestamp})")
                 print(f"   Localização: {leitura.get('localizacao', 'N/A')}")
             
-            # Estatísticas
-            valores = [l['valor'] for l in data['temperatura']]
-            if valores:
-                print(f"\n📈 Estatísticas:")
-                print(f"   Média: {sum(valores)/len(valores):.1f}°C")
-                print(f"   Mínima: {min(valores):.1f}°C")
-                print(f"   Máxima: {max(valores):.1f}°C")
+            # Estatísticas das últimas 24h (rollups pré-calculados no Gateway)
+            resumo = self.obter_resumo_sensor('temperatura')
+            if resumo:
+                print(f"\n📈 Estatísticas (24h, {resumo['count']} leituras):")
+                print(f"   Média: {resumo['media']:.1f}°C")
+                print(f"   Mínima: {resumo['min']:.1f}°C")
+                print(f"   Máxima: {resumo['max']:.1f}°C")
         
         # Qualidade do Ar
         if data.get('qualidade_ar'):
@@ -486,6 +463,14 @@ class ClienteControle:
                 print(f"{i}. {leitura['sensor_id']}: {emoji} {leitura['qualidade']} ({timestamp})")
                 print(f"   CO2: {leitura['co2']} ppm | PM2.5: {leitura['pm25']} µg/m³ | PM10: {leitura['pm10']} µg/m³")
                 print(f"   Localização: {leitura.get('localizacao', 'N/A')}")
+            
+            resumos = {m: self.obter_resumo_sensor(m) for m in ('co2', 'pm25', 'pm10')}
+            if any(resumos.values()):
+                print(f"\n📈 Estatísticas (24h):")
+                for metrica, nome, unidade in (('co2', 'CO2', 'ppm'), ('pm25', 'PM2.5', 'µg/m³'), ('pm10', 'PM10', 'µg/m³')):
+                    resumo = resumos[metrica]
+                    if resumo:
+                        print(f"   {nome}: média {resumo['media']:.1f} | mín {resumo['min']:.1f} | máx {resumo['max']:.1f} {unidade}")
         
         if not data.get('temperatura') and not data.get('qualidade_ar'):
             print("📭 Nenhum dado de sensor disponível")
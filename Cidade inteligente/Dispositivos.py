@@ -1,4 +1,6 @@
 import grpc
+import heapq
+import itertools
 import threading
 import time
 import socket
@@ -10,70 +12,167 @@ import smart_city_pb2_grpc
 
 # Importações dos protobuf (vou criar uma versão simplificada)
 import smart_city_pb2
+from LogCidade import obter_logger, configurar_evento, encerrar_logs
+
+log = obter_logger('dispositivos')
+# Health checks do Gateway consultam status com frequência
+configurar_evento('status_solicitado', por_segundo=1)
 
 class ConfigCamera:
     def __init__(self, resolucao="HD"):
         self.resolucao = resolucao
 
-class StatusCamera:
-    def __init__(self, ligada=False, resolucao="HD", gravando=False):
-        self.ligada = ligada
-        self.resolucao = resolucao
-        self.gravando = gravando
-
-class StatusPoste:
-    def __init__(self, lampada_ligada=False, intensidade=100):
-        self.lampada_ligada = lampada_ligada
-        self.intensidade = intensidade
-
 class ConfigPoste:
     def __init__(self, intensidade=100):
         self.intensidade = intensidade
 
-class StatusSemaforo:
-    def __init__(self, estado_atual="VERMELHO", tempo_vermelho=30, tempo_verde=25, tempo_amarelo=5, funcionando=True):
-        self.estado_atual = estado_atual
-        self.tempo_vermelho = tempo_vermelho
-        self.tempo_verde = tempo_verde
-        self.tempo_amarelo = tempo_amarelo
-        self.funcionando = funcionando
-
 class ConfigSemaforo:
     def __init__(self, tempo_vermelho=30, tempo_verde=25, tempo_amarelo=5):
         self.tempo_vermelho = tempo_vermelho
         self.tempo_verde = tempo_verde
         self.tempo_amarelo = tempo_amarelo
 
+# ================================
+# STATUS OBSERVÁVEL (WatchStatus)
+# ================================
+class AssinaturaStatus:
+    """Um stream WatchStatus aberto: ids de dispositivos com mudança ainda não enviada"""
+    def __init__(self):
+        self.pendentes = {}  # device_id -> None (dict mantém a ordem das mudanças)
+        self.ativa = True
+        self._condicao = threading.Condition()
+
+    def marcar(self, device_id):
+        with self._condicao:
+            self.pendentes[device_id] = None
+            self._condicao.notify()
+
+    def encerrar(self):
+        with self._condicao:
+            self.ativa = False
+            self._condicao.notify()
+
+    def aguardar(self, timeout):
+        """Espera mudanças; retorna os ids pendentes (várias mudanças do mesmo dispositivo viram uma)"""
+        with self._condicao:
+            if not self.pendentes and self.ativa:
+                self._condicao.wait(timeout)
+            pendentes, self.pendentes = list(self.pendentes), {}
+            return pendentes
+
+class StatusObservavel:
+    """Base dos dispositivos: numera mudanças nos CAMPOS_STATUS e avisa os streams WatchStatus.
+
+    As mudanças são detectadas na atribuição dos atributos, então comandos,
+    ciclo do semáforo e automações internas aparecem no stream sem chamadas
+    explícitas espalhadas pelo código.
+    """
+    CAMPOS_STATUS = ()
+    EVENTO_STATUS = None
+
+    def __init__(self):
+        self.sequencia_status = 0
+        self.ao_mudar_status = None  # HostDispositivos: repassa a mudança aos streams do host
+        self._assinaturas = set()
+        self._lock_status = threading.Lock()
+
+    def __setattr__(self, nome, valor):
+        mudou = nome in self.CAMPOS_STATUS and nome in self.__dict__ and self.__dict__[nome] != valor
+        object.__setattr__(self, nome, valor)
+        if mudou:
+            self._status_mudou()
+
+    def _status_mudou(self):
+        with self._lock_status:
+            self.sequencia_status += 1
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            assinatura.marcar(self.device_id)
+        if self.ao_mudar_status:
+            self.ao_mudar_status(self)
+
+    def status_atual(self):
+        raise NotImplementedError
+
+    def evento_status(self):
+        return self.EVENTO_STATUS(
+            device_id=self.device_id,
+            sequencia=self.sequencia_status,
+            timestamp_ms=int(time.time() * 1000),
+            status=self.status_atual()
+        )
+
+    def encerrar_status(self):
+        """Encerra os streams deste dispositivo (ex.: removido do host)"""
+        with self._lock_status:
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            assinatura.encerrar()
+
+    def WatchStatus(self, request, context):
+        assinatura = AssinaturaStatus()
+        with self._lock_status:
+            self._assinaturas.add(assinatura)
+        try:
+            yield from transmitir_status(context, assinatura, lambda device_id: self, [self.device_id])
+        finally:
+            with self._lock_status:
+                self._assinaturas.discard(assinatura)
+
+def transmitir_status(context, assinatura, obter, iniciais):
+    """Gerador comum do WatchStatus: estado inicial dos dispositivos e depois cada mudança"""
+    if context is not None:
+        # Cliente cancelou ou conexão caiu: acorda o gerador para liberar a thread
+        context.add_callback(assinatura.encerrar)
+    pendentes = iniciais
+    while True:
+        for device_id in pendentes:
+            dispositivo = obter(device_id)
+            if dispositivo is not None:
+                yield dispositivo.evento_status()
+        if not assinatura.ativa:
+            return
+        pendentes = assinatura.aguardar(timeout=30)
+
 # ================================
 # CÂMERA INTELIGENTE
 # ================================
-class Camera:
+class Camera(StatusObservavel):
+    CAMPOS_STATUS = ('ligada', 'resolucao', 'gravando')
+    EVENTO_STATUS = smart_city_pb2.EventoStatusCamera
+
     def __init__(self, device_id="CAM001"):
+        super().__init__()
         self.device_id = device_id
         self.ligada = False
         self.resolucao = "HD"  # HD, FullHD, 4K
         self.gravando = False
         self.porta_grpc = 50052
+        self.ao_desconectar = None  # no HostDispositivos: retira só este dispositivo do ar
         
     def Ligar(self, request, context):
         self.ligada = True
-        print(f"[{self.device_id}] 📹 Câmera LIGADA - Status: ATIVA")
+        log.info('camera_ligada', "[{device_id}] 📹 Câmera LIGADA - Status: ATIVA", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def Desligar(self, request, context):
         self.ligada = False
         self.gravando = False
-        print(f"[{self.device_id}] 📹 Câmera DESLIGADA - Status: INATIVA")
-        print(f"[{self.device_id}] ❌ Parando todas as operações da câmera")
-        print(f"[{self.device_id}] 🔌 DESCONECTANDO do sistema - Processo será finalizado")
+        log.info('camera_desligada', "[{device_id}] 📹 Câmera DESLIGADA - Status: INATIVA", device_id=self.device_id)
+        log.info('camera_desligada', "[{device_id}] ❌ Parando todas as operações da câmera", device_id=self.device_id)
+        log.aviso('desconectando', "[{device_id}] 🔌 DESCONECTANDO do sistema - Processo será finalizado", device_id=self.device_id)
         
         # Finalizar processo após pequeno delay para enviar resposta
         import threading
         def finalizar():
             import time
             time.sleep(2)  # Aguarda 2 segundos para resposta ser enviada
+            if self.ao_desconectar:
+                self.ao_desconectar(self)
+                return
             import os
-            print(f"[{self.device_id}] 💀 Finalizando processo da câmera")
+            log.aviso('processo_finalizado', "[{device_id}] 💀 Finalizando processo da câmera", device_id=self.device_id)
+            encerrar_logs()  # os._exit não roda atexit: esvazia a fila antes
             os._exit(0)  # Força finalização do processo
         
         threading.Thread(target=finalizar, daemon=True).start()
@@ -81,7 +180,7 @@ class Camera:
     
     def SetResolucao(self, request, context):
         if not self.ligada:
-            print(f"[{self.device_id}] ❌ Câmera desligada - comando ignorado")
+            log.aviso('comando_ignorado', "[{device_id}] ❌ Câmera desligada - comando ignorado", device_id=self.device_id)
             return smart_city_pb2.Vazio()
             
         # request pode ser um objeto ou uma string
@@ -94,68 +193,80 @@ class Camera:
             if resolucao == "1080p":
                 resolucao = "FullHD"
             self.resolucao = resolucao
-            print(f"[{self.device_id}] 📹 Resolução alterada para {self.resolucao}")
+            log.info('resolucao_alterada', "[{device_id}] 📹 Resolução alterada para {resolucao}", device_id=self.device_id, resolucao=self.resolucao)
         return smart_city_pb2.Vazio()
     
     def IniciarGravacao(self, request, context):
         if not self.ligada:
-            print(f"[{self.device_id}] ❌ Câmera desligada - não pode iniciar gravação")
+            log.aviso('comando_ignorado', "[{device_id}] ❌ Câmera desligada - não pode iniciar gravação", device_id=self.device_id)
             return smart_city_pb2.Vazio()
             
         if self.ligada:
             self.gravando = True
-            print(f"[{self.device_id}] 🔴 Gravação INICIADA em {self.resolucao}")
+            log.info('gravacao_iniciada', "[{device_id}] 🔴 Gravação INICIADA em {resolucao}", device_id=self.device_id, resolucao=self.resolucao)
         return smart_city_pb2.Vazio()
     
     def PararGravacao(self, request, context):
         self.gravando = False
-        print(f"[{self.device_id}] ⏹️  Gravação PARADA")
+        log.info('gravacao_parada', "[{device_id}] ⏹️  Gravação PARADA", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def getStatus(self, request, context):
-        status = {
-            "ligada": self.ligada,
-            "resolucao": self.resolucao,
-            "gravando": self.gravando,
-            "status": "ATIVA" if self.ligada else "INATIVA"
-        }
-        print(f"[{self.device_id}] 📊 Status solicitado: {status}")
-        return StatusCamera(self.ligada, self.resolucao, self.gravando)
+        log.info('status_solicitado', "[{device_id}] 📊 Status solicitado: {estado} (resolução={resolucao}, gravando={gravando})",
+                 device_id=self.device_id, estado="ATIVA" if self.ligada else "INATIVA",
+                 resolucao=self.resolucao, gravando=self.gravando)
+        return self.status_atual()
+    
+    def status_atual(self):
+        return smart_city_pb2.StatusCamera(
+            ligada=self.ligada,
+            resolucao=self.resolucao,
+            gravando=self.gravando
+        )
 
 # ================================
 # POSTE DE ILUMINAÇÃO
 # ================================
-class Poste:
+class Poste(StatusObservavel):
+    CAMPOS_STATUS = ('lampada_ligada', 'intensidade', 'poste_ativo')
+    EVENTO_STATUS = smart_city_pb2.EventoStatusPoste
+
     def __init__(self, device_id="POST001"):
+        super().__init__()
         self.device_id = device_id
         self.poste_ativo = True  # Estado geral do poste
         self.lampada_ligada = False
         self.intensidade = 100  # 0-100%
         self.porta_grpc = 50053
+        self.ao_desconectar = None
         
     def LigarLampada(self, request, context):
         if not self.poste_ativo:
-            print(f"[{self.device_id}] ❌ Poste inativo - comando ignorado")
+            log.aviso('comando_ignorado', "[{device_id}] ❌ Poste inativo - comando ignorado", device_id=self.device_id)
             return smart_city_pb2.Vazio()
             
         self.lampada_ligada = True
-        print(f"[{self.device_id}] 💡 Lâmpada LIGADA - Intensidade: {self.intensidade}%")
-        print(f"[{self.device_id}] ✨ Iluminação pública ATIVA")
+        log.info('lampada_ligada', "[{device_id}] 💡 Lâmpada LIGADA - Intensidade: {intensidade}%", device_id=self.device_id, intensidade=self.intensidade)
+        log.info('lampada_ligada', "[{device_id}] ✨ Iluminação pública ATIVA", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def DesligarLampada(self, request, context):
         self.lampada_ligada = False
-        print(f"[{self.device_id}] 💡 Lâmpada DESLIGADA")
-        print(f"[{self.device_id}] 🌙 Área escura - sem iluminação")
-        print(f"[{self.device_id}] 🔌 DESCONECTANDO do sistema - Processo será finalizado")
+        log.info('lampada_desligada', "[{device_id}] 💡 Lâmpada DESLIGADA", device_id=self.device_id)
+        log.info('lampada_desligada', "[{device_id}] 🌙 Área escura - sem iluminação", device_id=self.device_id)
+        log.aviso('desconectando', "[{device_id}] 🔌 DESCONECTANDO do sistema - Processo será finalizado", device_id=self.device_id)
         
         # Finalizar processo após pequeno delay para enviar resposta
         import threading
         def finalizar():
             import time
             time.sleep(2)  # Aguarda 2 segundos para resposta ser enviada
+            if self.ao_desconectar:
+                self.ao_desconectar(self)
+                return
             import os
-            print(f"[{self.device_id}] 💀 Finalizando processo do poste")
+            log.aviso('processo_finalizado', "[{device_id}] 💀 Finalizando processo do poste", device_id=self.device_id)
+            encerrar_logs()  # os._exit não roda atexit: esvazia a fila antes
             os._exit(0)  # Força finalização do processo
         
         threading.Thread(target=finalizar, daemon=True).start()
@@ -163,11 +274,11 @@ class Poste:
     
     def SetIntensidade(self, request, context):
         if not self.poste_ativo:
-            print(f"[{self.device_id}] ❌ Poste inativo - comando ignorado")
+            log.aviso('comando_ignorado', "[{device_id}] ❌ Poste inativo - comando ignorado", device_id=self.device_id)
             return smart_city_pb2.Vazio()
             
         if not self.lampada_ligada:
-            print(f"[{self.device_id}] ⚠️  Lâmpada desligada - ligando automaticamente")
+            log.aviso('lampada_religada', "[{device_id}] ⚠️  Lâmpada desligada - ligando automaticamente", device_id=self.device_id)
             self.lampada_ligada = True
             
         # request pode ser um objeto ou um número
@@ -182,11 +293,11 @@ class Poste:
         if 0 <= intensidade <= 100:
             old_intensidade = self.intensidade
             self.intensidade = intensidade
-            print(f"[{self.device_id}] 💡 Intensidade: {old_intensidade}% → {self.intensidade}%")
+            log.info('intensidade_alterada', "[{device_id}] 💡 Intensidade: {old_intensidade}% → {intensidade}%", device_id=self.device_id, old_intensidade=old_intensidade, intensidade=self.intensidade)
             
             if intensidade == 0:
                 self.lampada_ligada = False
-                print(f"[{self.device_id}] 🌙 Lâmpada automaticamente desligada (intensidade 0%)")
+                log.info('lampada_desligada', "[{device_id}] 🌙 Lâmpada automaticamente desligada (intensidade 0%)", device_id=self.device_id)
                 
         return smart_city_pb2.Vazio()
         
@@ -194,31 +305,38 @@ class Poste:
         """Desativa completamente o poste - simula desconexão"""
         self.poste_ativo = False
         self.lampada_ligada = False
-        print(f"[{self.device_id}] 🔌 POSTE DESATIVADO - Simulando desconexão")
-        print(f"[{self.device_id}] ❌ Sistema offline - não responderá a comandos")
+        log.aviso('sistema_desativado', "[{device_id}] 🔌 POSTE DESATIVADO - Simulando desconexão", device_id=self.device_id)
+        log.aviso('sistema_desativado', "[{device_id}] ❌ Sistema offline - não responderá a comandos", device_id=self.device_id)
         return smart_city_pb2.Vazio()
         
     def AtivarPoste(self, request, context):
         """Reativa o poste"""
         self.poste_ativo = True
-        print(f"[{self.device_id}] 🔌 POSTE REATIVADO - Sistema online")
+        log.info('sistema_reativado', "[{device_id}] 🔌 POSTE REATIVADO - Sistema online", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def getStatus(self, request, context):
-        status = {
-            "poste_ativo": self.poste_ativo,
-            "lampada_ligada": self.lampada_ligada,
-            "intensidade": self.intensidade,
-            "status": "ONLINE" if self.poste_ativo else "OFFLINE"
-        }
-        print(f"[{self.device_id}] 📊 Status solicitado: {status}")
-        return StatusPoste(self.lampada_ligada, self.intensidade)
+        log.info('status_solicitado', "[{device_id}] 📊 Status solicitado: {estado} (lampada_ligada={lampada_ligada}, intensidade={intensidade}%)",
+                 device_id=self.device_id, estado="ONLINE" if self.poste_ativo else "OFFLINE",
+                 lampada_ligada=self.lampada_ligada, intensidade=self.intensidade)
+        return self.status_atual()
+    
+    def status_atual(self):
+        return smart_city_pb2.StatusPoste(
+            lampada_ligada=self.lampada_ligada,
+            intensidade=self.intensidade,
+            poste_ativo=self.poste_ativo
+        )
 
 # ================================
 # SEMÁFORO INTELIGENTE
 # ================================
-class Semaforo:
+class Semaforo(StatusObservavel):
+    CAMPOS_STATUS = ('estado_atual', 'tempo_vermelho', 'tempo_verde', 'tempo_amarelo', 'funcionando', 'modo_emergencia')
+    EVENTO_STATUS = smart_city_pb2.EventoStatusSemaforo
+
     def __init__(self, device_id="SEM001"):
+        super().__init__()
         self.device_id = device_id
         self.sistema_ativo = True  # Sistema geral
         self.funcionando = True    # Funcionamento do semáforo
@@ -229,16 +347,19 @@ class Semaforo:
         self.ciclo_thread = None
         self.modo_emergencia = False
         self.porta_grpc = 50054
+        self.ao_desconectar = None
+        self.agendador = None       # AgendadorSemaforos compartilhado (em vez de uma thread por semáforo)
+        self._ciclo_agendado = False
         
     def Ligar(self, request, context):
         if not self.sistema_ativo:
-            print(f"[{self.device_id}] ❌ Sistema inativo - comando ignorado")
+            log.aviso('comando_ignorado', "[{device_id}] ❌ Sistema inativo - comando ignorado", device_id=self.device_id)
             return smart_city_pb2.Vazio()
             
         self.funcionando = True
         self.modo_emergencia = False
         self._iniciar_ciclo()
-        print(f"[{self.device_id}] 🚦 Semáforo LIGADO - Iniciando ciclo normal")
+        log.info('semaforo_ligado', "[{device_id}] 🚦 Semáforo LIGADO - Iniciando ciclo normal", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def Desligar(self, request, context):
@@ -246,17 +367,21 @@ class Semaforo:
         self.modo_emergencia = False
         if self.ciclo_thread:
             self.ciclo_thread = None
-        print(f"[{self.device_id}] 🚦 Semáforo DESLIGADO - Todas as luzes apagadas")
-        print(f"[{self.device_id}] ⚠️  ATENÇÃO: Cruzamento sem sinalização!")
-        print(f"[{self.device_id}] 🔌 DESCONECTANDO do sistema - Processo será finalizado")
+        log.info('semaforo_desligado', "[{device_id}] 🚦 Semáforo DESLIGADO - Todas as luzes apagadas", device_id=self.device_id)
+        log.aviso('semaforo_desligado', "[{device_id}] ⚠️  ATENÇÃO: Cruzamento sem sinalização!", device_id=self.device_id)
+        log.aviso('desconectando', "[{device_id}] 🔌 DESCONECTANDO do sistema - Processo será finalizado", device_id=self.device_id)
         
         # Finalizar processo após pequeno delay para enviar resposta
         import threading
         def finalizar():
             import time
             time.sleep(2)  # Aguarda 2 segundos para resposta ser enviada
+            if self.ao_desconectar:
+                self.ao_desconectar(self)
+                return
             import os
-            print(f"[{self.device_id}] 💀 Finalizando processo do semáforo")
+            log.aviso('processo_finalizado', "[{device_id}] 💀 Finalizando processo do semáforo", device_id=self.device_id)
+            encerrar_logs()  # os._exit não roda atexit: esvazia a fila antes
             os._exit(0)  # Força finalização do processo
         
         threading.Thread(target=finalizar, daemon=True).start()
@@ -269,14 +394,14 @@ class Semaforo:
         self.modo_emergencia = False
         if self.ciclo_thread:
             self.ciclo_thread = None
-        print(f"[{self.device_id}] 🔌 SISTEMA DESATIVADO - Simulando desconexão total")
-        print(f"[{self.device_id}] ❌ Offline - não responderá a comandos")
+        log.aviso('sistema_desativado', "[{device_id}] 🔌 SISTEMA DESATIVADO - Simulando desconexão total", device_id=self.device_id)
+        log.aviso('sistema_desativado', "[{device_id}] ❌ Offline - não responderá a comandos", device_id=self.device_id)
         return smart_city_pb2.Vazio()
         
     def AtivarSistema(self, request, context):
         """Reativa o sistema do semáforo"""
         self.sistema_ativo = True
-        print(f"[{self.device_id}] 🔌 SISTEMA REATIVADO - Online novamente")
+        log.info('sistema_reativado', "[{device_id}] 🔌 SISTEMA REATIVADO - Online novamente", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def SetTempos(self, request, context):
@@ -290,12 +415,12 @@ class Semaforo:
             self.tempo_verde = request.get('tempo_verde', 25)
             self.tempo_amarelo = request.get('tempo_amarelo', 5)
         
-        print(f"[{self.device_id}] Tempos alterados - V:{self.tempo_vermelho}s G:{self.tempo_verde}s A:{self.tempo_amarelo}s")
+        log.info('tempos_alterados', "[{device_id}] Tempos alterados - V:{tempo_vermelho}s G:{tempo_verde}s A:{tempo_amarelo}s", device_id=self.device_id, tempo_vermelho=self.tempo_vermelho, tempo_verde=self.tempo_verde, tempo_amarelo=self.tempo_amarelo)
         return smart_city_pb2.Vazio()
     
     def ModoEmergencia(self, request, context):
         if not self.sistema_ativo:
-            print(f"[{self.device_id}] ❌ Sistema inativo - comando ignorado")
+            log.aviso('comando_ignorado', "[{device_id}] ❌ Sistema inativo - comando ignorado", device_id=self.device_id)
             return smart_city_pb2.Vazio()
             
         self.modo_emergencia = True
@@ -303,7 +428,7 @@ class Semaforo:
         self.funcionando = False
         if self.ciclo_thread:
             self.ciclo_thread = None
-        print(f"[{self.device_id}] 🚨 MODO EMERGÊNCIA ATIVADO - Amarelo intermitente")
+        log.aviso('modo_emergencia', "[{device_id}] 🚨 MODO EMERGÊNCIA ATIVADO - Amarelo intermitente", device_id=self.device_id)
         return smart_city_pb2.Vazio()
     
     def EmergenciaAmareloIntermitente(self, request, context):
@@ -324,7 +449,7 @@ class Semaforo:
             status = "DESLIGADO"
             estado = "TODAS_APAGADAS"
             
-        print(f"[{self.device_id}] Status: {status} | Estado: {estado}")
+        log.info('status_solicitado', "[{device_id}] Status: {status} | Estado: {estado}", device_id=self.device_id, status=status, estado=estado)
         return smart_city_pb2.Status(
             status=status,
             device_id=self.device_id,
@@ -333,20 +458,43 @@ class Semaforo:
         )
     
     def getStatus(self, request, context):
-        return StatusSemaforo(
-            self.estado_atual, 
-            self.tempo_vermelho, 
-            self.tempo_verde, 
-            self.tempo_amarelo, 
-            self.funcionando
+        return self.status_atual()
+    
+    def status_atual(self):
+        return smart_city_pb2.StatusSemaforo(
+            estado_atual=self.estado_atual,
+            tempo_vermelho=self.tempo_vermelho,
+            tempo_verde=self.tempo_verde,
+            tempo_amarelo=self.tempo_amarelo,
+            funcionando=self.funcionando,
+            modo_emergencia=self.modo_emergencia
         )
     
+    def _avancar_ciclo(self):
+        """Passa para a próxima cor; retorna os segundos até a seguinte (None encerra o ciclo)"""
+        if not self.funcionando or self.modo_emergencia:
+            self._ciclo_agendado = False
+            return None
+        proximo = {"VERMELHO": "VERDE", "VERDE": "AMARELO"}.get(self.estado_atual, "VERMELHO")
+        self.estado_atual = proximo
+        tempo = {"VERMELHO": self.tempo_vermelho, "VERDE": self.tempo_verde, "AMARELO": self.tempo_amarelo}[proximo]
+        log.info('ciclo_semaforo', "[{device_id}] {emoji} {estado} - {tempo}s", device_id=self.device_id,
+                 emoji={"VERMELHO": "🔴", "VERDE": "🟢", "AMARELO": "🟡"}[proximo], estado=proximo, tempo=tempo)
+        return tempo
+    
     def _iniciar_ciclo(self):
+        if self.agendador:
+            if not self._ciclo_agendado:
+                self._ciclo_agendado = True
+                self.estado_atual = "VERMELHO"
+                self.agendador.agendar(self, self.tempo_vermelho)
+            return
+        
         def ciclo_semaforo():
             while self.funcionando and not self.modo_emergencia:
                 # Vermelho
                 self.estado_atual = "VERMELHO"
-                print(f"[{self.device_id}] 🔴 VERMELHO - {self.tempo_vermelho}s")
+                log.info('ciclo_semaforo', "[{device_id}] 🔴 VERMELHO - {tempo_vermelho}s", device_id=self.device_id, tempo_vermelho=self.tempo_vermelho)
                 time.sleep(self.tempo_vermelho)
                 
                 if not self.funcionando or self.modo_emergencia:
@@ -354,7 +502,7 @@ class Semaforo:
                     
                 # Verde
                 self.estado_atual = "VERDE"
-                print(f"[{self.device_id}] 🟢 VERDE - {self.tempo_verde}s")
+                log.info('ciclo_semaforo', "[{device_id}] 🟢 VERDE - {tempo_verde}s", device_id=self.device_id, tempo_verde=self.tempo_verde)
                 time.sleep(self.tempo_verde)
                 
                 if not self.funcionando or self.modo_emergencia:
@@ -362,7 +510,7 @@ class Semaforo:
                     
                 # Amarelo
                 self.estado_atual = "AMARELO"
-                print(f"[{self.device_id}] 🟡 AMARELO - {self.tempo_amarelo}s")
+                log.info('ciclo_semaforo', "[{device_id}] 🟡 AMARELO - {tempo_amarelo}s", device_id=self.device_id, tempo_amarelo=self.tempo_amarelo)
                 time.sleep(self.tempo_amarelo)
         
         if self.ciclo_thread is None or not self.ciclo_thread.is_alive():
@@ -395,10 +543,10 @@ class MulticastDiscovery:
                 mreq = socket.inet_aton(self.multicast_group) + socket.inet_aton('0.0.0.0')
                 sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
             except Exception as e:
-                print(f"[{self.device_id}] Erro ao configurar multicast: {e}")
+                log.erro('descoberta_erro', "[{device_id}] Erro ao configurar multicast: {e}", device_id=self.device_id, e=e)
                 return
             
-            print(f"[{self.device_id}] Escutando descoberta multicast em {self.multicast_group}:{self.multicast_port}")
+            log.info('descoberta_escutando', "[{device_id}] Escutando descoberta multicast em {multicast_group}:{multicast_port}", device_id=self.device_id, multicast_group=self.multicast_group, multicast_port=self.multicast_port)
             
             while True:
                 try:
@@ -406,45 +554,48 @@ class MulticastDiscovery:
                     message = json.loads(data.decode())
                     
                     if message.get('type') == 'DISCOVERY_REQUEST':
-                        print(f"[{self.device_id}] Recebida solicitação de descoberta de {addr}")
-                        
-                        # Responder com informações do dispositivo
-                        response = {
-                            'type': 'DISCOVERY_RESPONSE',
-                            'device_type': self.device_type,
-                            'device_id': self.device_id,
-                            'ip': '127.0.0.1',  # Usar localhost para compatibilidade
-                            'grpc_port': self.grpc_port,
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        
-                        # Registrar via HTTP também (mais confiável)
-                        try:
-                            import requests
-                            gateway_url = f"http://{addr[0]}:5000/api/discovery/register"
-                            requests.post(gateway_url, json=response, timeout=2)
-                            print(f"[{self.device_id}] Registrado via HTTP no Gateway")
-                        except:
-                            pass  # Falha silenciosa se HTTP não funcionar
-                        
-                        # Usar porta de resposta especificada ou porta de origem (UDP)
-                        response_port = message.get('response_port', addr[1])
-                        
-                        # Enviar resposta UDP também
-                        response_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                        response_sock.sendto(
-                            json.dumps(response).encode(), 
-                            (addr[0], response_port)
-                        )
-                        response_sock.close()
-                        
-                        print(f"[{self.device_id}] Resposta enviada para Gateway na porta {response_port}")
+                        log.debug('descoberta_recebida', "[{device_id}] Recebida solicitação de descoberta de {addr}", device_id=self.device_id, addr=addr)
+                        self._responder(message, addr)
                         
                 except Exception as e:
-                    print(f"[{self.device_id}] Erro na descoberta: {e}")
+                    log.erro('descoberta_erro', "[{device_id}] Erro na descoberta: {e}", device_id=self.device_id, e=e)
         
         discovery_thread = threading.Thread(target=listen_discovery, daemon=True)
         discovery_thread.start()
+    
+    def _responder(self, message, addr):
+        """Responde uma DISCOVERY_REQUEST (HTTP + UDP)"""
+        # Responder com informações do dispositivo
+        response = {
+            'type': 'DISCOVERY_RESPONSE',
+            'device_type': self.device_type,
+            'device_id': self.device_id,
+            'ip': '127.0.0.1',  # Usar localhost para compatibilidade
+            'grpc_port': self.grpc_port,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Registrar via HTTP também (mais confiável)
+        try:
+            import requests
+            gateway_url = f"http://{addr[0]}:5000/api/discovery/register"
+            requests.post(gateway_url, json=response, timeout=2)
+            log.debug('registrado_http', "[{device_id}] Registrado via HTTP no Gateway", device_id=self.device_id)
+        except:
+            pass  # Falha silenciosa se HTTP não funcionar
+        
+        # Usar porta de resposta especificada ou porta de origem (UDP)
+        response_port = message.get('response_port', addr[1])
+        
+        # Enviar resposta UDP também
+        response_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        response_sock.sendto(
+            json.dumps(response).encode(), 
+            (addr[0], response_port)
+        )
+        response_sock.close()
+        
+        log.debug('descoberta_respondida', "[{device_id}] Resposta enviada para Gateway na porta {response_port}", device_id=self.device_id, response_port=response_port)
 
 # ================================
 # SERVICER CLASSES PARA GRPC
@@ -470,6 +621,9 @@ class CameraServicer:
     
     def getStatus(self, request, context):
         return self.camera.getStatus(request, context)
+    
+    def WatchStatus(self, request, context):
+        return self.camera.WatchStatus(request, context)
 
 class PosteServicer:
     def __init__(self, poste):
@@ -486,6 +640,9 @@ class PosteServicer:
     
     def getStatus(self, request, context):
         return self.poste.getStatus(request, context)
+    
+    def WatchStatus(self, request, context):
+        return self.poste.WatchStatus(request, context)
 
 class SemaforoServicer:
     def __init__(self, semaforo):
@@ -505,6 +662,233 @@ class SemaforoServicer:
     
     def getStatus(self, request, context):
         return self.semaforo.getStatus(request, context)
+    
+    def WatchStatus(self, request, context):
+        return self.semaforo.WatchStatus(request, context)
+
+# ================================
+# HOST DE VÁRIOS DISPOSITIVOS
+# ================================
+class AgendadorSemaforos:
+    """Uma única thread avança o ciclo de todos os semáforos de um host"""
+    def __init__(self):
+        self._fila = []   # heap de (instante, sequência, semáforo)
+        self._sequencia = itertools.count()
+        self._condicao = threading.Condition()
+        threading.Thread(target=self._executar, daemon=True).start()
+
+    def agendar(self, semaforo, espera):
+        with self._condicao:
+            heapq.heappush(self._fila, (time.monotonic() + espera, next(self._sequencia), semaforo))
+            self._condicao.notify()
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                while not self._fila:
+                    self._condicao.wait()
+                instante, _, semaforo = self._fila[0]
+                espera = instante - time.monotonic()
+                if espera > 0:
+                    self._condicao.wait(espera)
+                    continue
+                heapq.heappop(self._fila)
+            try:
+                proxima = semaforo._avancar_ciclo()
+            except Exception as e:
+                log.erro('ciclo_erro', "[{device_id}] Erro no ciclo do semáforo: {e}", device_id=semaforo.device_id, e=e)
+                continue
+            if proxima is not None:
+                self.agendar(semaforo, proxima)
+
+class ServicerRoteado:
+    """Servicer de um serviço do host: cada RPC vai para o dispositivo do metadata 'device-id'"""
+    def __init__(self, host, device_type):
+        self.host = host
+        self.device_type = device_type
+
+    def WatchStatus(self, request, context):
+        # Sem 'device-id': um único stream com todos os dispositivos deste tipo no host
+        if 'device-id' not in dict(context.invocation_metadata()):
+            return self.host.assistir(self.device_type, context)
+        return self.host.resolver(self.device_type, context).WatchStatus(request, context)
+
+    def __getattr__(self, metodo):
+        if metodo.startswith('_'):
+            raise AttributeError(metodo)
+        host, device_type = self.host, self.device_type
+        def encaminhar(request, context):
+            return getattr(host.resolver(device_type, context), metodo)(request, context)
+        return encaminhar
+
+class DescobertaHost(MulticastDiscovery):
+    """Um listener multicast anunciando todos os dispositivos do host, em lotes"""
+    def __init__(self, host, por_datagrama=100):
+        super().__init__('HOST', host.host_id, host.port)
+        self.host = host
+        self.por_datagrama = por_datagrama
+
+    def _responder(self, message, addr):
+        dispositivos = [
+            {'device_id': device_id, 'device_type': device_type}
+            for device_id, device_type in self.host.listar()
+        ]
+        base = {
+            'type': 'DISCOVERY_RESPONSE_LOTE',
+            'host_id': self.host.host_id,
+            'ip': '127.0.0.1',
+            'grpc_port': self.host.port,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Um único POST com o host inteiro
+        try:
+            import requests
+            requests.post(f"http://{addr[0]}:5000/api/discovery/register",
+                          json={**base, 'devices': dispositivos}, timeout=5)
+        except:
+            pass  # Falha silenciosa se HTTP não funcionar
+        
+        # UDP em datagramas de até `por_datagrama` dispositivos
+        response_port = message.get('response_port', addr[1])
+        response_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for inicio in range(0, len(dispositivos), self.por_datagrama):
+                lote = dispositivos[inicio:inicio + self.por_datagrama]
+                response_sock.sendto(json.dumps({**base, 'devices': lote}).encode(), (addr[0], response_port))
+        finally:
+            response_sock.close()
+        
+        log.info('descoberta_respondida', "[{host_id}] {n} dispositivos anunciados para o Gateway",
+                 host_id=self.host.host_id, n=len(dispositivos))
+
+class HostDispositivos:
+    """Muitos dispositivos virtuais atrás de um único servidor gRPC e um único listener multicast.
+
+    Cada serviço (Camera, Poste, Semaforo) é registrado uma vez com um
+    ServicerRoteado; o Gateway indica o dispositivo de cada chamada no metadata
+    'device-id'. Os semáforos compartilham um AgendadorSemaforos e, ao serem
+    desligados, os dispositivos saem do host em vez de encerrar o processo.
+    WatchStatus sem 'device-id' devolve um único stream com todos os
+    dispositivos do tipo.
+    """
+    CLASSES = {'CAMERA': Camera, 'POSTE': Poste, 'SEMAFORO': Semaforo}
+    PREFIXOS = {'CAMERA': 'CAM', 'POSTE': 'POST', 'SEMAFORO': 'SEM'}
+
+    def __init__(self, port, host_id=None, max_workers=32):
+        self.port = port
+        self.host_id = host_id or f"HOST{port}"
+        self.max_workers = max_workers
+        self.dispositivos = {}   # device_id -> instância
+        self.tipos = {}          # device_id -> tipo
+        self._lock = threading.Lock()
+        self.agendador = AgendadorSemaforos()
+        self.assinaturas = {tipo: set() for tipo in self.CLASSES}  # streams WatchStatus do host por tipo
+        self.server = None
+
+    def adicionar(self, device_type, device_id):
+        dispositivo = self.CLASSES[device_type](device_id)
+        dispositivo.porta_grpc = self.port
+        dispositivo.ao_desconectar = self.remover
+        dispositivo.ao_mudar_status = self._status_mudou
+        with self._lock:
+            self.dispositivos[device_id] = dispositivo
+            self.tipos[device_id] = device_type
+            assinaturas = list(self.assinaturas[device_type])
+        for assinatura in assinaturas:
+            assinatura.marcar(device_id)
+        if device_type == 'SEMAFORO':
+            dispositivo.agendador = self.agendador
+            dispositivo.Ligar(None, None)  # Iniciar ciclo automaticamente
+        return dispositivo
+
+    def adicionar_varios(self, device_type, quantidade, inicio_id=1):
+        prefixo = self.PREFIXOS[device_type]
+        for numero in range(inicio_id, inicio_id + quantidade):
+            self.adicionar(device_type, f"{prefixo}{numero:05d}")
+
+    def remover(self, dispositivo):
+        with self._lock:
+            self.dispositivos.pop(dispositivo.device_id, None)
+            self.tipos.pop(dispositivo.device_id, None)
+        dispositivo.encerrar_status()
+        log.aviso('dispositivo_removido', "[{device_id}] 🔌 Removido do host {host_id}",
+                  device_id=dispositivo.device_id, host_id=self.host_id)
+
+    def listar(self):
+        with self._lock:
+            return list(self.tipos.items())
+
+    def _status_mudou(self, dispositivo):
+        with self._lock:
+            tipo = self.tipos.get(dispositivo.device_id)
+            assinaturas = list(self.assinaturas[tipo]) if tipo else []
+        for assinatura in assinaturas:
+            assinatura.marcar(dispositivo.device_id)
+
+    def assistir(self, device_type, context):
+        """Stream WatchStatus de todos os dispositivos de um tipo (uma thread do servidor por stream, não por dispositivo)"""
+        assinatura = AssinaturaStatus()
+        with self._lock:
+            self.assinaturas[device_type].add(assinatura)
+            iniciais = [device_id for device_id, tipo in self.tipos.items() if tipo == device_type]
+        try:
+            yield from transmitir_status(context, assinatura, self.dispositivos.get, iniciais)
+        finally:
+            with self._lock:
+                self.assinaturas[device_type].discard(assinatura)
+
+    def resolver(self, device_type, context):
+        """Dispositivo alvo de uma chamada; aborta a RPC se não existir"""
+        device_id = dict(context.invocation_metadata()).get('device-id')
+        with self._lock:
+            if device_id is None:
+                # Cliente sem metadata: só dá para rotear se houver um único dispositivo do tipo
+                candidatos = [i for i, tipo in self.tipos.items() if tipo == device_type]
+                if len(candidatos) == 1:
+                    device_id = candidatos[0]
+            dispositivo = self.dispositivos.get(device_id)
+            tipo = self.tipos.get(device_id)
+        
+        if device_id is None:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "metadata 'device-id' obrigatório neste host")
+        if dispositivo is None or tipo != device_type:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"{device_type} {device_id} não existe no host {self.host_id}")
+        return dispositivo
+
+    def iniciar(self):
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.max_workers))
+        smart_city_pb2_grpc.add_CameraServicer_to_server(ServicerRoteado(self, 'CAMERA'), self.server)
+        smart_city_pb2_grpc.add_PosteServicer_to_server(ServicerRoteado(self, 'POSTE'), self.server)
+        smart_city_pb2_grpc.add_SemaforoServicer_to_server(ServicerRoteado(self, 'SEMAFORO'), self.server)
+        self.server.add_insecure_port(f'127.0.0.1:{self.port}')
+        self.server.start()
+        DescobertaHost(self).start_discovery_listener()
+        
+        contagem = {}
+        for _, device_type in self.listar():
+            contagem[device_type] = contagem.get(device_type, 0) + 1
+        log.info('host_iniciado', "[{host_id}] {total} dispositivos na porta {port}: {contagem}",
+                 host_id=self.host_id, total=sum(contagem.values()), port=self.port, contagem=contagem)
+        return self.server
+
+def serve_host(port, cameras=0, postes=0, semaforos=0, inicio_id=1, max_workers=32):
+    """Inicia um host com vários dispositivos virtuais em uma única porta gRPC"""
+    # Com milhares de dispositivos, limita as linhas repetidas no console
+    configurar_evento('ciclo_semaforo', por_segundo=2)
+    
+    host = HostDispositivos(port, max_workers=max_workers)
+    host.adicionar_varios('CAMERA', cameras, inicio_id)
+    host.adicionar_varios('POSTE', postes, inicio_id)
+    host.adicionar_varios('SEMAFORO', semaforos, inicio_id)
+    server = host.iniciar()
+    
+    try:
+        while True:
+            time.sleep(86400)  # 24 horas
+    except KeyboardInterrupt:
+        log.info('servidor_parado', "[{host_id}] Parando servidor...", host_id=host.host_id)
+        server.stop(0)
 
 # ================================
 # SERVIDOR GRPC PARA DISPOSITIVOS
@@ -527,7 +911,7 @@ def serve_device(device_type, device_id, port):
         device_instance = camera
         # Usar a função gerada pelo protobuf
         smart_city_pb2_grpc.add_CameraServicer_to_server(camera_servicer, server)
-        print(f"[{device_id}] Câmera iniciada na porta {port}")
+        log.info('dispositivo_iniciado', "[{device_id}] Câmera iniciada na porta {port}", device_id=device_id, port=port)
         
     elif device_type == "POSTE":
         poste = Poste(device_id)
@@ -535,7 +919,7 @@ def serve_device(device_type, device_id, port):
         device_instance = poste
         # Usar a função gerada pelo protobuf
         smart_city_pb2_grpc.add_PosteServicer_to_server(poste_servicer, server)
-        print(f"[{device_id}] Poste iniciado na porta {port}")
+        log.info('dispositivo_iniciado', "[{device_id}] Poste iniciado na porta {port}", device_id=device_id, port=port)
         
     elif device_type == "SEMAFORO":
         semaforo = Semaforo(device_id)
@@ -544,29 +928,46 @@ def serve_device(device_type, device_id, port):
         # Usar a função gerada pelo protobuf
         smart_city_pb2_grpc.add_SemaforoServicer_to_server(semaforo_servicer, server)
         semaforo.Ligar(None, None)  # Iniciar ciclo automaticamente
-        print(f"[{device_id}] Semáforo iniciado na porta {port}")
+        log.info('dispositivo_iniciado', "[{device_id}] Semáforo iniciado na porta {port}", device_id=device_id, port=port)
     
     try:
         server.add_insecure_port(f'127.0.0.1:{port}')
         server.start()
-        print(f"[{device_id}] Servidor gRPC rodando na porta {port}")
+        log.info('servidor_iniciado', "[{device_id}] Servidor gRPC rodando na porta {port}", device_id=device_id, port=port)
     except Exception as e:
-        print(f"[{device_id}] ERRO: Não foi possível iniciar servidor gRPC na porta {port}: {e}")
-        print(f"[{device_id}] Tentando apenas descoberta multicast sem gRPC...")
+        log.erro('servidor_erro', "[{device_id}] ERRO: Não foi possível iniciar servidor gRPC na porta {port}: {e}", device_id=device_id, port=port, e=e)
+        log.aviso('servidor_erro', "[{device_id}] Tentando apenas descoberta multicast sem gRPC...", device_id=device_id)
         # Continua apenas com descoberta multicast
     
     try:
         while True:
             time.sleep(86400)  # 24 horas
     except KeyboardInterrupt:
-        print(f"[{device_id}] Parando servidor...")
+        log.info('servidor_parado', "[{device_id}] Parando servidor...", device_id=device_id)
         server.stop(0)
 
 if __name__ == "__main__":
     import sys
     
+    if len(sys.argv) > 1 and sys.argv[1] == "HOST":
+        import argparse
+        parser = argparse.ArgumentParser(
+            prog="python Dispositivos.py HOST",
+            description="Vários dispositivos virtuais em um único servidor gRPC"
+        )
+        parser.add_argument('porta', type=int)
+        parser.add_argument('--cameras', type=int, default=0)
+        parser.add_argument('--postes', type=int, default=0)
+        parser.add_argument('--semaforos', type=int, default=0)
+        parser.add_argument('--inicio-id', type=int, default=1, help='número do primeiro ID (CAM00001...)')
+        parser.add_argument('--workers', type=int, default=32, help='threads do servidor gRPC')
+        args = parser.parse_args(sys.argv[2:])
+        serve_host(args.porta, args.cameras, args.postes, args.semaforos, args.inicio_id, args.workers)
+        sys.exit(0)
+    
     if len(sys.argv) != 4:
         print("Uso: python Dispositivos.py <TIPO> <ID> <PORTA>")
+        print("     python Dispositivos.py HOST <PORTA> [--cameras N] [--postes N] [--semaforos N]")
         print("Tipos: CAMERA, POSTE, SEMAFORO")
         print("Exemplo: python Dispositivos.py CAMERA CAM001 50052")
         sys.exit(1)
@@ -0,0 +1,98 @@
+import json
+import os
+import smart_city_pb2
+
+# ================================
+# FORMATO DAS LEITURAS NO BROKER
+# ================================
+# Os sensores publicam em JSON (padrão, compatível com consumidores antigos) ou
+# em protobuf (DadosTemperatura / DadosQualidadeAr do smart_city.proto). O
+# formato vai no content_type da mensagem AMQP, então publicadores nos dois
+# formatos podem conviver na mesma fila.
+#
+# Variável de ambiente:
+#   CIDADE_SENSORES_FORMATO  json (padrão) ou protobuf
+
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_PROTOBUF = 'application/x-protobuf'
+
+FORMATOS = {
+    'json': CONTENT_TYPE_JSON,
+    'protobuf': CONTENT_TYPE_PROTOBUF
+}
+
+# Campos que o protobuf não transporta: são fixos para cada tipo de sensor
+CAMPOS_IMPLICITOS = {
+    'temperatura': {'tipo': 'temperatura', 'unidade': '°C'},
+    'qualidade_ar': {'tipo': 'qualidade_ar'}
+}
+
+def formato_padrao():
+    formato = os.environ.get('CIDADE_SENSORES_FORMATO', 'json').lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de sensores desconhecido: {formato} (use {', '.join(FORMATOS)})")
+    return formato
+
+def codificar_leitura(tipo, dados, formato='json'):
+    """Retorna (body, content_type) de uma leitura no formato pedido"""
+    if formato == 'json':
+        return json.dumps(dados).encode(), CONTENT_TYPE_JSON
+
+    if tipo == 'temperatura':
+        mensagem = smart_city_pb2.DadosTemperatura(
+            temperatura=dados['valor'],
+            timestamp=dados['timestamp'],
+            sensor_id=dados['sensor_id'],
+            localizacao=dados.get('localizacao', '')
+        )
+    elif tipo == 'qualidade_ar':
+        mensagem = smart_city_pb2.DadosQualidadeAr(
+            co2=dados['co2'],
+            pm25=dados['pm25'],
+            pm10=dados['pm10'],
+            timestamp=dados['timestamp'],
+            sensor_id=dados['sensor_id'],
+            localizacao=dados.get('localizacao', ''),
+            qualidade=dados.get('qualidade', ''),
+            nivel_risco=dados.get('nivel_risco', '')
+        )
+    else:
+        raise ValueError(f"Tipo de sensor desconhecido: {tipo}")
+    return mensagem.SerializeToString(), CONTENT_TYPE_PROTOBUF
+
+def decodificar_leitura(tipo, body, content_type=None):
+    """Converte o body de uma mensagem no mesmo dicionário que o sensor publicou em JSON.
+
+    Sem content_type (publicadores antigos) assume JSON.
+    """
+    if content_type != CONTENT_TYPE_PROTOBUF:
+        if content_type not in (None, '', CONTENT_TYPE_JSON):
+            raise ValueError(f"content_type não suportado: {content_type}")
+        return json.loads(body)
+
+    if tipo == 'temperatura':
+        mensagem = smart_city_pb2.DadosTemperatura.FromString(body)
+        dados = {
+            'sensor_id': mensagem.sensor_id,
+            # float32 no fio: volta para a precisão publicada pelo sensor
+            'valor': round(mensagem.temperatura, 2),
+            'timestamp': mensagem.timestamp
+        }
+    elif tipo == 'qualidade_ar':
+        mensagem = smart_city_pb2.DadosQualidadeAr.FromString(body)
+        dados = {
+            'sensor_id': mensagem.sensor_id,
+            'co2': round(mensagem.co2, 1),
+            'pm25': round(mensagem.pm25, 1),
+            'pm10': round(mensagem.pm10, 1),
+            'qualidade': mensagem.qualidade,
+            'nivel_risco': mensagem.nivel_risco,
+            'timestamp': mensagem.timestamp
+        }
+    else:
+        raise ValueError(f"Tipo de sensor desconhecido: {tipo}")
+
+    dados.update(CAMPOS_IMPLICITOS[tipo])
+    if mensagem.localizacao:
+        dados['localizacao'] = mensagem.localizacao
+    return dados
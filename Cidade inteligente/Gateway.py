@@ -1,33 +1,919 @@
+import asyncio
 import grpc
+import os
 import socket
 import json
+import math
 import time
 import threading
-import pika
-from flask import Flask, jsonify, request, render_template
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+import uuid
+import queue
+from flask import Flask, Response, jsonify, request, render_template
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future, ThreadPoolExecutor, wait, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
 import smart_city_pb2
 import smart_city_pb2_grpc
+from ArmazenamentoSensores import HistoricoSensores, AgregadorMultiResolucao, ArmazemSegmentos, ArmazemParticionado, iso_para_us, agora_us
+from LogCidade import obter_logger, configurar_evento, estatisticas_logs
+from IngestaoSensores import ConsumidorSensores, PoolIngestao
+from FormatoSensores import decodificar_leitura
 
-class GatewayInteligente:
+log = obter_logger('gateway')
+# Leituras chegam a milhares por segundo: no console só uma amostra limitada
+configurar_evento('temperatura_recebida', por_segundo=5)
+configurar_evento('qualidade_ar_recebida', por_segundo=5)
+
+# ================================
+# POOL DE CANAIS gRPC
+# ================================
+class PoolCanaisGRPC:
+    """Mantém canais gRPC persistentes (e seus stubs) por endereço de dispositivo"""
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout  # segundos sem uso antes de fechar o canal
+        self.opcoes = [
+            ('grpc.keepalive_time_ms', 30000),
+            ('grpc.keepalive_timeout_ms', 5000),
+            ('grpc.keepalive_permit_without_calls', True),
+            ('grpc.http2.max_pings_without_data', 0)
+        ]
+        self._canais = {}  # endereco -> {'canal', 'stubs', 'ultimo_uso'}
+        self._lock = threading.Lock()
+
+    def _obter_entrada(self, endereco):
+        entrada = self._canais.get(endereco)
+        if entrada is None:
+            entrada = {
+                'canal': grpc.insecure_channel(endereco, options=self.opcoes),
+                'stubs': {},
+                'ultimo_uso': time.time()
+            }
+            self._canais[endereco] = entrada
+        return entrada
+
+    def aquecer(self, endereco):
+        """Abre o canal e inicia a conexão TCP/HTTP2 sem bloquear"""
+        with self._lock:
+            entrada = self._obter_entrada(endereco)
+            entrada['ultimo_uso'] = time.time()
+        # channel_ready_future dispara a conexão em background (try_to_connect)
+        grpc.channel_ready_future(entrada['canal'])
+
+    def obter_canal(self, endereco, marcar_uso=True):
+        """Retorna o canal persistente do endereço, criando-o se necessário"""
+        with self._lock:
+            entrada = self._obter_entrada(endereco)
+            if marcar_uso:
+                entrada['ultimo_uso'] = time.time()
+            return entrada['canal']
+
+    def obter_stub(self, endereco, stub_class):
+        """Retorna um stub reutilizável para o endereço"""
+        with self._lock:
+            entrada = self._obter_entrada(endereco)
+            entrada['ultimo_uso'] = time.time()
+            stub = entrada['stubs'].get(stub_class)
+            if stub is None:
+                stub = stub_class(entrada['canal'])
+                entrada['stubs'][stub_class] = stub
+            return stub
+
+    def remover(self, endereco):
+        """Fecha e remove o canal de um endereço"""
+        with self._lock:
+            entrada = self._canais.pop(endereco, None)
+        if entrada:
+            entrada['canal'].close()
+
+    def limpar_ociosos(self):
+        """Fecha canais sem uso há mais de idle_timeout segundos"""
+        limite = time.time() - self.idle_timeout
+        with self._lock:
+            ociosos = [e for e, entrada in self._canais.items() if entrada['ultimo_uso'] < limite]
+            removidos = [self._canais.pop(e) for e in ociosos]
+        for entrada in removidos:
+            entrada['canal'].close()
+        return ociosos
+
+    def fechar_todos(self):
+        with self._lock:
+            entradas = list(self._canais.values())
+            self._canais.clear()
+        for entrada in entradas:
+            entrada['canal'].close()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'canais_abertos': len(self._canais),
+                'enderecos': list(self._canais.keys())
+            }
+
+# ================================
+# REGISTRO DE DISPOSITIVOS
+# ================================
+class RegistroDispositivos:
+    """Registro versionado de dispositivos com mesclagem incremental e expiração por lease.
+
+    Leituras (values/items/get) retornam cópias, seguras para iterar enquanto
+    descoberta, health check e rotas HTTP alteram o registro em paralelo.
+    """
+    CAMPOS_IDENTIDADE = ('tipo', 'ip', 'porta_grpc', 'endereco')
+
+    def __init__(self, lease=300, ao_alterar=None):
+        self.lease = lease      # segundos sem ser visto antes de expirar
+        self.versao = 0         # incrementada a cada mudança visível no registro
+        self.modificado_em = time.time()
+        self.ao_alterar = ao_alterar  # callback(acao, dispositivo, versao), chamado fora do lock
+        self._dispositivos = {}
+        self._visto_em = {}     # device_id -> time.time() da última resposta
+        self._lock = threading.Lock()
+
+    def _notificar(self, acao, dispositivo, versao):
+        if self.ao_alterar:
+            self.ao_alterar(acao, dispositivo, versao)
+
+    def registrar(self, dispositivo):
+        """Mescla um dispositivo; retorna (resultado, anterior) com resultado em novo/atualizado/inalterado"""
+        device_id = dispositivo['id']
+        with self._lock:
+            self._visto_em[device_id] = time.time()
+            anterior = self._dispositivos.get(device_id)
+            if anterior is None:
+                resultado = 'novo'
+            elif any(anterior.get(c) != dispositivo.get(c) for c in self.CAMPOS_IDENTIDADE):
+                resultado = 'atualizado'
+                # Mantém a data da primeira descoberta
+                dispositivo['timestamp_descoberta'] = anterior.get('timestamp_descoberta', dispositivo.get('timestamp_descoberta'))
+            else:
+                return 'inalterado', anterior
+            self._dispositivos[device_id] = dispositivo
+            self.versao += 1
+            self.modificado_em = time.time()
+            versao = self.versao
+        self._notificar(resultado, dispositivo, versao)
+        return resultado, anterior
+
+    def remover(self, device_id):
+        with self._lock:
+            self._visto_em.pop(device_id, None)
+            dispositivo = self._dispositivos.pop(device_id, None)
+            if dispositivo is None:
+                return None
+            self.versao += 1
+            self.modificado_em = time.time()
+            versao = self.versao
+        self._notificar('removido', dispositivo, versao)
+        return dispositivo
+
+    def expirar(self):
+        """Remove dispositivos não vistos há mais de `lease` segundos; retorna os removidos"""
+        limite = time.time() - self.lease
+        with self._lock:
+            expirados = [d for d, visto in self._visto_em.items() if visto < limite]
+            removidos = []
+            for device_id in expirados:
+                del self._visto_em[device_id]
+                removidos.append(self._dispositivos.pop(device_id))
+            if removidos:
+                self.versao += 1
+                self.modificado_em = time.time()
+            versao = self.versao
+        for dispositivo in removidos:
+            self._notificar('expirado', dispositivo, versao)
+        return removidos
+
+    def renovar(self, device_id):
+        """Renova o lease de um dispositivo já registrado (ex.: evento de status recebido)"""
+        with self._lock:
+            if device_id not in self._dispositivos:
+                return False
+            self._visto_em[device_id] = time.time()
+            return True
+
+    def visto_em(self, device_id):
+        return self._visto_em.get(device_id)
+
+    def get(self, device_id, default=None):
+        return self._dispositivos.get(device_id, default)
+
+    def __getitem__(self, device_id):
+        return self._dispositivos[device_id]
+
+    def __contains__(self, device_id):
+        return device_id in self._dispositivos
+
+    def __len__(self):
+        return len(self._dispositivos)
+
+    def values(self):
+        with self._lock:
+            return list(self._dispositivos.values())
+
+    def items(self):
+        with self._lock:
+            return list(self._dispositivos.items())
+
+# ================================
+# JOBS DE DESCOBERTA
+# ================================
+class JobDescoberta:
+    """Uma rodada de descoberta multicast executada em background"""
     def __init__(self):
-        self.dispositivos_conectados = {}
+        self.id = uuid.uuid4().hex[:12]
+        self.status = 'executando'  # executando, concluida, erro
+        self.inicio = datetime.now()
+        self.fim = None
+        self.dispositivos = []   # preenchida conforme os dispositivos respondem
+        self.solicitacoes = 1    # quantos disparos foram agrupados nesta rodada
+        self.evento = threading.Event()
+
+    def concluir(self, status):
+        self.status = status
+        self.fim = datetime.now()
+        self.evento.set()
+
+    def para_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'inicio': self.inicio.isoformat(),
+            'fim': self.fim.isoformat() if self.fim else None,
+            'solicitacoes_agrupadas': self.solicitacoes,
+            'total_encontrados': len(self.dispositivos),
+            'dispositivos': list(self.dispositivos)
+        }
+
+# ================================
+# EVENTOS EM TEMPO REAL (SSE)
+# ================================
+class BarramentoEventos:
+    """Distribui eventos para os clientes conectados em /api/eventos (Server-Sent Events).
+
+    Cada evento é serializado uma única vez e colocado na fila de cada inscrito;
+    inscritos lentos perdem os eventos mais antigos em vez de bloquear quem publica.
+    """
+    def __init__(self, tamanho_fila=256, keepalive=15):
+        self.tamanho_fila = tamanho_fila
+        self.keepalive = keepalive   # segundos entre comentários para manter a conexão
+        self.sequencia = 0
+        self._inscritos = {}
+        self._lock = threading.Lock()
+
+    def inscrever(self):
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        inscricao = uuid.uuid4().hex
+        with self._lock:
+            self._inscritos[inscricao] = fila
+        return inscricao, fila
+
+    def cancelar(self, inscricao):
+        with self._lock:
+            self._inscritos.pop(inscricao, None)
+
+    def publicar(self, tipo, dados):
+        with self._lock:
+            if not self._inscritos:
+                return
+            self.sequencia += 1
+            mensagem = f"id: {self.sequencia}\nevent: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n".encode()
+            filas = list(self._inscritos.values())
+        for fila in filas:
+            while True:
+                try:
+                    fila.put_nowait(mensagem)
+                    break
+                except queue.Full:
+                    try:
+                        fila.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def fluxo(self, inscricao, fila):
+        """Gerador usado como corpo da resposta HTTP do stream"""
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    yield fila.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+        finally:
+            self.cancelar(inscricao)
+
+    def __len__(self):
+        return len(self._inscritos)
+
+# ================================
+# CACHE DE RESPOSTAS PRÉ-SERIALIZADAS
+# ================================
+class CacheRespostas:
+    """Guarda o JSON já codificado (bytes) de endpoints de leitura, indexado pela versão dos dados.
+
+    Uma entrada só é reconstruída quando a versão (o mesmo valor usado no ETag)
+    muda; requisições concorrentes durante a reconstrução esperam a primeira
+    em vez de montar o mesmo payload em paralelo.
+    """
+    def __init__(self):
+        self._entradas = {}   # nome -> (versao, bytes)
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.reconstrucoes = 0
+
+    def _lock_da_entrada(self, nome):
+        with self._lock:
+            return self._locks.setdefault(nome, threading.Lock())
+
+    def obter(self, nome, versao, construir):
+        entrada = self._entradas.get(nome)
+        if entrada and entrada[0] == versao:
+            self.acertos += 1
+            return entrada[1]
+        with self._lock_da_entrada(nome):
+            entrada = self._entradas.get(nome)
+            if entrada and entrada[0] == versao:
+                self.acertos += 1
+                return entrada[1]
+            corpo = json.dumps(construir(), ensure_ascii=False).encode('utf-8')
+            self._entradas[nome] = (versao, corpo)
+            self.reconstrucoes += 1
+            return corpo
+
+    def estatisticas(self):
+        return {
+            'entradas': len(self._entradas),
+            'acertos': self.acertos,
+            'reconstrucoes': self.reconstrucoes,
+            'bytes': sum(len(corpo) for _, corpo in self._entradas.values())
+        }
+
+# ================================
+# EXECUÇÃO DE COMANDOS gRPC (PRAZOS + DISJUNTORES)
+# ================================
+class CircuitoAberto(Exception):
+    """Comando recusado sem chamar o dispositivo (disjuntor aberto ou limite de chamadas)"""
+    def __init__(self, mensagem, nova_tentativa_s=1):
+        super().__init__(mensagem)
+        self.nova_tentativa_s = nova_tentativa_s  # vira o Retry-After da resposta HTTP
+
+class DispositivoDesconhecido(Exception):
+    """Comando para um device_id que não está no registro"""
+
+class DisjuntorDispositivo:
+    """Circuit breaker de um dispositivo: fechado -> aberto após falhas seguidas -> meio_aberto (uma tentativa)"""
+    def __init__(self, device_id, limite_falhas=3, tempo_aberto=30, max_simultaneas=4, ao_mudar=None):
+        self.device_id = device_id
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.max_simultaneas = max_simultaneas
+        self.ao_mudar = ao_mudar
+        self.estado = 'fechado'
+        self.falhas_seguidas = 0
+        self.aberto_em = None
+        self.em_andamento = 0
+        self.ultimo_erro = None
+        self.contadores = {'sucessos': 0, 'falhas': 0, 'recusados': 0, 'aberturas': 0}
+        self._lock = threading.Lock()
+
+    def _mudar(self, estado):
+        # Chamado com o lock; a notificação sai depois
+        anterior, self.estado = self.estado, estado
+        return (anterior, estado) if anterior != estado else None
+
+    def _notificar(self, mudanca):
+        if mudanca and self.ao_mudar:
+            self.ao_mudar(self, *mudanca)
+
+    def permitir(self):
+        """Reserva uma chamada; lança CircuitoAberto se o dispositivo não deve ser chamado agora"""
+        mudanca = None
+        with self._lock:
+            if self.estado == 'aberto':
+                restante = self.aberto_em + self.tempo_aberto - time.time()
+                if restante > 0:
+                    self.contadores['recusados'] += 1
+                    raise CircuitoAberto(f"circuito aberto para {self.device_id} (nova tentativa em {int(restante) + 1}s)",
+                                         int(restante) + 1)
+                mudanca = self._mudar('meio_aberto')
+            if self.estado == 'meio_aberto' and self.em_andamento:
+                # Só uma chamada de teste por vez enquanto meio aberto
+                self.contadores['recusados'] += 1
+                raise CircuitoAberto(f"circuito meio aberto para {self.device_id} (tentativa em andamento)")
+            if self.em_andamento >= self.max_simultaneas:
+                self.contadores['recusados'] += 1
+                raise CircuitoAberto(f"{self.device_id} já tem {self.em_andamento} comandos em andamento")
+            self.em_andamento += 1
+        self._notificar(mudanca)
+
+    def registrar(self, sucesso, erro=None):
+        """Libera a chamada reservada e atualiza o estado com o resultado"""
+        mudanca = None
+        with self._lock:
+            self.em_andamento -= 1
+            if sucesso:
+                self.contadores['sucessos'] += 1
+                self.falhas_seguidas = 0
+                mudanca = self._mudar('fechado')
+            else:
+                self.contadores['falhas'] += 1
+                self.falhas_seguidas += 1
+                self.ultimo_erro = erro
+                if self.estado == 'meio_aberto' or self.falhas_seguidas >= self.limite_falhas:
+                    self.aberto_em = time.time()
+                    mudanca = self._mudar('aberto')
+                    if mudanca:
+                        self.contadores['aberturas'] += 1
+        self._notificar(mudanca)
+
+    def resetar(self):
+        with self._lock:
+            self.falhas_seguidas = 0
+            mudanca = self._mudar('fechado')
+        self._notificar(mudanca)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'device_id': self.device_id,
+                'estado': self.estado,
+                'falhas_seguidas': self.falhas_seguidas,
+                'em_andamento': self.em_andamento,
+                'aberto_em': datetime.fromtimestamp(self.aberto_em).isoformat() if self.estado == 'aberto' else None,
+                'ultimo_erro': self.ultimo_erro,
+                **self.contadores
+            }
+
+class ExecutorComandos:
+    """Executa chamadas gRPC aos dispositivos com prazo por método e disjuntor por dispositivo.
+
+    Sem prazo, um dispositivo travado prendia uma thread do Flask até a conexão
+    cair. Aqui cada chamada tem timeout, falhas de transporte (prazo esgotado,
+    indisponível) abrem o disjuntor do dispositivo após `limite_falhas` seguidas
+    e, enquanto ele está aberto, o comando é recusado na hora.
+    """
+    # Segundos por método; comandos de segurança (emergência) têm prazo curto
+    PRAZOS = {
+        'Ligar': 2.0,
+        'Desligar': 2.0,
+        'SetResolucao': 2.0,
+        'IniciarGravacao': 2.0,
+        'PararGravacao': 2.0,
+        'LigarLampada': 1.5,
+        'DesligarLampada': 1.5,
+        'SetIntensidade': 1.5,
+        'SetTempos': 1.5,
+        'ModoEmergencia': 1.0,
+        'getStatus': 1.0
+    }
+    PRAZO_PADRAO = 2.0
+    # Códigos que indicam dispositivo lento/fora do ar (erros de aplicação não abrem o circuito)
+    CODIGOS_FALHA = {
+        grpc.StatusCode.DEADLINE_EXCEEDED,
+        grpc.StatusCode.UNAVAILABLE,
+        grpc.StatusCode.RESOURCE_EXHAUSTED
+    }
+
+    def __init__(self, limite_falhas=3, tempo_aberto=30, max_simultaneas=4, ao_mudar=None, apos_comando=None):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.max_simultaneas = max_simultaneas
+        self.ao_mudar = ao_mudar
+        self.apos_comando = apos_comando  # chamado com device_id após qualquer método que não seja getStatus
+        self.prazos = dict(self.PRAZOS)
+        self._disjuntores = {}
+        self._lock = threading.Lock()
+
+    def disjuntor(self, device_id):
+        with self._lock:
+            disjuntor = self._disjuntores.get(device_id)
+            if disjuntor is None:
+                disjuntor = DisjuntorDispositivo(device_id, self.limite_falhas, self.tempo_aberto,
+                                                 self.max_simultaneas, self.ao_mudar)
+                self._disjuntores[device_id] = disjuntor
+            return disjuntor
+
+    def estado_disjuntor(self, device_id):
+        """Estado do disjuntor sem criá-lo: dispositivo sem comandos ainda está 'fechado'"""
+        with self._lock:
+            disjuntor = self._disjuntores.get(device_id)
+        return disjuntor.estado if disjuntor else 'fechado'
+
+    def executar(self, device_id, metodo, chamada, request):
+        """Chama `chamada` (método do stub) com prazo e metadata do dispositivo"""
+        disjuntor = self.disjuntor(device_id)
+        disjuntor.permitir()
+        try:
+            resposta = chamada(
+                request,
+                timeout=self.prazos.get(metodo, self.PRAZO_PADRAO),
+                # Identifica o alvo em hosts que servem vários dispositivos na mesma porta
+                metadata=(('device-id', device_id),)
+            )
+        except grpc.RpcError as e:
+            falha = e.code() in self.CODIGOS_FALHA
+            disjuntor.registrar(not falha, f"{metodo}: {e.code().name}")
+            raise
+        except Exception as e:
+            disjuntor.registrar(False, f"{metodo}: {e}")
+            raise
+        finally:
+            # Mesmo com prazo esgotado o comando pode ter sido aplicado
+            if metodo != 'getStatus' and self.apos_comando:
+                self.apos_comando(device_id)
+        disjuntor.registrar(True)
+        return resposta
+
+    def esquecer(self, device_id):
+        with self._lock:
+            self._disjuntores.pop(device_id, None)
+
+    def estatisticas(self):
+        with self._lock:
+            disjuntores = list(self._disjuntores.values())
+        estados = [d.estatisticas() for d in disjuntores]
+        resumo = {}
+        for estado in estados:
+            resumo[estado['estado']] = resumo.get(estado['estado'], 0) + 1
+        return {
+            'prazos_s': self.prazos,
+            'limite_falhas': self.limite_falhas,
+            'tempo_aberto_s': self.tempo_aberto,
+            'max_simultaneas': self.max_simultaneas,
+            'resumo': resumo,
+            'disjuntores': estados
+        }
+
+# ================================
+# CACHE DE STATUS DOS DISPOSITIVOS
+# ================================
+class CacheStatus:
+    """Status obtido via getStatus com TTL por tipo e stale-while-revalidate.
+
+    Dentro do TTL a resposta sai do cache. Vencido o TTL, durante mais
+    `janela_obsoleta` segundos o valor antigo ainda é servido enquanto uma
+    busca em segundo plano o atualiza. Depois disso, a consulta espera o
+    dispositivo. Consultas simultâneas ao mesmo dispositivo compartilham uma
+    única chamada gRPC. Dispositivos com stream WatchStatus aberto não expiram:
+    o próprio stream mantém a entrada atualizada.
+    """
+    # Semáforos trocam de fase a cada poucos segundos; câmeras e postes só mudam por comando
+    TTL = {
+        'CAMERA': 15,
+        'POSTE': 15,
+        'SEMAFORO': 1
+    }
+    TTL_PADRAO = 5
+
+    def __init__(self, buscar, janela_obsoleta=60, max_workers=8):
+        self.buscar = buscar  # device_id -> dict de status (pode lançar exceção)
+        self.ttl = dict(self.TTL)
+        self.janela_obsoleta = janela_obsoleta
+        self._entradas = {}  # device_id -> (status, obtido_em monotonic)
+        self._buscas = {}    # device_id -> Future da busca em andamento
+        self._vigiados = set()  # device_ids atualizados por WatchStatus
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='status_cache')
+        self.contadores = {'frescos': 0, 'stream': 0, 'obsoletos': 0, 'buscas': 0, 'falhas': 0, 'invalidacoes': 0}
+
+    def _reservar_busca(self, device_id):
+        """(futuro, nova): nova=True se quem chamou deve executar a busca (chamado com o lock)"""
+        futuro = self._buscas.get(device_id)
+        if futuro is not None:
+            return futuro, False
+        futuro = Future()
+        self._buscas[device_id] = futuro
+        return futuro, True
+
+    def _executar_busca(self, device_id, futuro):
+        try:
+            status = self.buscar(device_id)
+        except Exception as e:
+            with self._lock:
+                if self._buscas.get(device_id) is futuro:
+                    del self._buscas[device_id]
+                self.contadores['falhas'] += 1
+            futuro.set_exception(e)
+            return
+        with self._lock:
+            # Invalidada durante a busca (ex.: comando enviado): resultado pode ser anterior ao comando
+            if self._buscas.get(device_id) is futuro:
+                del self._buscas[device_id]
+                self._entradas[device_id] = (status, time.monotonic())
+            self.contadores['buscas'] += 1
+        futuro.set_result(status)
+
+    def obter(self, device_id, tipo):
+        """Retorna (status, origem, idade_s); origem é 'stream', 'cache', 'cache_obsoleto' ou 'dispositivo'"""
+        with self._lock:
+            entrada = self._entradas.get(device_id)
+            if entrada:
+                status, obtido_em = entrada
+                idade = time.monotonic() - obtido_em
+                if device_id in self._vigiados:
+                    self.contadores['stream'] += 1
+                    return status, 'stream', idade
+                ttl = self.ttl.get(tipo, self.TTL_PADRAO)
+                if idade < ttl:
+                    self.contadores['frescos'] += 1
+                    return status, 'cache', idade
+                if idade < ttl + self.janela_obsoleta:
+                    self.contadores['obsoletos'] += 1
+                    futuro, nova = self._reservar_busca(device_id)
+                    if nova:
+                        self._executor.submit(self._executar_busca, device_id, futuro)
+                    return status, 'cache_obsoleto', idade
+            futuro, nova = self._reservar_busca(device_id)
+        if nova:
+            self._executar_busca(device_id, futuro)
+        return futuro.result(), 'dispositivo', 0.0
+
+    def invalidar(self, device_id):
+        """Descarta o status após um comando (dispositivos vigiados recebem a mudança pelo stream)"""
+        with self._lock:
+            if device_id in self._vigiados:
+                return
+            self._entradas.pop(device_id, None)
+            self._buscas.pop(device_id, None)
+            self.contadores['invalidacoes'] += 1
+
+    def atualizar(self, device_id, status):
+        """Estado empurrado pelo WatchStatus: vale enquanto o stream estiver aberto"""
+        with self._lock:
+            self._entradas[device_id] = (status, time.monotonic())
+            self._vigiados.add(device_id)
+            # Uma busca em andamento seria mais antiga que este evento
+            self._buscas.pop(device_id, None)
+
+    def parar_vigia(self, device_id):
+        """Stream caiu: a entrada volta a expirar pelo TTL do tipo"""
+        with self._lock:
+            self._vigiados.discard(device_id)
+
+    def esquecer(self, device_id):
+        with self._lock:
+            self._vigiados.discard(device_id)
+            self._entradas.pop(device_id, None)
+            self._buscas.pop(device_id, None)
+
+    def parar(self):
+        self._executor.shutdown(wait=False)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'vigiados': len(self._vigiados),
+                'buscas_em_andamento': len(self._buscas),
+                'ttl_s': self.ttl,
+                'janela_obsoleta_s': self.janela_obsoleta,
+                **self.contadores
+            }
+
+# ================================
+# STREAMS DE STATUS (WatchStatus)
+# ================================
+def status_para_dict(mensagem):
+    """Campos de uma mensagem Status* do protobuf como dicionário"""
+    return {campo.name: getattr(mensagem, campo.name) for campo in mensagem.DESCRIPTOR.fields}
+
+class MonitorStatus:
+    """Mantém streams WatchStatus abertos e repassa cada mudança de estado ao Gateway.
+
+    Um stream por endereço e tipo: um dispositivo avulso tem o seu, e um
+    HostDispositivos envia todos os dispositivos do tipo no mesmo stream.
+    Todos rodam em um único loop asyncio (grpc.aio), sem uma thread por
+    dispositivo. Quando o stream cai, reconecta com backoff; dispositivos sem
+    WatchStatus (UNIMPLEMENTED) ficam só com getStatus + cache.
+    """
+    # Stub de cada tipo de dispositivo gRPC (também usado no getStatus do Gateway)
+    STUBS = {
+        'CAMERA': smart_city_pb2_grpc.CameraStub,
+        'POSTE': smart_city_pb2_grpc.PosteStub,
+        'SEMAFORO': smart_city_pb2_grpc.SemaforoStub
+    }
+
+    def __init__(self, ao_receber, ao_perder, backoff_max=30):
+        self.ao_receber = ao_receber  # (device_id, status) a cada mudança
+        self.ao_perder = ao_perder    # (device_ids) quando o stream que os trazia cai
+        self.backoff_max = backoff_max
+        self.contadores = {'eventos': 0, 'mudancas': 0, 'coalescidas': 0, 'reconexoes': 0, 'sem_suporte': 0}
+        # Estruturas abaixo só são alteradas dentro do loop
+        self._tarefas = {}     # (endereco, tipo) -> asyncio.Task
+        self._canais = {}      # endereco -> grpc.aio.Channel
+        self._conectados = {}  # (endereco, tipo) -> dispositivos recebidos no stream atual
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='monitor_status', daemon=True).start()
+
+    def vigiar(self, endereco, tipo):
+        if tipo in self.STUBS:
+            self._loop.call_soon_threadsafe(self._iniciar, endereco, tipo)
+
+    def esquecer(self, endereco):
+        """Encerra os streams e o canal de um endereço que nenhum dispositivo usa mais"""
+        self._loop.call_soon_threadsafe(self._parar, endereco)
+
+    def parar(self, prazo=5):
+        """Encerra todos os streams, fecha os canais e para o loop (desligamento do Gateway)"""
+        try:
+            asyncio.run_coroutine_threadsafe(self._encerrar(), self._loop).result(prazo)
+        except (FuturesTimeout, RuntimeError):
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _encerrar(self):
+        tarefas = list(self._tarefas.values())
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        self._tarefas.clear()
+        canais = list(self._canais.values())
+        self._canais.clear()
+        await asyncio.gather(*(canal.close() for canal in canais), return_exceptions=True)
+
+    def conectado(self, endereco):
+        """True se algum stream deste endereço está aberto e já recebeu eventos"""
+        return any(chave[0] == endereco for chave in list(self._conectados))
+
+    def _iniciar(self, endereco, tipo):
+        chave = (endereco, tipo)
+        if chave not in self._tarefas:
+            self._tarefas[chave] = self._loop.create_task(self._vigiar(endereco, tipo))
+
+    def _parar(self, endereco):
+        for chave in [chave for chave in self._tarefas if chave[0] == endereco]:
+            self._tarefas.pop(chave).cancel()
+        canal = self._canais.pop(endereco, None)
+        if canal is not None:
+            self._loop.create_task(canal.close())
+
+    async def _vigiar(self, endereco, tipo):
+        chave = (endereco, tipo)
+        espera = 1
+        while True:
+            vistos = {}  # device_id -> última sequência recebida neste stream
+            try:
+                canal = self._canais.get(endereco)
+                if canal is None:
+                    canal = self._canais[endereco] = grpc.aio.insecure_channel(endereco)
+                chamada = self.STUBS[tipo](canal).WatchStatus(smart_city_pb2.Vazio())
+                async for evento in chamada:
+                    espera = 1
+                    self._conectados[chave] = vistos
+                    self._receber(evento, vistos)
+            except grpc.aio.AioRpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    self.contadores['sem_suporte'] += 1
+                    log.info('watch_sem_suporte', "📡 {endereco} não implementa WatchStatus ({tipo}); status só via getStatus",
+                             endereco=endereco, tipo=tipo)
+                    return
+                log.debug('watch_desconectado', "📡 Stream de status {tipo}@{endereco} caiu: {codigo}",
+                          tipo=tipo, endereco=endereco, codigo=e.code().name)
+            except Exception as e:
+                log.erro('watch_erro', "❌ Erro no stream de status {tipo}@{endereco}: {e}", tipo=tipo, endereco=endereco, e=e)
+            finally:
+                if self._conectados.get(chave) is vistos:
+                    del self._conectados[chave]
+                if vistos:
+                    self.ao_perder(list(vistos))
+            self.contadores['reconexoes'] += 1
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, self.backoff_max)
+
+    def _receber(self, evento, vistos):
+        self.contadores['eventos'] += 1
+        anterior = vistos.get(evento.device_id)
+        vistos[evento.device_id] = evento.sequencia
+        if anterior is not None:
+            if evento.sequencia == anterior:
+                return
+            if evento.sequencia > anterior + 1:
+                # O dispositivo fundiu mudanças rápidas; o estado recebido é o mais novo
+                self.contadores['coalescidas'] += evento.sequencia - anterior - 1
+            self.contadores['mudancas'] += 1
+        status = status_para_dict(evento.status)
+        status['sequencia'] = evento.sequencia
+        status['ultima_comunicacao'] = datetime.fromtimestamp(evento.timestamp_ms / 1000).isoformat()
+        try:
+            self.ao_receber(evento.device_id, status)
+        except Exception as e:
+            log.erro('watch_erro', "❌ Erro ao aplicar status de {device_id}: {e}", device_id=evento.device_id, e=e)
+
+    def estatisticas(self):
+        conectados = list(self._conectados.values())
+        return {
+            'streams': len(self._tarefas),
+            'streams_conectados': len(conectados),
+            'dispositivos_vigiados': sum(len(vistos) for vistos in conectados),
+            'canais': len(self._canais),
+            **self.contadores
+        }
+
+class GatewayInteligente:
+    def __init__(self, capacidade_historico=100, capacidade_por_sensor=100, diretorio_dados='dados_sensores',
+                 workers_ingestao=0):
+        self.instancia = uuid.uuid4().hex[:8]
+        # Eventos enviados ao dashboard por push (leituras, registro, comandos)
+        self.eventos = BarramentoEventos()
+        # Registro versionado: descoberta e registro HTTP mesclam, lease expira inativos
+        self.dispositivos_conectados = RegistroDispositivos(lease=300, ao_alterar=self._publicar_registro)
+        # Histórico dos sensores em buffers circulares colunares (memória fixa),
+        # com partição e índice de última leitura por sensor_id
+        self.capacidade_historico = capacidade_historico
         self.sensores_dados = {
-            'temperatura': [],
-            'qualidade_ar': []
+            'temperatura': HistoricoSensores(
+                capacidade_historico,
+                capacidade_por_sensor,
+                campos_numericos=['valor'],
+                campos_categoricos=['sensor_id', 'unidade', 'localizacao'],
+                campos_fixos={'tipo': 'temperatura'},
+                metricas_agregadas={'temperatura': 'valor'}
+            ),
+            'qualidade_ar': HistoricoSensores(
+                capacidade_historico,
+                capacidade_por_sensor,
+                campos_numericos=['co2', 'pm25', 'pm10'],
+                campos_categoricos=['sensor_id', 'qualidade', 'nivel_risco', 'localizacao'],
+                campos_fixos={'tipo': 'qualidade_ar'},
+                metricas_agregadas={'co2': 'co2', 'pm25': 'pm25', 'pm10': 'pm10'}
+            )
         }
-        self.broker_connection = None
-        self.broker_channel = None
+        # Histórico durável em disco (segmentos colunares append-only); a memória
+        # é reidratada com as últimas leituras gravadas ao reiniciar.
+        # Com workers de ingestão, cada processo grava o seu armazém e a API só lê.
+        self.diretorio_dados = diretorio_dados
+        self.workers_ingestao = workers_ingestao
+        self.armazem_sensores = {}
+        for tipo, esquema in self._esquemas_armazenamento().items():
+            if workers_ingestao:
+                self.armazem_sensores[tipo] = ArmazemParticionado([
+                    ArmazemSegmentos(os.path.join(diretorio_dados, f'worker_{indice}', tipo), somente_leitura=True, **esquema)
+                    for indice in range(workers_ingestao)
+                ])
+            else:
+                self.armazem_sensores[tipo] = ArmazemSegmentos(os.path.join(diretorio_dados, tipo), **esquema)
+        for tipo, historico in self.sensores_dados.items():
+            for leitura in self.armazem_sensores[tipo].ultimos(capacidade_historico):
+                historico.adicionar(leitura)
+        # Consumo das filas dos sensores: prefetch e ack em lote (count ou tempo)
+        self.consumidor = None
+        self.consumo_prefetch = 200
+        self.consumo_lote_ack = 50
+        self.consumo_intervalo_ack = 0.5
         self.multicast_group = '224.0.0.1'
         self.multicast_port = 10000
         self.web_port = 5000
         self.running = True  # Adicionar atributo running
         
+        # Jobs de descoberta (apenas uma rodada multicast em andamento por vez)
+        self.descoberta_lock = threading.Lock()
+        self.descoberta_atual = None
+        self.descoberta_jobs = {}
+        self.descoberta_historico = 20
+        
+        # JSON pré-serializado dos endpoints de leitura mais acessados
+        self.cache_respostas = CacheRespostas()
+        
+        # Pool de canais gRPC reutilizados por todos os comandos
+        self.pool_canais = PoolCanaisGRPC(idle_timeout=300)
+        
+        # Prazo por método e disjuntor por dispositivo em todas as chamadas gRPC
+        self.comandos = ExecutorComandos(ao_mudar=self._publicar_disjuntor, apos_comando=self._invalidar_status)
+        
+        # Status real (getStatus) com TTL por tipo; comandos invalidam a entrada do dispositivo
+        self.cache_status = CacheStatus(self._consultar_status_grpc)
+        
+        # Um stream WatchStatus por endereço/tipo atualiza status e lease sem polling
+        self.monitor_status = MonitorStatus(ao_receber=self._status_recebido, ao_perder=self._status_perdido)
+        
+        # Status em lote: consultas simultâneas e prazo padrão/máximo de uma requisição
+        self.status_lote_concorrencia = 64
+        self.status_lote_prazo = 5
+        self.status_lote_prazo_max = 30
+        self.status_lote_executor = ThreadPoolExecutor(
+            max_workers=self.status_lote_concorrencia,
+            thread_name_prefix='status_lote'
+        )
+        
+        # Comandos em lote: chamadas gRPC simultâneas e prazo total de uma requisição
+        self.comandos_lote_concorrencia = 64
+        self.comandos_lote_prazo = 30
+        self.comandos_lote_executor = ThreadPoolExecutor(
+            max_workers=self.comandos_lote_concorrencia,
+            thread_name_prefix='comandos_lote'
+        )
+        
         # Sistema de health check - verifica dispositivos a cada 60 segundos
         self.health_check_interval = 60
         self.health_check_timeout = 5
+        self.health_check_concorrencia = 32  # sondagens gRPC simultâneas
+        self.health_check_deadline = 20      # tempo máximo de uma varredura completa
         self.last_health_check = time.time()
+        self.ultimo_health_check = {}
+        self.health_check_executor = ThreadPoolExecutor(
+            max_workers=self.health_check_concorrencia,
+            thread_name_prefix='health_check'
+        )
         
         # Thread para health check em background
         self.health_check_thread = threading.Thread(target=self._health_check_loop, daemon=True)
@@ -55,63 +941,14 @@ class GatewayInteligente:
         @self.app.route('/api/dispositivos', methods=['GET'])
         def listar_dispositivos():
             """Lista todos os dispositivos conectados"""
-            # Dispositivos gRPC (câmeras, postes, semáforos) - filtra apenas dispositivos reais
-            dispositivos_grpc = []
-            for device in self.dispositivos_conectados.values():
-                # Incluir apenas dispositivos que NÃO são sensores
-                if device['tipo'] not in ['SENSOR_TEMPERATURA', 'SENSOR_QUALIDADE_AR', 'SENSOR']:
-                    dispositivos_grpc.append(device)
-            
-            # Sensores RabbitMQ (se tiver dados recentes) - fonte única de verdade para sensores
-            sensores_rabbitmq = []
-            
-            # Sensor de temperatura
-            if self.sensores_dados['temperatura']:
-                ultima_temp = self.sensores_dados['temperatura'][-1]
-                sensores_rabbitmq.append({
-                    'id': ultima_temp.get('sensor_id', 'TEMP001'),
-                    'tipo': 'SENSOR_TEMPERATURA',
-                    'protocolo': 'RabbitMQ',
-                    'ip': '127.0.0.1',
-                    'porta_amqp': 5672,
-                    'queue': 'sensor_temperatura',
-                    'endereco': 'RabbitMQ:sensor_temperatura',
-                    'ultima_leitura': ultima_temp.get('timestamp'),
-                    'valor_atual': f"{ultima_temp.get('valor', 'N/A')}°C"
-                })
-            
-            # Sensor de qualidade do ar
-            if self.sensores_dados['qualidade_ar']:
-                ultimo_ar = self.sensores_dados['qualidade_ar'][-1]
-                sensores_rabbitmq.append({
-                    'id': ultimo_ar.get('sensor_id', 'AIR001'),
-                    'tipo': 'SENSOR_QUALIDADE_AR',
-                    'protocolo': 'RabbitMQ',
-                    'ip': '127.0.0.1',
-                    'porta_amqp': 5672,
-                    'queue': 'sensor_qualidade_ar',
-                    'endereco': 'RabbitMQ:sensor_qualidade_ar',
-                    'ultima_leitura': ultimo_ar.get('timestamp'),
-                    'valor_atual': ultimo_ar.get('qualidade', 'N/A'),
-                    'nivel_risco': ultimo_ar.get('nivel_risco', 'Baixo'),
-                    'co2': ultimo_ar.get('co2', 0),
-                    'pm25': ultimo_ar.get('pm25', 0),
-                    'pm10': ultimo_ar.get('pm10', 0)
-                })
-            
-            # Combinar todos os dispositivos
-            todos_dispositivos = dispositivos_grpc + sensores_rabbitmq
-            
-            # Debug: log para entender o que está sendo retornado
-            print(f"🔍 API /dispositivos: {len(dispositivos_grpc)} gRPC + {len(sensores_rabbitmq)} RabbitMQ = {len(todos_dispositivos)} total")
+            fontes = [self.dispositivos_conectados, self.sensores_dados['temperatura'], self.sensores_dados['qualidade_ar']]
+            # Validadores calculados antes de montar o corpo: nunca mais novos que os dados
+            etag, modificado_em = self._validadores(fontes)
+            if self._cliente_atualizado(etag, modificado_em):
+                return self._com_validadores(Response(status=304), etag, modificado_em)
             
-            return jsonify({
-                'dispositivos': todos_dispositivos,
-                'total': len(todos_dispositivos),
-                'grpc_devices': len(dispositivos_grpc),
-                'rabbitmq_sensors': len(sensores_rabbitmq),
-                'timestamp': datetime.now().isoformat()
-            })
+            corpo = self.cache_respostas.obter('dispositivos', etag, self._montar_lista_dispositivos)
+            return self._com_validadores(Response(corpo, mimetype='application/json'), etag, modificado_em)
         
         @self.app.route('/api/dispositivos/<device_id>/status', methods=['GET'])
         def status_dispositivo(device_id):
@@ -119,48 +956,71 @@ class GatewayInteligente:
             if device_id not in self.dispositivos_conectados:
                 return jsonify({'erro': 'Dispositivo não encontrado'}), 404
             
-            dispositivo = self.dispositivos_conectados[device_id]
             try:
-                # Aqui seria a chamada gRPC real para getStatus
                 status = self.get_device_status_grpc(device_id)
                 return jsonify({
                     'device_id': device_id,
                     'status': status,
                     'timestamp': datetime.now().isoformat()
                 })
+            except (CircuitoAberto, grpc.RpcError) as e:
+                detalhe = f"{e.code().name}: {e.details()}" if isinstance(e, grpc.RpcError) else str(e)
+                return jsonify({'erro': f"Dispositivo não respondeu: {detalhe}", 'device_id': device_id}), 503
             except Exception as e:
                 return jsonify({'erro': str(e)}), 500
         
+        @self.app.route('/api/dispositivos/status', methods=['GET', 'POST'])
+        def status_lote():
+            """Status de vários dispositivos (ids, tipo e/ou prefixo); stream=1 envia cada um assim que chega"""
+            if request.method == 'POST':
+                dados = request.get_json(silent=True) or {}
+            else:
+                dados = request.args.to_dict()
+                if dados.get('ids'):
+                    dados['dispositivos'] = [d for d in dados['ids'].split(',') if d]
+            erro = self._erro_selecao(dados)
+            if erro:
+                return jsonify({'erro': erro}), 400
+            try:
+                prazo = float(dados.get('prazo', self.status_lote_prazo))
+            except (TypeError, ValueError):
+                prazo = math.nan
+            if not math.isfinite(prazo) or prazo <= 0:
+                return jsonify({'erro': "Parâmetro 'prazo' deve ser um número de segundos maior que zero"}), 400
+            prazo = min(prazo, self.status_lote_prazo_max)
+            device_ids = self._selecionar_dispositivos(dados)
+            inicio = time.perf_counter()
+            itens = self.consultar_status_lote(device_ids, prazo)
+            
+            if str(dados.get('stream', '')).lower() in ('1', 'true', 'sim'):
+                def fluxo():
+                    recebidos = []
+                    for item in itens:
+                        recebidos.append(item)
+                        yield f"event: status\ndata: {json.dumps(item, ensure_ascii=False)}\n\n".encode()
+                    fim = self._resumo_status_lote(recebidos, inicio)
+                    yield f"event: fim\ndata: {json.dumps(fim, ensure_ascii=False)}\n\n".encode()
+                return Response(fluxo(), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            
+            resultados = sorted(itens, key=lambda item: item['device_id'])
+            return jsonify({
+                **self._resumo_status_lote(resultados, inicio),
+                'dispositivos': resultados,
+                'timestamp': datetime.now().isoformat()
+            })
+        
         @self.app.route('/api/camera/<device_id>/controle', methods=['POST'])
         def controlar_camera(device_id):
             """Controla câmera via gRPC"""
             data = request.get_json()
             acao = data.get('acao')
             
-            try:
-                if acao == 'ligar':
-                    result = self.camera_ligar_grpc(device_id)
-                elif acao == 'desligar':
-                    result = self.camera_desligar_grpc(device_id)
-                elif acao == 'resolucao':
-                    resolucao = data.get('resolucao', 'HD')
-                    result = self.camera_set_resolucao_grpc(device_id, resolucao)
-                elif acao == 'gravar':
-                    result = self.camera_iniciar_gravacao_grpc(device_id)
-                elif acao == 'parar_gravacao':
-                    result = self.camera_parar_gravacao_grpc(device_id)
-                else:
-                    return jsonify({'erro': 'Ação inválida'}), 400
-                
-                return jsonify({
-                    'sucesso': True,
-                    'acao': acao,
-                    'device_id': device_id,
-                    'resultado': result
-                })
-                
-            except Exception as e:
-                return jsonify({'erro': str(e)}), 500
+            executar = self._acao_dispositivo('CAMERA', acao, data)
+            if not executar:
+                return jsonify({'erro': 'Ação inválida'}), 400
+            
+            return self._resposta_comando(device_id, acao, executar)
         
         @self.app.route('/api/poste/<device_id>/controle', methods=['POST'])
         def controlar_poste(device_id):
@@ -168,26 +1028,11 @@ class GatewayInteligente:
             data = request.get_json()
             acao = data.get('acao')
             
-            try:
-                if acao == 'ligar':
-                    result = self.poste_ligar_lampada_grpc(device_id)
-                elif acao == 'desligar':
-                    result = self.poste_desligar_lampada_grpc(device_id)
-                elif acao == 'intensidade':
-                    intensidade = data.get('intensidade', 100)
-                    result = self.poste_set_intensidade_grpc(device_id, intensidade)
-                else:
-                    return jsonify({'erro': 'Ação inválida'}), 400
-                
-                return jsonify({
-                    'sucesso': True,
-                    'acao': acao,
-                    'device_id': device_id,
-                    'resultado': result
-                })
-                
-            except Exception as e:
-                return jsonify({'erro': str(e)}), 500
+            executar = self._acao_dispositivo('POSTE', acao, data)
+            if not executar:
+                return jsonify({'erro': 'Ação inválida'}), 400
+            
+            return self._resposta_comando(device_id, acao, executar)
         
         @self.app.route('/api/semaforo/<device_id>/controle', methods=['POST'])
         def controlar_semaforo(device_id):
@@ -195,38 +1040,92 @@ class GatewayInteligente:
             data = request.get_json()
             acao = data.get('acao')
             
+            executar = self._acao_dispositivo('SEMAFORO', acao, data)
+            if not executar:
+                return jsonify({'erro': 'Ação inválida'}), 400
+            
+            return self._resposta_comando(device_id, acao, executar)
+        
+        @self.app.route('/api/sensores/dados', methods=['GET'])
+        def dados_sensores():
+            """Retorna dados dos sensores"""
+            fontes = [self.sensores_dados['temperatura'], self.sensores_dados['qualidade_ar']]
+            # Validadores calculados antes de montar o corpo: nunca mais novos que os dados
+            etag, modificado_em = self._validadores(fontes)
+            if self._cliente_atualizado(etag, modificado_em):
+                return self._com_validadores(Response(status=304), etag, modificado_em)
+            
+            corpo = self.cache_respostas.obter('sensores_dados', etag, self._montar_dados_sensores)
+            return self._com_validadores(Response(corpo, mimetype='application/json'), etag, modificado_em)
+        
+        @self.app.route('/api/sensores/agregados', methods=['GET'])
+        def agregados_sensores():
+            """Consulta rollups (count/min/max/média/último) por intervalo de tempo"""
+            metrica = request.args.get('metrica', 'temperatura')
+            resolucao = request.args.get('resolucao')
             try:
-                if acao == 'ligar':
-                    result = self.semaforo_ligar_grpc(device_id)
-                elif acao == 'desligar':
-                    result = self.semaforo_desligar_grpc(device_id)
-                elif acao == 'emergencia':
-                    result = self.semaforo_modo_emergencia_grpc(device_id)
-                elif acao == 'tempos':
-                    tempos = data.get('tempos', {})
-                    result = self.semaforo_set_tempos_grpc(device_id, tempos)
-                else:
-                    return jsonify({'erro': 'Ação inválida'}), 400
+                fim_us = iso_para_us(request.args['fim']) if 'fim' in request.args else agora_us()
+                inicio_us = iso_para_us(request.args['inicio']) if 'inicio' in request.args else fim_us - 3600 * 1_000_000
+            except ValueError:
+                return jsonify({'erro': 'inicio/fim devem estar em formato ISO'}), 400
+            
+            for historico in self.sensores_dados.values():
+                agregados = historico.agregados
+                if metrica not in agregados.metricas:
+                    continue
+                if resolucao and resolucao not in agregados.series:
+                    return jsonify({'erro': f"Resolução inválida. Use: {', '.join(agregados.series)}"}), 400
                 
+                resolucao_usada, pontos = agregados.consultar(metrica, inicio_us, fim_us, resolucao)
                 return jsonify({
-                    'sucesso': True,
-                    'acao': acao,
-                    'device_id': device_id,
-                    'resultado': result
+                    'metrica': metrica,
+                    'resolucao': resolucao_usada,
+                    'pontos': pontos,
+                    'resumo': AgregadorMultiResolucao.resumir(pontos),
+                    'timestamp': datetime.now().isoformat()
                 })
-                
-            except Exception as e:
-                return jsonify({'erro': str(e)}), 500
+            
+            return jsonify({'erro': 'Métrica inválida. Use: temperatura, co2, pm25, pm10'}), 400
         
-        @self.app.route('/api/sensores/dados', methods=['GET'])
-        def dados_sensores():
-            """Retorna dados dos sensores"""
+        @self.app.route('/api/sensores/armazenados', methods=['GET'])
+        def sensores_armazenados():
+            """Consulta o histórico durável (disco) por intervalo de tempo"""
+            tipo = request.args.get('tipo', 'temperatura')
+            if tipo not in self.armazem_sensores:
+                return jsonify({'erro': 'Tipo inválido. Use: temperatura, qualidade_ar'}), 400
+            try:
+                fim_us = iso_para_us(request.args['fim']) if 'fim' in request.args else agora_us()
+                inicio_us = iso_para_us(request.args['inicio']) if 'inicio' in request.args else fim_us - 3600 * 1_000_000
+            except ValueError:
+                return jsonify({'erro': 'inicio/fim devem estar em formato ISO'}), 400
+            limite = request.args.get('limite', 1000, type=int)
+            
+            leituras = self.armazem_sensores[tipo].consultar(
+                inicio_us, fim_us,
+                sensor_id=request.args.get('sensor_id'),
+                limite=limite
+            )
             return jsonify({
-                'temperatura': self.sensores_dados['temperatura'][-50:],  # Últimas 50 leituras
-                'qualidade_ar': self.sensores_dados['qualidade_ar'][-50:],
+                'tipo': tipo,
+                'total': len(leituras),
+                'leituras': leituras,
                 'timestamp': datetime.now().isoformat()
             })
         
+        @self.app.route('/api/sensores/<sensor_id>/historico', methods=['GET'])
+        def historico_sensor(sensor_id):
+            """Retorna as últimas leituras de um sensor específico"""
+            n = request.args.get('n', 50, type=int)
+            for tipo, historico in self.sensores_dados.items():
+                if historico.ultimo_do_sensor(sensor_id):
+                    return jsonify({
+                        'sensor_id': sensor_id,
+                        'tipo': tipo,
+                        'leituras': historico.historico_do_sensor(sensor_id, n),
+                        'timestamp': datetime.now().isoformat()
+                    })
+            return jsonify({'erro': 'Sensor não encontrado'}), 404
+        
         @self.app.route('/api/discovery/register', methods=['POST'])
         def register_device():
             """Permite que dispositivos se registrem via HTTP"""
@@ -236,26 +1135,36 @@ class GatewayInteligente:
                 device_id = data.get('device_id')
                 device_type = data.get('device_type')
                 
-                self.dispositivos_conectados[device_id] = {
-                    'id': device_id,
-                    'tipo': device_type,
-                    'ip': data.get('ip'),
-                    'porta_grpc': data.get('grpc_port'),
-                    'timestamp_descoberta': datetime.now().isoformat(),
-                    'endereco': f"{data.get('ip')}:{data.get('grpc_port', 'N/A')}"
-                }
+                resultado = self._registrar_dispositivo(data)
                 
-                print(f"✅ Dispositivo registrado via HTTP: {device_id} ({device_type})")
-                return jsonify({'success': True, 'message': 'Device registered'})
+                if resultado != 'inalterado':
+                    log.info('dispositivo_registrado', "✅ Dispositivo registrado via HTTP: {device_id} ({device_type})", device_id=device_id, device_type=device_type)
+                return jsonify({'success': True, 'message': 'Device registered', 'resultado': resultado})
+            
+            if data and data.get('type') == 'DISCOVERY_RESPONSE_LOTE':
+                # Host com vários dispositivos (Dispositivos.py HOST) registrando todos de uma vez
+                resultados = {}
+                for resposta in self._respostas_descoberta(data):
+                    resultado = self._registrar_dispositivo(resposta)
+                    resultados[resultado] = resultados.get(resultado, 0) + 1
+                if resultados.get('novo') or resultados.get('atualizado'):
+                    log.info('host_registrado', "✅ Host {host_id} registrado via HTTP: {resultados}",
+                             host_id=data.get('host_id'), resultados=resultados)
+                return jsonify({'success': True, 'message': 'Devices registered', 'resultados': resultados})
             
             return jsonify({'error': 'Invalid registration data'}), 400
         
         @self.app.route('/api/discovery/descobrir', methods=['POST'])
         def descobrir_dispositivos_api():
-            """Força uma nova descoberta de dispositivos"""
-            result = self.descobrir_dispositivos()
+            """Dispara uma descoberta em background e retorna o id do job"""
+            job, agrupada = self.iniciar_descoberta()
+            if request.args.get('aguardar') == 'true':
+                job.evento.wait(timeout=10)
             return jsonify({
                 'descoberta_iniciada': True,
+                'job_id': job.id,
+                'agrupada': agrupada,
+                'status': job.status,
                 'total_encontrados': len(self.dispositivos_conectados),
                 'dispositivos': list(self.dispositivos_conectados.values()),
                 'timestamp': datetime.now().isoformat()
@@ -263,116 +1172,335 @@ class GatewayInteligente:
 
         @self.app.route('/api/discovery/force', methods=['POST'])
         def force_discovery():
-            """Força uma nova descoberta de dispositivos"""
-            result = self.descobrir_dispositivos()
+            """Dispara uma descoberta em background e retorna o id do job"""
+            job, agrupada = self.iniciar_descoberta()
+            if request.args.get('aguardar') == 'true':
+                job.evento.wait(timeout=10)
             return jsonify({
                 'discovery_triggered': True,
+                'job_id': job.id,
+                'coalesced': agrupada,
+                'status': job.status,
                 'devices_found': len(self.dispositivos_conectados),
                 'devices': list(self.dispositivos_conectados.values()),
                 'timestamp': datetime.now().isoformat()
             })
         
+        @self.app.route('/api/discovery/jobs/<job_id>', methods=['GET'])
+        def status_descoberta(job_id):
+            """Consulta o andamento de um job de descoberta"""
+            job = self.descoberta_jobs.get(job_id)
+            if not job:
+                return jsonify({'erro': 'Job de descoberta não encontrado'}), 404
+            return jsonify(job.para_dict())
+        
+        @self.app.route('/api/broker', methods=['GET'])
+        def status_broker():
+            """Estado da conexão com o RabbitMQ (consumindo/desconectado) e tempo total desconectado"""
+            if not self.consumidor:
+                return jsonify({'estado': 'nao_iniciado', 'timestamp': datetime.now().isoformat()})
+            return jsonify({**self.consumidor.estatisticas(), 'timestamp': datetime.now().isoformat()})
+        
+        @self.app.route('/api/health', methods=['GET'])
+        def health_check_status():
+            """Retorna o resultado da última varredura de saúde dos dispositivos"""
+            return jsonify({
+                'intervalo_s': self.health_check_interval,
+                'concorrencia': self.health_check_concorrencia,
+                'deadline_s': self.health_check_deadline,
+                'ultima_varredura': self.ultimo_health_check,
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        @self.app.route('/api/comandos/disjuntores', methods=['GET'])
+        def listar_disjuntores():
+            """Estado dos disjuntores por dispositivo e prazos por método gRPC"""
+            return jsonify({
+                **self.comandos.estatisticas(),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        @self.app.route('/api/comandos/disjuntores/<device_id>/resetar', methods=['POST'])
+        def resetar_disjuntor(device_id):
+            """Fecha manualmente o disjuntor de um dispositivo (ex.: após manutenção)"""
+            if device_id not in self.dispositivos_conectados:
+                return jsonify({'erro': 'Dispositivo não encontrado'}), 404
+            disjuntor = self.comandos.disjuntor(device_id)
+            disjuntor.resetar()
+            return jsonify(disjuntor.estatisticas())
+        
+        @self.app.route('/api/comandos/lote', methods=['POST'])
+        def comandos_lote():
+            """Aplica uma ação a vários dispositivos: lista de ids ou seletor (tipo/prefixo)"""
+            data = request.get_json(silent=True) or {}
+            erro = self._erro_selecao(data)
+            if erro:
+                return jsonify({'erro': erro}), 400
+            if not data.get('acao'):
+                return jsonify({'erro': "Campo 'acao' é obrigatório"}), 400
+            if not data.get('dispositivos') and not data.get('tipo') and not data.get('prefixo'):
+                return jsonify({'erro': "Informe 'dispositivos' ou um seletor ('tipo' e/ou 'prefixo')"}), 400
+            if not any(self._acao_dispositivo(tipo, data['acao'], data) for tipo in ('CAMERA', 'POSTE', 'SEMAFORO')):
+                return jsonify({'erro': 'Ação inválida'}), 400
+            return jsonify({
+                **self.executar_comandos_lote(data),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        @self.app.route('/api/eventos', methods=['GET'])
+        def stream_eventos():
+            """Stream SSE com leituras de sensores, mudanças no registro, status dos dispositivos e resultados de comandos"""
+            inscricao, fila = self.eventos.inscrever()
+            return Response(
+                self.eventos.fluxo(inscricao, fila),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
         @self.app.route('/api/debug', methods=['GET'])
         def debug_status():
             """Retorna informações de debug do Gateway"""
             return jsonify({
                 'total_devices': len(self.dispositivos_conectados),
+                'registry_version': self.dispositivos_conectados.versao,
                 'devices': list(self.dispositivos_conectados.values()),
                 'sensor_data_count': {
                     'temperatura': len(self.sensores_dados['temperatura']),
                     'qualidade_ar': len(self.sensores_dados['qualidade_ar'])
                 },
+                'sensor_history_capacity': self.capacidade_historico,
+                'sensors_tracked': {
+                    'temperatura': len(self.sensores_dados['temperatura'].particoes),
+                    'qualidade_ar': len(self.sensores_dados['qualidade_ar'].particoes)
+                },
+                'canais_grpc': self.pool_canais.estatisticas(),
+                'disjuntores': self.comandos.estatisticas()['resumo'],
+                'cache_status': self.cache_status.estatisticas(),
+                'watch_status': self.monitor_status.estatisticas(),
+                'clientes_eventos': len(self.eventos),
+                'cache_respostas': self.cache_respostas.estatisticas(),
+                'logs': estatisticas_logs(),
+                'consumo_sensores': self.consumidor.estatisticas() if self.consumidor else None,
+                'armazenamento': {tipo: armazem.estatisticas() for tipo, armazem in self.armazem_sensores.items()},
                 'timestamp': datetime.now().isoformat()
             })
     
-    def conectar_broker(self):
-        """Conecta ao broker RabbitMQ"""
-        try:
-            self.broker_connection = pika.BlockingConnection(
-                pika.ConnectionParameters('localhost')
-            )
-            self.broker_channel = self.broker_connection.channel()
-            
-            # Declarar filas
-            self.broker_channel.queue_declare(queue='sensor_temperatura', durable=True)
-            self.broker_channel.queue_declare(queue='sensor_qualidade_ar', durable=True)
-            
-            print("🔗 Gateway conectado ao broker RabbitMQ")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Erro ao conectar ao broker: {e}")
-            return False
+    # ================================
+    # GET CONDICIONAL (ETag / Last-Modified)
+    # ================================
+    def _validadores(self, fontes):
+        """ETag e Last-Modified derivados das versões das fontes (registro / streams de sensores)"""
+        # Prefixo da instância: versões recomeçam do zero quando o Gateway reinicia
+        etag = '-'.join([self.instancia] + [str(fonte.versao) for fonte in fontes])
+        modificado_em = datetime.fromtimestamp(int(max(fonte.modificado_em for fonte in fontes)), tz=timezone.utc)
+        return etag, modificado_em
+    
+    @staticmethod
+    def _segundo_aberto(modificado_em):
+        """Last-Modified tem resolução de 1 s: outra mudança ainda pode cair no mesmo segundo"""
+        return time.time() - modificado_em.timestamp() < 1
+
+    def _cliente_atualizado(self, etag, modificado_em):
+        """True se os validadores enviados pelo cliente correspondem à versão atual"""
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if request.if_modified_since and not self._segundo_aberto(modificado_em):
+            return modificado_em <= request.if_modified_since
+        return False
+    
+    def _com_validadores(self, resposta, etag, modificado_em):
+        resposta.set_etag(etag, weak=True)
+        # Dentro do segundo da última mudança só o ETag é confiável; sem Last-Modified
+        # o cliente não guarda um If-Modified-Since que esconderia mudanças posteriores
+        if not self._segundo_aberto(modificado_em):
+            resposta.last_modified = modificado_em
+        # Sempre revalidar: o cliente reaproveita o corpo só após 304
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
     
-    def iniciar_consumidores(self):
-        """Inicia consumidores para receber dados dos sensores"""
+    def _montar_lista_dispositivos(self):
+        """Monta o payload de /api/dispositivos (executado só quando o cache é invalidado)"""
+        # Dispositivos gRPC (câmeras, postes, semáforos) - filtra apenas dispositivos reais
+        dispositivos_grpc = []
+        for device in self.dispositivos_conectados.values():
+            # Incluir apenas dispositivos que NÃO são sensores
+            if device['tipo'] not in ['SENSOR_TEMPERATURA', 'SENSOR_QUALIDADE_AR', 'SENSOR']:
+                dispositivos_grpc.append(device)
         
-        def callback_temperatura(ch, method, properties, body):
-            try:
-                dados = json.loads(body.decode())
-                self.sensores_dados['temperatura'].append(dados)
-                
-                # Manter apenas últimas 100 leituras
-                if len(self.sensores_dados['temperatura']) > 100:
-                    self.sensores_dados['temperatura'] = self.sensores_dados['temperatura'][-100:]
-                
-                print(f"📊 Temperatura recebida: {dados['valor']}°C de {dados['sensor_id']}")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-            except Exception as e:
-                print(f"❌ Erro ao processar temperatura: {e}")
+        # Sensores RabbitMQ (se tiver dados recentes) - fonte única de verdade para sensores
+        sensores_rabbitmq = []
         
-        def callback_qualidade_ar(ch, method, properties, body):
-            try:
-                dados = json.loads(body.decode())
-                self.sensores_dados['qualidade_ar'].append(dados)
-                
-                # Manter apenas últimas 100 leituras
-                if len(self.sensores_dados['qualidade_ar']) > 100:
-                    self.sensores_dados['qualidade_ar'] = self.sensores_dados['qualidade_ar'][-100:]
-                
-                # Emojis baseados na qualidade
-                emojis = {
-                    "EXCELENTE": "🟢",
-                    "BOA": "🟢", 
-                    "MODERADA": "🟡",
-                    "RUIM": "🟠",
-                    "PÉSSIMA": "🔴"
-                }
-                
-                emoji = emojis.get(dados.get('qualidade', 'BOA'), "🌬️")
-                nivel_risco = dados.get('nivel_risco', 'Baixo')
-                print(f"{emoji} Qualidade: {dados['qualidade']} ({nivel_risco} risco) | CO2: {dados['co2']}ppm | PM2.5: {dados['pm25']}µg/m³ de {dados['sensor_id']}")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-            except Exception as e:
-                print(f"❌ Erro ao processar qualidade do ar: {e}")
+        # Sensores de temperatura (um item por sensor_id, via índice de última leitura)
+        historico_temp = self.sensores_dados['temperatura']
+        for sensor_id in historico_temp.sensores():
+            ultima_temp = historico_temp.ultimo_do_sensor(sensor_id)
+            sensores_rabbitmq.append({
+                'id': sensor_id,
+                'tipo': 'SENSOR_TEMPERATURA',
+                'protocolo': 'RabbitMQ',
+                'ip': '127.0.0.1',
+                'porta_amqp': 5672,
+                'queue': 'sensor_temperatura',
+                'endereco': 'RabbitMQ:sensor_temperatura',
+                'ultima_leitura': ultima_temp.get('timestamp'),
+                'valor_atual': f"{ultima_temp.get('valor', 'N/A')}°C"
+            })
         
-        # Configurar consumidores
-        self.broker_channel.basic_consume(
-            queue='sensor_temperatura',
-            on_message_callback=callback_temperatura
-        )
+        # Sensores de qualidade do ar
+        historico_ar = self.sensores_dados['qualidade_ar']
+        for sensor_id in historico_ar.sensores():
+            ultimo_ar = historico_ar.ultimo_do_sensor(sensor_id)
+            sensores_rabbitmq.append({
+                'id': sensor_id,
+                'tipo': 'SENSOR_QUALIDADE_AR',
+                'protocolo': 'RabbitMQ',
+                'ip': '127.0.0.1',
+                'porta_amqp': 5672,
+                'queue': 'sensor_qualidade_ar',
+                'endereco': 'RabbitMQ:sensor_qualidade_ar',
+                'ultima_leitura': ultimo_ar.get('timestamp'),
+                'valor_atual': ultimo_ar.get('qualidade', 'N/A'),
+                'nivel_risco': ultimo_ar.get('nivel_risco', 'Baixo'),
+                'co2': ultimo_ar.get('co2', 0),
+                'pm25': ultimo_ar.get('pm25', 0),
+                'pm10': ultimo_ar.get('pm10', 0)
+            })
         
-        self.broker_channel.basic_consume(
-            queue='sensor_qualidade_ar',
-            on_message_callback=callback_qualidade_ar
-        )
+        # Combinar todos os dispositivos
+        todos_dispositivos = dispositivos_grpc + sensores_rabbitmq
         
-        # Iniciar consumo em thread separada
-        def start_consuming():
-            print("🎯 Iniciando consumo de dados dos sensores...")
-            self.broker_channel.start_consuming()
+        # Debug: log para entender o que está sendo retornado
+        log.debug('lista_dispositivos_montada', "🔍 API /dispositivos: {grpc} gRPC + {rabbitmq} RabbitMQ = {total} total",
+                  grpc=len(dispositivos_grpc), rabbitmq=len(sensores_rabbitmq), total=len(todos_dispositivos))
         
-        consume_thread = threading.Thread(target=start_consuming, daemon=True)
-        consume_thread.start()
+        return {
+            'dispositivos': todos_dispositivos,
+            'total': len(todos_dispositivos),
+            'grpc_devices': len(dispositivos_grpc),
+            'rabbitmq_sensors': len(sensores_rabbitmq),
+            'timestamp': datetime.now().isoformat()
+        }
     
-    def descobrir_dispositivos(self):
+    def _montar_dados_sensores(self):
+        """Monta o payload de /api/sensores/dados"""
+        return {
+            'temperatura': self.sensores_dados['temperatura'].ultimos(50),  # Últimas 50 leituras
+            'qualidade_ar': self.sensores_dados['qualidade_ar'].ultimos(50),
+            # Estatísticas da mesma janela, calculadas sobre as colunas do buffer
+            'resumo': {
+                'temperatura': self.sensores_dados['temperatura'].resumo_janela(50),
+                'qualidade_ar': self.sensores_dados['qualidade_ar'].resumo_janela(50, categorias=['qualidade'])
+            },
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _esquemas_armazenamento(self):
+        """Colunas do armazém durável de cada tipo (as mesmas do histórico em memória)"""
+        return {
+            tipo: {
+                'campos_numericos': historico.campos_numericos,
+                'campos_categoricos': historico.campos_categoricos,
+                'campos_fixos': historico.campos_fixos
+            }
+            for tipo, historico in self.sensores_dados.items()
+        }
+    
+    def conectar_broker(self, timeout=5):
+        """Conecta ao broker RabbitMQ e inicia o consumo (com reconexão automática em background)"""
+        if self.workers_ingestao:
+            # Decodificação e gravação em processos separados; aqui só chegam lotes prontos
+            self.consumidor = PoolIngestao(
+                self.workers_ingestao,
+                {'sensor_temperatura': 'temperatura', 'sensor_qualidade_ar': 'qualidade_ar'},
+                self._esquemas_armazenamento(),
+                self.diretorio_dados,
+                self._aplicar_lote,
+                prefetch=self.consumo_prefetch,
+                lote_ack=self.consumo_lote_ack
+            )
+        else:
+            self.consumidor = ConsumidorSensores(
+                {
+                    'sensor_temperatura': self._processar_temperatura,
+                    'sensor_qualidade_ar': self._processar_qualidade_ar
+                },
+                prefetch=self.consumo_prefetch,
+                lote_ack=self.consumo_lote_ack,
+                intervalo_ack=self.consumo_intervalo_ack
+            )
+        self.consumidor.iniciar()
+        
+        if self.consumidor.aguardar_conexao(timeout):
+            log.info('broker_conectado', "🔗 Gateway conectado ao broker RabbitMQ")
+            return True
+        log.aviso('broker_erro', "⚠️ Broker indisponível ({erro}); tentando reconectar em background",
+                  erro=self.consumidor.ultimo_erro)
+        return False
+    
+    def _processar_temperatura(self, body, properties):
+        """Processa uma leitura de temperatura (JSON ou protobuf); exceções levam a mensagem para a fila de mortas"""
+        dados = decodificar_leitura('temperatura', body, properties.content_type)
+        self.armazem_sensores['temperatura'].adicionar(dados)
+        self._aplicar_leitura('temperatura', dados)
+    
+    def _processar_qualidade_ar(self, body, properties):
+        """Processa uma leitura de qualidade do ar"""
+        dados = decodificar_leitura('qualidade_ar', body, properties.content_type)
+        self.armazem_sensores['qualidade_ar'].adicionar(dados)
+        self._aplicar_leitura('qualidade_ar', dados)
+    
+    def _aplicar_lote(self, tipo, leituras):
+        """Recebe um lote já decodificado e persistido por um worker de ingestão"""
+        for dados in leituras:
+            self._aplicar_leitura(tipo, dados)
+    
+    def _aplicar_leitura(self, tipo, dados):
+        """Atualiza histórico em memória, rollups e stream de eventos com uma leitura"""
+        # Buffer circular descarta a leitura mais antiga quando cheio
+        self.sensores_dados[tipo].adicionar(dados)
+        self.eventos.publicar('leitura', {'tipo': tipo, 'leitura': dados})
+        
+        if tipo == 'temperatura':
+            log.info('temperatura_recebida', "📊 Temperatura recebida: {valor}°C de {sensor_id}",
+                     valor=dados.get('valor'), sensor_id=dados.get('sensor_id'))
+            return
+        
+        # Emojis baseados na qualidade
+        emojis = {
+            "EXCELENTE": "🟢",
+            "BOA": "🟢", 
+            "MODERADA": "🟡",
+            "RUIM": "🟠",
+            "PÉSSIMA": "🔴"
+        }
+        
+        emoji = emojis.get(dados.get('qualidade', 'BOA'), "🌬️")
+        nivel_risco = dados.get('nivel_risco', 'Baixo')
+        log.info('qualidade_ar_recebida', "{emoji} Qualidade: {qualidade} ({nivel_risco} risco) | CO2: {co2}ppm | PM2.5: {pm25}µg/m³ de {sensor_id}",
+                 emoji=emoji, qualidade=dados.get('qualidade'), nivel_risco=nivel_risco,
+                 co2=dados.get('co2'), pm25=dados.get('pm25'), sensor_id=dados.get('sensor_id'))
+    
+    def iniciar_descoberta(self):
+        """Inicia descoberta em background; disparos concorrentes reutilizam a rodada em andamento"""
+        with self.descoberta_lock:
+            job = self.descoberta_atual
+            if job and job.status == 'executando':
+                job.solicitacoes += 1
+                return job, True
+            
+            job = JobDescoberta()
+            self.descoberta_atual = job
+            self.descoberta_jobs[job.id] = job
+            # Manter apenas os jobs mais recentes
+            while len(self.descoberta_jobs) > self.descoberta_historico:
+                del self.descoberta_jobs[next(iter(self.descoberta_jobs))]
+        
+        threading.Thread(target=self.descobrir_dispositivos, args=(job,), daemon=True).start()
+        return job, False
+    
+    def descobrir_dispositivos(self, job=None):
         """Envia solicitação de descoberta via multicast UDP"""
         try:
-            # Limpar lista atual antes da nova descoberta
-            dispositivos_descobertos = {}
-            
             # Socket multicast
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             sock.settimeout(0.2)
@@ -405,62 +1533,172 @@ class GatewayInteligente:
             message = json.dumps(discovery_message).encode()
             
             # Enviar descoberta
-            print("📡 Enviando solicitação de descoberta multicast...")
+            log.info('descoberta_enviada', "📡 Enviando solicitação de descoberta multicast...")
             sock.sendto(message, (self.multicast_group, self.multicast_port))
             
             # Timeout para respostas
             response_sock.settimeout(5.0)
             
-            print(f"👂 Aguardando respostas na porta {response_port}...")
+            log.debug('descoberta_aguardando', "👂 Aguardando respostas na porta {response_port}...", response_port=response_port)
             
             start_time = time.time()
             dispositivos_encontrados = 0
             
             while time.time() - start_time < 5:  # 5 segundos
                 try:
-                    data, addr = response_sock.recvfrom(1024)
-                    response = json.loads(data.decode())
+                    # Respostas em lote de um host podem ter vários KB
+                    data, addr = response_sock.recvfrom(65535)
                     
-                    if response.get('type') == 'DISCOVERY_RESPONSE':
+                    for response in self._respostas_descoberta(json.loads(data.decode())):
                         device_id = response.get('device_id')
                         device_type = response.get('device_type')
                         
-                        dispositivos_descobertos[device_id] = {
-                            'id': device_id,
-                            'tipo': device_type,
-                            'ip': response.get('ip'),
-                            'porta_grpc': response.get('grpc_port'),
-                            'timestamp_descoberta': datetime.now().isoformat(),
-                            'endereco': f"{response.get('ip')}:{response.get('grpc_port', 'N/A')}"
-                        }
+                        # Mescla imediata no registro (sem descartar quem registrou via HTTP)
+                        resultado = self._registrar_dispositivo(response)
                         
                         dispositivos_encontrados += 1
-                        print(f"✅ Dispositivo encontrado: {device_id} ({device_type}) em {addr[0]}")
+                        if job:
+                            job.dispositivos.append(self.dispositivos_conectados.get(device_id))
+                        if resultado != 'inalterado':
+                            log.info('dispositivo_encontrado', "✅ Dispositivo encontrado: {device_id} ({device_type}) em {ip}",
+                                     device_id=device_id, device_type=device_type, ip=addr[0])
                         
                 except socket.timeout:
                     continue
                 except Exception as e:
-                    print(f"❌ Erro ao receber resposta: {e}")
+                    log.erro('descoberta_resposta_invalida', "❌ Erro ao receber resposta: {e}", e=e)
             
             sock.close()
             response_sock.close()
             
-            # Substituir lista completa (remove dispositivos desconectados)
-            self.dispositivos_conectados = dispositivos_descobertos
+            # Expirar apenas quem ficou sem responder além do lease
+            self._expirar_dispositivos()
             
-            print(f"🎯 Descoberta concluída: {dispositivos_encontrados} dispositivos encontrados")
+            log.info('descoberta_concluida', "🎯 Descoberta concluída: {dispositivos_encontrados} dispositivos encontrados", dispositivos_encontrados=dispositivos_encontrados)
+            if job:
+                job.concluir('concluida')
             return dispositivos_encontrados > 0
             
         except Exception as e:
-            print(f"❌ Erro na descoberta multicast: {e}")
+            log.erro('descoberta_erro', "❌ Erro na descoberta multicast: {e}", e=e)
+            if job:
+                job.concluir('erro')
             return False
     
     # ================================
     # MÉTODOS gRPC (Simulados)
     # ================================
+    def _respostas_descoberta(self, mensagem):
+        """Uma DISCOVERY_RESPONSE por dispositivo, expandindo as respostas em lote de um host"""
+        if mensagem.get('type') == 'DISCOVERY_RESPONSE':
+            return [mensagem]
+        if mensagem.get('type') != 'DISCOVERY_RESPONSE_LOTE':
+            return []
+        comum = {chave: valor for chave, valor in mensagem.items() if chave not in ('type', 'devices')}
+        return [
+            {**comum, **dispositivo, 'type': 'DISCOVERY_RESPONSE'}
+            for dispositivo in mensagem.get('devices', [])
+        ]
+    
+    def _registrar_dispositivo(self, dados):
+        """Mescla uma DISCOVERY_RESPONSE (UDP ou HTTP) no registro e ajusta o pool de canais"""
+        dispositivo = {
+            'id': dados.get('device_id'),
+            'tipo': dados.get('device_type'),
+            'ip': dados.get('ip'),
+            'porta_grpc': dados.get('grpc_port'),
+            'timestamp_descoberta': datetime.now().isoformat(),
+            'endereco': f"{dados.get('ip')}:{dados.get('grpc_port', 'N/A')}"
+        }
+        resultado, anterior = self.dispositivos_conectados.registrar(dispositivo)
+        
+        if resultado == 'atualizado' and anterior['endereco'] != dispositivo['endereco']:
+            self._liberar_canais({anterior['endereco']})
+        if resultado != 'inalterado':
+            self._aquecer_canal(dispositivo)
+            self.monitor_status.vigiar(dispositivo['endereco'], dispositivo['tipo'])
+        return resultado
+    
+    def _publicar_registro(self, acao, dispositivo, versao):
+        """Repassa mudanças do registro para os clientes do stream de eventos"""
+        self.eventos.publicar('registro', {'acao': acao, 'dispositivo': dispositivo, 'versao': versao})
+    
+    def _expirar_dispositivos(self):
+        """Remove dispositivos cujo lease venceu e fecha seus canais"""
+        enderecos = set()
+        for device_info in self.dispositivos_conectados.expirar():
+            log.aviso('dispositivo_expirado', "⌛ {tipo} {device_id} expirou (sem resposta há mais de {lease}s)",
+                      tipo=device_info['tipo'], device_id=device_info['id'], lease=self.dispositivos_conectados.lease)
+            enderecos.add(device_info['endereco'])
+            self.comandos.esquecer(device_info['id'])
+            self.cache_status.esquecer(device_info['id'])
+        self._liberar_canais(enderecos)
+    
+    def _liberar_canais(self, enderecos):
+        """Fecha os canais dos endereços que nenhum dispositivo registrado ainda usa (hosts com vários dispositivos)"""
+        if not enderecos:
+            return
+        em_uso = {info['endereco'] for _, info in self.dispositivos_conectados.items()}
+        for endereco in set(enderecos) - em_uso:
+            self.pool_canais.remover(endereco)
+            self.monitor_status.esquecer(endereco)
+    
+    def _aquecer_canal(self, device_info):
+        """Abre antecipadamente o canal gRPC de atuadores (sensores usam RabbitMQ)"""
+        if device_info['tipo'] in ['SENSOR_TEMPERATURA', 'SENSOR_QUALIDADE_AR', 'SENSOR']:
+            return
+        if not device_info.get('porta_grpc'):
+            return
+        self.pool_canais.aquecer(device_info['endereco'])
+    
+    def _obter_stub(self, device_id, stub_class):
+        """Retorna stub do pool de canais para o dispositivo (None se desconhecido)"""
+        device_info = self.dispositivos_conectados.get(device_id)
+        if not device_info:
+            return None
+        return self.pool_canais.obter_stub(device_info['endereco'], stub_class)
+    
+    def _publicar_disjuntor(self, disjuntor, anterior, estado):
+        """Loga e repassa ao stream de eventos as mudanças de estado de um disjuntor"""
+        if estado == 'aberto':
+            log.aviso('circuito_aberto', "🔌 Circuito ABERTO para {device_id} após {falhas} falhas ({erro}); comandos recusados por {tempo}s",
+                      device_id=disjuntor.device_id, falhas=disjuntor.falhas_seguidas, erro=disjuntor.ultimo_erro, tempo=disjuntor.tempo_aberto)
+        else:
+            log.info('circuito_' + estado, "🔌 Circuito de {device_id}: {anterior} → {estado}",
+                     device_id=disjuntor.device_id, anterior=anterior, estado=estado)
+        self.eventos.publicar('disjuntor', {'device_id': disjuntor.device_id, 'anterior': anterior, 'estado': estado})
+    
+    def _invalidar_status(self, device_id):
+        self.cache_status.invalidar(device_id)
+    
+    def _status_recebido(self, device_id, status):
+        """Evento do WatchStatus: atualiza o status em cache, renova o lease e avisa o stream de eventos"""
+        if not self.dispositivos_conectados.renovar(device_id):
+            return  # dispositivo do host ainda não descoberto (ou já removido)
+        self.cache_status.atualizar(device_id, status)
+        self.eventos.publicar('status', {'device_id': device_id, 'status': status})
+    
+    def _status_perdido(self, device_ids):
+        for device_id in device_ids:
+            self.cache_status.parar_vigia(device_id)
+    
+    def _consultar_status_grpc(self, device_id):
+        """Chama getStatus no dispositivo e converte a mensagem protobuf em dicionário"""
+        device_info = self.dispositivos_conectados.get(device_id)
+        if not device_info:
+            raise KeyError(f"Dispositivo {device_id} não encontrado")
+        stub_class = MonitorStatus.STUBS.get(device_info['tipo'])
+        if not stub_class:
+            raise ValueError(f"{device_info['tipo']} não tem getStatus via gRPC")
+        stub = self.pool_canais.obter_stub(device_info['endereco'], stub_class)
+        resposta = self.comandos.executar(device_id, 'getStatus', stub.getStatus, smart_city_pb2.Vazio())
+        status = status_para_dict(resposta)
+        status['ultima_comunicacao'] = datetime.now().isoformat()
+        return status
+    
     def get_device_status_grpc(self, device_id):
-        """Simula chamada gRPC para obter status detalhado do dispositivo"""
-        print(f"🔍 Consultando status detalhado de {device_id} via gRPC")
+        """Status real do dispositivo: getStatus via gRPC (com cache) ou última leitura dos sensores"""
+        log.debug('status_consultado', "🔍 Consultando status de {device_id}", device_id=device_id)
         
         dispositivo = self.dispositivos_conectados.get(device_id)
         if not dispositivo:
@@ -469,149 +1707,35 @@ class GatewayInteligente:
         tipo = dispositivo.get('tipo', 'UNKNOWN')
         base_status = {
             "device_id": device_id,
-            "nome": dispositivo.get('nome', device_id),
             "tipo": tipo,
             "endereco": dispositivo.get('endereco', 'N/A'),
-            "porta": dispositivo.get('porta', 'N/A'),
-            "status_conexao": "online",
-            "uptime": "2h 34m 12s",
-            "ultima_comunicacao": datetime.now().isoformat(),
-            "versao_firmware": "v2.1.4",
-            "temperatura_interna": f"{20 + (hash(device_id) % 15)}°C"
+            "disjuntor": self.comandos.estado_disjuntor(device_id)
         }
         
-        # Status específico por tipo de dispositivo
-        if tipo == 'CAMERA':
+        if tipo in MonitorStatus.STUBS:
+            status, origem, idade = self.cache_status.obter(device_id, tipo)
+            base_status.update(status)
             base_status.update({
-                "resolucao": "4K (3840x2160)",
-                "fps": 30,
-                "zoom": "2.5x",
-                "modo_gravacao": "continuo",
-                "espaco_storage": "78% usado (156GB/200GB)",
-                "modo_visao_noturna": True,
-                "deteccao_movimento": True,
-                "angulo_visao": "120°",
-                "qualidade_imagem": "excelente",
-                "codec_video": "H.265",
-                "bitrate": "15 Mbps",
-                "status_leds": {
-                    "led_power": "verde",
-                    "led_network": "verde",
-                    "led_recording": "vermelho_piscando"
-                }
+                "status_conexao": "online",
+                "origem": origem,
+                "idade_s": round(idade, 2)
             })
+            return base_status
         
-        elif tipo == 'POSTE_ILUMINACAO':
-            intensidade = 45 + (hash(device_id) % 50)  # 45-95%
-            base_status.update({
-                "intensidade_luz": f"{intensidade}%",
-                "modo_operacao": "automatico",
-                "sensor_luminosidade": f"{300 + (hash(device_id) % 200)} lux",
-                "consumo_energia": f"{85 + (hash(device_id) % 30)}W",
-                "temperatura_led": f"{45 + (hash(device_id) % 20)}°C",
-                "horas_funcionamento": "2847h",
-                "vida_util_restante": "87%",
-                "tipo_lampada": "LED Full Spectrum 100W",
-                "cor_temperatura": "4000K (branco neutro)",
-                "sensor_movimento": True,
-                "programacao": {
-                    "acender": "18:30",
-                    "apagar": "06:00",
-                    "modo_noturno": "ativo"
-                },
-                "manutencao": {
-                    "proxima_manutencao": "2025-09-15",
-                    "ultima_limpeza": "2025-06-20"
-                }
-            })
-        
-        elif tipo == 'SEMAFORO':
-            estados = ['verde', 'amarelo', 'vermelho']
-            estado_atual = estados[hash(device_id) % 3]
-            base_status.update({
-                "estado_atual": estado_atual,
-                "tempo_restante": f"{15 + (hash(device_id) % 45)}s",
-                "modo_operacao": "temporizado",
-                "ciclo_completo": "90s",
-                "tempos_programados": {
-                    "verde": "45s",
-                    "amarelo": "5s", 
-                    "vermelho": "40s"
-                },
-                "sensor_fluxo": True,
-                "veiculos_detectados": hash(device_id) % 8,
-                "pedestres_aguardando": hash(device_id) % 4,
-                "modo_emergencia": False,
-                "controle_central": True,
-                "lampadas_status": {
-                    "led_vermelho": "funcionando",
-                    "led_amarelo": "funcionando", 
-                    "led_verde": "funcionando",
-                    "led_pedestre": "funcionando"
-                },
-                "historico_24h": {
-                    "total_ciclos": 1440,
-                    "interrupcoes": 0,
-                    "modo_emergencia_ativado": 2
-                }
-            })
-        
-        elif tipo == 'SENSOR':
-            # Para sensores RabbitMQ, pegar dados reais se disponíveis
-            if device_id.startswith('TEMP'):
-                dados_temp = self.sensores_dados.get('temperatura', [])
-                ultimo_valor = dados_temp[-1]['valor'] if dados_temp else 20.0
-                base_status.update({
-                    "tipo_sensor": "Temperatura",
-                    "valor_atual": f"{ultimo_valor:.1f}°C",
-                    "unidade": "Celsius",
-                    "precisao": "±0.1°C",
-                    "faixa_operacao": "-40°C a +85°C",
-                    "calibracao": "2025-03-15",
-                    "intervalo_leitura": "10s",
-                    "total_leituras_24h": 8640,
-                    "valor_minimo_24h": f"{ultimo_valor - 5:.1f}°C",
-                    "valor_maximo_24h": f"{ultimo_valor + 8:.1f}°C",
-                    "tendencia": "estável",
-                    "alarmes": {
-                        "temperatura_alta": "desabilitado",
-                        "temperatura_baixa": "desabilitado",
-                        "falha_comunicacao": "ativo"
-                    }
-                })
-            
-            elif device_id.startswith('AIR'):
-                dados_ar = self.sensores_dados.get('qualidade_ar', [])
-                if dados_ar:
-                    ultimo = dados_ar[-1]
-                    base_status.update({
-                        "tipo_sensor": "Qualidade do Ar Multi-parâmetro",
-                        "co2": f"{ultimo['co2']:.1f} ppm",
-                        "pm25": f"{ultimo['pm25']:.1f} µg/m³",
-                        "pm10": f"{ultimo['pm10']:.1f} µg/m³",
-                        "qualidade_geral": ultimo['qualidade'],
-                        "nivel_risco": ultimo.get('nivel_risco', 'Baixo'),
-                        "umidade": f"{45 + (hash(device_id) % 30)}%",
-                        "temperatura_ambiente": f"{18 + (hash(device_id) % 10)}°C",
-                        "pressao_atmosferica": f"{1013 + (hash(device_id) % 20)} hPa",
-                        "indice_qualidade": {
-                            "AQI": hash(device_id) % 150,
-                            "categoria": ultimo['qualidade'],
-                            "recomendacao": self._get_recomendacao_ar(ultimo['qualidade'])
-                        },
-                        "calibracao": {
-                            "co2": "2025-04-10",
-                            "particulas": "2025-04-10", 
-                            "proxima": "2025-10-10"
-                        },
-                        "especificacoes": {
-                            "co2_range": "0-5000 ppm",
-                            "pm25_range": "0-500 µg/m³",
-                            "precisao_co2": "±30 ppm",
-                            "precisao_pm": "±10%"
-                        }
-                    })
-        
+        # Sensores publicam no RabbitMQ: o status é a última leitura recebida
+        ultima = (self.sensores_dados['temperatura'].ultimo_do_sensor(device_id)
+                  or self.sensores_dados['qualidade_ar'].ultimo_do_sensor(device_id))
+        base_status["origem"] = "rabbitmq"
+        if not ultima:
+            base_status["status_conexao"] = "sem_leituras"
+            return base_status
+        base_status.update({
+            "status_conexao": "online",
+            "ultima_comunicacao": ultima.get('timestamp'),
+            "ultima_leitura": ultima
+        })
+        if 'qualidade' in ultima:
+            base_status["recomendacao"] = self._get_recomendacao_ar(ultima['qualidade'])
         return base_status
     
     def _get_recomendacao_ar(self, qualidade):
@@ -625,215 +1749,380 @@ class GatewayInteligente:
         }
         return recomendacoes.get(qualidade, 'Dados insuficientes para recomendação.')
     
+    def _falha_comando(self, e):
+        """(status, código HTTP, mensagem, Retry-After) de um comando que falhou"""
+        if isinstance(e, DispositivoDesconhecido):
+            return 'nao_encontrado', 404, 'Dispositivo não encontrado', None
+        if isinstance(e, CircuitoAberto):
+            return 'recusado', 503, str(e), e.nova_tentativa_s
+        if isinstance(e, grpc.RpcError):
+            # Prazo esgotado -> 504; dispositivo fora do ar ou com erro -> 502
+            codigo_http = 504 if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED else 502
+            return 'erro', codigo_http, f"{e.code().name}: {e.details()}", None
+        return 'erro', 500, str(e), None
+    
+    def _resposta_comando(self, device_id, acao, executar):
+        """Executa o comando de uma rota de controle e traduz falhas em status HTTP"""
+        try:
+            if device_id not in self.dispositivos_conectados:
+                raise DispositivoDesconhecido(device_id)
+            resultado = executar(device_id)
+        except Exception as e:
+            status, codigo_http, mensagem, nova_tentativa = self._falha_comando(e)
+            resposta = jsonify({
+                'sucesso': False,
+                'acao': acao,
+                'device_id': device_id,
+                'status': status,
+                'erro': mensagem
+            })
+            if nova_tentativa:
+                resposta.headers['Retry-After'] = str(nova_tentativa)
+            return resposta, codigo_http
+        
+        self.eventos.publicar('comando', {'device_id': device_id, 'acao': acao, 'resultado': resultado})
+        return jsonify({
+            'sucesso': True,
+            'acao': acao,
+            'device_id': device_id,
+            'resultado': resultado
+        })
+    
+    # ================================
+    # COMANDOS EM LOTE
+    # ================================
+    def _acao_dispositivo(self, tipo, acao, dados):
+        """Função device_id -> resultado de uma ação, ou None se a ação não existe para o tipo"""
+        acoes = {
+            'CAMERA': {
+                'ligar': self.camera_ligar_grpc,
+                'desligar': self.camera_desligar_grpc,
+                'resolucao': lambda device_id: self.camera_set_resolucao_grpc(device_id, dados.get('resolucao', 'HD')),
+                'gravar': self.camera_iniciar_gravacao_grpc,
+                'parar_gravacao': self.camera_parar_gravacao_grpc
+            },
+            'POSTE': {
+                'ligar': self.poste_ligar_lampada_grpc,
+                'desligar': self.poste_desligar_lampada_grpc,
+                'intensidade': lambda device_id: self.poste_set_intensidade_grpc(device_id, dados.get('intensidade', 100))
+            },
+            'SEMAFORO': {
+                'ligar': self.semaforo_ligar_grpc,
+                'desligar': self.semaforo_desligar_grpc,
+                'emergencia': self.semaforo_modo_emergencia_grpc,
+                'tempos': lambda device_id: self.semaforo_set_tempos_grpc(device_id, dados.get('tempos', {}))
+            }
+        }
+        return acoes.get(tipo, {}).get(acao)
+    
+    def _erro_selecao(self, dados):
+        """Mensagem de erro se o corpo ou os campos de seleção do lote vierem em formato inválido"""
+        if not isinstance(dados, dict):
+            return "O corpo deve ser um objeto JSON"
+        dispositivos = dados.get('dispositivos')
+        if dispositivos is not None and (
+                not isinstance(dispositivos, list) or not all(isinstance(d, str) for d in dispositivos)):
+            return "Campo 'dispositivos' deve ser uma lista de ids (strings)"
+        for campo in ('tipo', 'prefixo'):
+            if dados.get(campo) is not None and not isinstance(dados[campo], str):
+                return f"Campo '{campo}' deve ser texto"
+        return None
+    
+    def _selecionar_dispositivos(self, dados, aceitar=None):
+        """Ids do lote: lista explícita em 'dispositivos' ou seletor por 'tipo' e 'prefixo'"""
+        if dados.get('dispositivos'):
+            return list(dict.fromkeys(dados['dispositivos']))
+        tipo = dados.get('tipo')
+        prefixo = dados.get('prefixo', '')
+        return sorted(
+            device_id for device_id, info in self.dispositivos_conectados.items()
+            if (not tipo or info['tipo'] == tipo) and device_id.startswith(prefixo)
+            and (aceitar is None or aceitar(info))
+        )
+    
+    def _executar_comando_lote(self, device_id, executar):
+        inicio = time.perf_counter()
+        try:
+            resultado, status = executar(device_id), 'ok'
+        except Exception as e:
+            # Mesma classificação das rotas de controle: nao_encontrado, recusado (disjuntor) ou erro
+            status, _codigo_http, resultado, _nova_tentativa = self._falha_comando(e)
+        return {
+            'device_id': device_id,
+            'status': status,
+            'resultado': resultado,
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2)
+        }
+    
+    def executar_comandos_lote(self, dados):
+        """Aplica uma ação a vários dispositivos em paralelo (concorrência limitada pelo executor do lote)"""
+        acao = dados.get('acao')
+        inicio = time.perf_counter()
+        resultados = {}
+        tarefas = {}
+        selecionados = self._selecionar_dispositivos(
+            dados, lambda info: self._acao_dispositivo(info['tipo'], acao, dados) is not None)
+        for device_id in selecionados:
+            info = self.dispositivos_conectados.get(device_id)
+            if not info:
+                resultados[device_id] = {'device_id': device_id, 'status': 'nao_encontrado', 'resultado': 'Dispositivo não encontrado'}
+                continue
+            executar = self._acao_dispositivo(info['tipo'], acao, dados)
+            if not executar:
+                resultados[device_id] = {'device_id': device_id, 'status': 'invalido', 'resultado': f"Ação '{acao}' inválida para {info['tipo']}"}
+                continue
+            tarefas[self.comandos_lote_executor.submit(self._executar_comando_lote, device_id, executar)] = device_id
+        
+        concluidas, pendentes = wait(tarefas, timeout=self.comandos_lote_prazo)
+        for tarefa in concluidas:
+            resultado = tarefa.result()
+            resultados[resultado['device_id']] = resultado
+        for tarefa in pendentes:
+            # Prazos por método limitam cada chamada; isto só cobre filas muito longas
+            tarefa.cancel()
+            device_id = tarefas[tarefa]
+            resultados[device_id] = {'device_id': device_id, 'status': 'pendente', 'resultado': f"Sem resposta em {self.comandos_lote_prazo}s"}
+        
+        resumo = {}
+        for resultado in resultados.values():
+            resumo[resultado['status']] = resumo.get(resultado['status'], 0) + 1
+        duracoes = sorted(r['duracao_ms'] for r in resultados.values() if 'duracao_ms' in r)
+        relatorio = {
+            'acao': acao,
+            'total': len(resultados),
+            'resumo': resumo,
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2),
+            'duracao_max_dispositivo_ms': duracoes[-1] if duracoes else None,
+            'resultados': [resultados[device_id] for device_id in sorted(resultados)]
+        }
+        log.info('comando_lote', "📦 Lote '{acao}': {total} dispositivos em {duracao_ms}ms ({resumo})",
+                 acao=acao, total=relatorio['total'], duracao_ms=relatorio['duracao_ms'], resumo=resumo)
+        self.eventos.publicar('comando_lote', {k: v for k, v in relatorio.items() if k != 'resultados'})
+        return relatorio
+    
+    # ================================
+    # STATUS EM LOTE
+    # ================================
+    def _status_lote_item(self, device_id):
+        inicio = time.perf_counter()
+        item = {'device_id': device_id}
+        try:
+            status = self.get_device_status_grpc(device_id)
+            if 'erro' in status:
+                item.update({'resultado': 'nao_encontrado', 'erro': status['erro']})
+            else:
+                item.update({'resultado': 'ok', 'status': status})
+        except grpc.RpcError as e:
+            item.update({'resultado': 'erro', 'erro': f"{e.code().name}: {e.details()}"})
+        except Exception as e:
+            item.update({'resultado': 'erro', 'erro': str(e)})
+        item['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        return item
+    
+    def consultar_status_lote(self, device_ids, prazo):
+        """Gera o status de cada dispositivo na ordem em que fica pronto (cache ou getStatus em paralelo)"""
+        tarefas = {self.status_lote_executor.submit(self._status_lote_item, device_id): device_id for device_id in device_ids}
+        try:
+            for tarefa in as_completed(tarefas, timeout=prazo):
+                yield tarefa.result()
+        except FuturesTimeout:
+            # Dispositivos lentos não seguram o restante: saem como pendentes
+            for tarefa, device_id in tarefas.items():
+                if not tarefa.done():
+                    tarefa.cancel()
+                    yield {'device_id': device_id, 'resultado': 'pendente', 'erro': f"Sem resposta em {prazo}s"}
+    
+    def _resumo_status_lote(self, itens, inicio):
+        resumo = {}
+        origens = {}
+        for item in itens:
+            resumo[item['resultado']] = resumo.get(item['resultado'], 0) + 1
+            if 'status' in item:
+                origem = item['status'].get('origem')
+                origens[origem] = origens.get(origem, 0) + 1
+        return {
+            'total': len(itens),
+            'resumo': resumo,
+            'origens': origens,
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2)
+        }
+    
     def camera_ligar_grpc(self, device_id):
-        print(f"📹 Ligando câmera {device_id} via gRPC")
+        log.debug('comando_enviado', "📹 Ligando câmera {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.CameraStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.Ligar(request)
-                print(f"✅ Câmera {device_id} ligada com sucesso")
-                return "Camera ligada"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.CameraStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'Ligar', stub.Ligar, request)
+            log.info('comando_executado', "✅ Câmera {device_id} ligada com sucesso", device_id=device_id)
+            return "Camera ligada"
         except Exception as e:
-            print(f"❌ Erro ao ligar câmera {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao ligar câmera {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def camera_desligar_grpc(self, device_id):
-        print(f"📹 Desligando câmera {device_id} via gRPC")
+        log.debug('comando_enviado', "📹 Desligando câmera {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.CameraStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.Desligar(request)
-                print(f"✅ Câmera {device_id} desligada com sucesso")
-                return "Camera desligada"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.CameraStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'Desligar', stub.Desligar, request)
+            log.info('comando_executado', "✅ Câmera {device_id} desligada com sucesso", device_id=device_id)
+            return "Camera desligada"
         except Exception as e:
-            print(f"❌ Erro ao desligar câmera {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao desligar câmera {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def camera_set_resolucao_grpc(self, device_id, resolucao):
-        print(f"📹 Alterando resolução da câmera {device_id} para {resolucao} via gRPC")
+        log.debug('comando_enviado', "📹 Alterando resolução da câmera {device_id} para {resolucao} via gRPC", device_id=device_id, resolucao=resolucao)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.CameraStub(channel)
-                request = smart_city_pb2.ConfigCamera(resolucao=resolucao)
-                response = stub.SetResolucao(request)
-                print(f"✅ Resolução da câmera {device_id} alterada para {resolucao}")
-                return f"Resolução alterada para {resolucao}"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.CameraStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.ConfigCamera(resolucao=resolucao)
+            response = self.comandos.executar(device_id, 'SetResolucao', stub.SetResolucao, request)
+            log.info('comando_executado', "✅ Resolução da câmera {device_id} alterada para {resolucao}", device_id=device_id, resolucao=resolucao)
+            return f"Resolução alterada para {resolucao}"
         except Exception as e:
-            print(f"❌ Erro ao alterar resolução da câmera {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao alterar resolução da câmera {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def camera_iniciar_gravacao_grpc(self, device_id):
-        print(f"🔴 Iniciando gravação da câmera {device_id} via gRPC")
+        log.debug('comando_enviado', "🔴 Iniciando gravação da câmera {device_id} via gRPC", device_id=device_id)
         return "Gravação iniciada"
     
     def camera_parar_gravacao_grpc(self, device_id):
-        print(f"⏹️  Parando gravação da câmera {device_id} via gRPC")
+        log.debug('comando_enviado', "⏹️  Parando gravação da câmera {device_id} via gRPC", device_id=device_id)
         return "Gravação parada"
     
     def poste_ligar_lampada_grpc(self, device_id):
-        print(f"💡 Ligando lâmpada do poste {device_id} via gRPC")
+        log.debug('comando_enviado', "💡 Ligando lâmpada do poste {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.PosteStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.LigarLampada(request)
-                print(f"✅ Lâmpada do poste {device_id} ligada com sucesso")
-                return "Lâmpada ligada"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.PosteStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'LigarLampada', stub.LigarLampada, request)
+            log.info('comando_executado', "✅ Lâmpada do poste {device_id} ligada com sucesso", device_id=device_id)
+            return "Lâmpada ligada"
         except Exception as e:
-            print(f"❌ Erro ao ligar lâmpada do poste {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao ligar lâmpada do poste {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def poste_desligar_lampada_grpc(self, device_id):
-        print(f"💡 Desligando lâmpada do poste {device_id} via gRPC")
+        log.debug('comando_enviado', "💡 Desligando lâmpada do poste {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.PosteStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.DesligarLampada(request)
-                print(f"✅ Lâmpada do poste {device_id} desligada com sucesso")
-                return "Lâmpada desligada"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.PosteStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'DesligarLampada', stub.DesligarLampada, request)
+            log.info('comando_executado', "✅ Lâmpada do poste {device_id} desligada com sucesso", device_id=device_id)
+            return "Lâmpada desligada"
         except Exception as e:
-            print(f"❌ Erro ao desligar lâmpada do poste {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao desligar lâmpada do poste {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def poste_set_intensidade_grpc(self, device_id, intensidade):
-        print(f"💡 Alterando intensidade do poste {device_id} para {intensidade}% via gRPC")
+        log.debug('comando_enviado', "💡 Alterando intensidade do poste {device_id} para {intensidade}% via gRPC", device_id=device_id, intensidade=intensidade)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.PosteStub(channel)
-                request = smart_city_pb2.ConfigPoste(intensidade=intensidade)
-                response = stub.SetIntensidade(request)
-                print(f"✅ Intensidade do poste {device_id} alterada para {intensidade}%")
-                return f"Intensidade alterada para {intensidade}%"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.PosteStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.ConfigPoste(intensidade=intensidade)
+            response = self.comandos.executar(device_id, 'SetIntensidade', stub.SetIntensidade, request)
+            log.info('comando_executado', "✅ Intensidade do poste {device_id} alterada para {intensidade}%", device_id=device_id, intensidade=intensidade)
+            return f"Intensidade alterada para {intensidade}%"
         except Exception as e:
-            print(f"❌ Erro ao alterar intensidade do poste {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao alterar intensidade do poste {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def semaforo_ligar_grpc(self, device_id):
-        print(f"🚦 Ligando semáforo {device_id} via gRPC")
+        log.debug('comando_enviado', "🚦 Ligando semáforo {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.SemaforoStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.Ligar(request)
-                print(f"✅ Semáforo {device_id} ligado com sucesso")
-                return "Semáforo ligado"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.SemaforoStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'Ligar', stub.Ligar, request)
+            log.info('comando_executado', "✅ Semáforo {device_id} ligado com sucesso", device_id=device_id)
+            return "Semáforo ligado"
         except Exception as e:
-            print(f"❌ Erro ao ligar semáforo {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao ligar semáforo {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def semaforo_desligar_grpc(self, device_id):
-        print(f"🚦 Desligando semáforo {device_id} via gRPC")
+        log.debug('comando_enviado', "🚦 Desligando semáforo {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.SemaforoStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.Desligar(request)
-                print(f"✅ Semáforo {device_id} desligado com sucesso")
-                return "Semáforo desligado"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.SemaforoStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'Desligar', stub.Desligar, request)
+            log.info('comando_executado', "✅ Semáforo {device_id} desligado com sucesso", device_id=device_id)
+            return "Semáforo desligado"
         except Exception as e:
-            print(f"❌ Erro ao desligar semáforo {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao desligar semáforo {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def semaforo_modo_emergencia_grpc(self, device_id):
-        print(f"🚨 Ativando modo emergência do semáforo {device_id} via gRPC")
+        log.debug('comando_enviado', "🚨 Ativando modo emergência do semáforo {device_id} via gRPC", device_id=device_id)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.SemaforoStub(channel)
-                request = smart_city_pb2.Vazio()
-                response = stub.ModoEmergencia(request)
-                print(f"✅ Modo emergência do semáforo {device_id} ativado")
-                return "Modo emergência ativado"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.SemaforoStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.Vazio()
+            response = self.comandos.executar(device_id, 'ModoEmergencia', stub.ModoEmergencia, request)
+            log.info('comando_executado', "✅ Modo emergência do semáforo {device_id} ativado", device_id=device_id)
+            return "Modo emergência ativado"
         except Exception as e:
-            print(f"❌ Erro ao ativar modo emergência do semáforo {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao ativar modo emergência do semáforo {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def semaforo_set_tempos_grpc(self, device_id, tempos):
-        print(f"🚦 Alterando tempos do semáforo {device_id} via gRPC: {tempos}")
+        log.debug('comando_enviado', "🚦 Alterando tempos do semáforo {device_id} via gRPC: {tempos}", device_id=device_id, tempos=tempos)
         try:
-            device_info = self.dispositivos_conectados.get(device_id)
-            if not device_info:
-                return "Device not found"
-            
-            endereco = device_info['endereco']
-            with grpc.insecure_channel(endereco) as channel:
-                stub = smart_city_pb2_grpc.SemaforoStub(channel)
-                request = smart_city_pb2.ConfigSemaforo(
-                    tempo_vermelho=tempos.get('vermelho', 30),
-                    tempo_verde=tempos.get('verde', 25),
-                    tempo_amarelo=tempos.get('amarelo', 5)
-                )
-                response = stub.SetTempos(request)
-                print(f"✅ Tempos do semáforo {device_id} alterados")
-                return f"Tempos alterados: {tempos}"
+            stub = self._obter_stub(device_id, smart_city_pb2_grpc.SemaforoStub)
+            if not stub:
+                raise DispositivoDesconhecido(device_id)
+            
+            request = smart_city_pb2.ConfigSemaforo(
+                tempo_vermelho=tempos.get('vermelho', 30),
+                tempo_verde=tempos.get('verde', 25),
+                tempo_amarelo=tempos.get('amarelo', 5)
+            )
+            response = self.comandos.executar(device_id, 'SetTempos', stub.SetTempos, request)
+            log.info('comando_executado', "✅ Tempos do semáforo {device_id} alterados", device_id=device_id)
+            return f"Tempos alterados: {tempos}"
         except Exception as e:
-            print(f"❌ Erro ao alterar tempos do semáforo {device_id}: {e}")
-            return f"Erro: {e}"
+            log.erro('comando_falhou', "❌ Erro ao alterar tempos do semáforo {device_id}: {e}", device_id=device_id, e=e)
+            raise
     
     def iniciar_gateway(self):
         """Inicia o Gateway Inteligente"""
         print("🏙️  INICIANDO GATEWAY INTELIGENTE")
         print("="*50)
         
-        # 1. Conectar ao broker
+        # 1. Conectar ao broker e consumir os sensores (reconecta sozinho se o broker cair)
         if not self.conectar_broker():
-            print("❌ Falha ao conectar ao broker. Parando Gateway.")
-            return
-        
-        # 2. Iniciar consumidores
-        self.iniciar_consumidores()
+            print("⚠️ Broker indisponível. O consumo dos sensores começa assim que ele voltar.")
         
-        # 3. Descobrir dispositivos
-        self.descobrir_dispositivos()
+        # 2. Descobrir dispositivos
+        job, _ = self.iniciar_descoberta()
+        job.evento.wait()
         
-        # 4. Iniciar serviço web
+        # 3. Iniciar serviço web
         print(f"🌐 Iniciando serviço web na porta {self.web_port}")
         print(f"📱 Acesse: http://localhost:{self.web_port}")
         print("="*50)
@@ -845,19 +2134,28 @@ class GatewayInteligente:
         flask_thread = threading.Thread(target=run_flask, daemon=True)
         flask_thread.start()
         
-        # 5. Redescoberta periódica
+        # 4. Redescoberta periódica
         try:
             while self.running:
                 time.sleep(120)  # Redescobrir a cada 2 minutos para reduzir ruído
                 if self.running:
-                    print("🔄 Redescoberta automática...")
-                    self.descobrir_dispositivos()
+                    log.info('redescoberta', "🔄 Redescoberta automática...")
+                    job, _ = self.iniciar_descoberta()
+                    job.evento.wait()
                 
         except KeyboardInterrupt:
             print("\n🛑 Parando Gateway...")
             self.running = False
-            if self.broker_connection:
-                self.broker_connection.close()
+            if self.consumidor:
+                self.consumidor.parar()
+            self.monitor_status.parar()
+            self.pool_canais.fechar_todos()
+            self.cache_status.parar()
+            self.health_check_executor.shutdown(wait=False)
+            self.status_lote_executor.shutdown(wait=False)
+            self.comandos_lote_executor.shutdown(wait=False)
+            for armazem in self.armazem_sensores.values():
+                armazem.fechar()
             print("Gateway parado com sucesso!")
 
     def _health_check_loop(self):
@@ -867,85 +2165,155 @@ class GatewayInteligente:
                 time.sleep(self.health_check_interval)
                 if self.running:
                     self._verificar_saude_dispositivos()
+                    self._expirar_dispositivos()
+                    ociosos = self.pool_canais.limpar_ociosos()
+                    if ociosos:
+                        log.info('canais_fechados', "🔌 {quantidade} canais gRPC ociosos fechados", quantidade=len(ociosos))
             except Exception as e:
-                print(f"❌ Erro no health check: {e}")
+                log.erro('health_check_erro', "❌ Erro no health check: {e}", e=e)
 
+    def _sondar_dispositivo(self, device_info, prazo):
+        """Aguarda o canal gRPC ficar pronto; retorna latência em ms (None se o prazo já acabou)"""
+        timeout = min(self.health_check_timeout, prazo - time.time())
+        if timeout <= 0:
+            return None
+        
+        inicio = time.time()
+        canal = self.pool_canais.obter_canal(device_info['endereco'], marcar_uso=False)
+        pronto = grpc.channel_ready_future(canal)
+        try:
+            pronto.result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            pronto.cancel()
+            raise TimeoutError(f"canal não ficou pronto em {timeout:.1f}s")
+        return (time.time() - inicio) * 1000
+    
     def _verificar_saude_dispositivos(self):
         """Verifica se os dispositivos ainda estão responsivos"""
         dispositivos_inativos = []
+        dispositivos_grpc = []
         
-        print("🩺 Verificando saúde dos dispositivos...")
+        log.debug('health_check_iniciado', "🩺 Verificando saúde dos dispositivos...")
         
-        for device_id, device_info in list(self.dispositivos_conectados.items()):
+        for device_id, device_info in self.dispositivos_conectados.items():
             device_type = device_info['tipo']
             
             # Sensores comunicam apenas via RabbitMQ, não precisam de verificação gRPC
             if device_type in ['SENSOR_TEMPERATURA', 'SENSOR_QUALIDADE_AR', 'SENSOR']:
                 # Para sensores, verificamos se recebemos dados recentemente via RabbitMQ
-                agora = datetime.now()
+                # (índice de último contato por sensor_id, O(1))
+                agora = time.time()
                 ultima_leitura = None
                 
-                # Verificar dados de temperatura para TEMP sensors
-                if (device_type == 'SENSOR_TEMPERATURA' or 
-                    (device_type == 'SENSOR' and device_id.startswith('TEMP'))) and self.sensores_dados['temperatura']:
-                    
-                    for temp_data in reversed(self.sensores_dados['temperatura'][-10:]):  # Check last 10 readings
-                        if temp_data.get('sensor_id') == device_id:
-                            ultima_leitura = datetime.fromisoformat(temp_data['timestamp'])
-                            break
-                        
-                # Verificar dados de qualidade do ar para AIR sensors      
-                elif (device_type == 'SENSOR_QUALIDADE_AR' or 
-                      (device_type == 'SENSOR' and device_id.startswith('AIR'))) and self.sensores_dados['qualidade_ar']:
-                    
-                    for ar_data in reversed(self.sensores_dados['qualidade_ar'][-10:]):  # Check last 10 readings
-                        if ar_data.get('sensor_id') == device_id:
-                            ultima_leitura = datetime.fromisoformat(ar_data['timestamp'])
-                            break
+                if device_type == 'SENSOR_TEMPERATURA' or (device_type == 'SENSOR' and device_id.startswith('TEMP')):
+                    ultima_leitura = self.sensores_dados['temperatura'].visto_em(device_id)
+                elif device_type == 'SENSOR_QUALIDADE_AR' or (device_type == 'SENSOR' and device_id.startswith('AIR')):
+                    ultima_leitura = self.sensores_dados['qualidade_ar'].visto_em(device_id)
                 
                 # Se não recebemos dados nos últimos 60 segundos, considerar inativo
-                if ultima_leitura and (agora - ultima_leitura).total_seconds() > 60:
-                    print(f"❌ SENSOR {device_id} sem dados há {int((agora - ultima_leitura).total_seconds())}s")
+                if ultima_leitura and agora - ultima_leitura > 60:
+                    log.aviso('sensor_inativo', "❌ SENSOR {device_id} sem dados há {segundos}s",
+                              device_id=device_id, segundos=int(agora - ultima_leitura))
                     dispositivos_inativos.append(device_id)
                 else:
                     if ultima_leitura:
-                        segundos_atras = int((agora - ultima_leitura).total_seconds())
-                        print(f"✅ SENSOR {device_id} dados recentes ({segundos_atras}s atrás)")
+                        segundos_atras = int(agora - ultima_leitura)
+                        log.debug('sensor_ativo', "✅ SENSOR {device_id} dados recentes ({segundos_atras}s atrás)", device_id=device_id, segundos_atras=segundos_atras)
                     else:
-                        print(f"⚠️ SENSOR {device_id} sem dados recentes, mas mantendo ativo")
+                        log.aviso('sensor_atrasado', "⚠️ SENSOR {device_id} sem dados recentes, mas mantendo ativo", device_id=device_id)
                 continue
             
-            # Para dispositivos gRPC (câmeras, postes, semáforos)
-            ip = device_info['ip']
-            porta = device_info['porta_grpc']
-            
+            # Dispositivos gRPC (câmeras, postes, semáforos) são sondados em paralelo
+            dispositivos_grpc.append((device_id, device_info))
+        
+        # Sondagem paralela com limite de concorrência e prazo por varredura
+        inicio_varredura = time.time()
+        prazo = inicio_varredura + self.health_check_deadline
+        # Dispositivos de um mesmo host compartilham o canal: uma sondagem por endereço
+        por_endereco = {}
+        for device_id, device_info in dispositivos_grpc:
+            por_endereco.setdefault(device_info['endereco'], []).append((device_id, device_info))
+        # Um stream WatchStatus aberto já prova que o endereço responde
+        vigiados_por_stream = [endereco for endereco in por_endereco if self.monitor_status.conectado(endereco)]
+        ativos_por_stream = []
+        for endereco in vigiados_por_stream:
+            ativos_por_stream.extend(device_id for device_id, _ in por_endereco.pop(endereco))
+        sondagens = {
+            self.health_check_executor.submit(self._sondar_dispositivo, dispositivos[0][1], prazo): dispositivos
+            for dispositivos in por_endereco.values()
+        }
+        # Cada sondagem respeita o prazo, então a espera nunca passa muito dele
+        wait(sondagens, timeout=self.health_check_deadline + 1)
+        
+        latencias_ms = {}
+        nao_verificados = []
+        for sondagem, dispositivos in sondagens.items():
+            if not sondagem.done():
+                sondagem.cancel()
+                nao_verificados.extend(device_id for device_id, _ in dispositivos)
+                continue
             try:
-                with grpc.insecure_channel(f'{ip}:{porta}', options=[
-                    ('grpc.keepalive_time_ms', 5000),
-                    ('grpc.keepalive_timeout_ms', 2000),
-                    ('grpc.keepalive_permit_without_calls', True),
-                    ('grpc.http2.max_pings_without_data', 0),
-                    ('grpc.http2.min_time_between_pings_ms', 1000),
-                    ('grpc.http2.min_ping_interval_without_data_ms', 5000)
-                ]) as channel:
-                    grpc.channel_ready_future(channel).result(timeout=self.health_check_timeout)
-                    print(f"✅ {device_info['tipo']} {device_id} está ativo")
-                    
+                latencia = sondagem.result()
+                if latencia is None:
+                    # Prazo da varredura esgotou antes da sondagem começar
+                    nao_verificados.extend(device_id for device_id, _ in dispositivos)
+                    continue
+                for device_id, device_info in dispositivos:
+                    latencias_ms[device_id] = round(latencia, 1)
+                    log.debug('dispositivo_ativo', "✅ {tipo} {device_id} está ativo ({latencia:.1f}ms)",
+                              tipo=device_info['tipo'], device_id=device_id, latencia=latencia)
             except Exception as e:
-                print(f"❌ {device_info['tipo']} {device_id} não está respondendo: {e}")
-                dispositivos_inativos.append(device_id)
+                for device_id, device_info in dispositivos:
+                    log.aviso('dispositivo_sem_resposta', "❌ {tipo} {device_id} não está respondendo: {e}",
+                              tipo=device_info['tipo'], device_id=device_id, e=e)
+                    dispositivos_inativos.append(device_id)
+        
+        duracao_varredura = time.time() - inicio_varredura
+        # Só conta quem foi de fato sondado; cobertos por stream ficam em campo próprio
+        sondados = sum(len(dispositivos) for dispositivos in por_endereco.values())
+        self.ultimo_health_check = {
+            'inicio': datetime.fromtimestamp(inicio_varredura).isoformat(),
+            'duracao_ms': round(duracao_varredura * 1000, 1),
+            'dispositivos_sondados': sondados,
+            'enderecos_sondados': len(por_endereco),
+            'dispositivos_com_stream': len(ativos_por_stream),
+            'enderecos_com_stream': len(vigiados_por_stream),
+            'ativos': len(latencias_ms) + len(ativos_por_stream),
+            'inativos': list(dispositivos_inativos),
+            'nao_verificados': nao_verificados,
+            'latencias_ms': latencias_ms
+        }
+        self.last_health_check = time.time()
+        
+        log.info('health_check_concluido', "⏱️ Varredura gRPC: {quantidade} dispositivos sondados em {duracao:.2f}s ({com_stream} cobertos por stream)",
+                 quantidade=sondados, duracao=duracao_varredura, com_stream=len(ativos_por_stream))
+        if nao_verificados:
+            log.aviso('health_check_prazo', "⚠️ {quantidade} dispositivos não verificados (prazo de {prazo}s esgotado)",
+                      quantidade=len(nao_verificados), prazo=self.health_check_deadline)
         
         # Remove dispositivos que não respondem
+        enderecos_removidos = set()
         for device_id in dispositivos_inativos:
-            device_info = self.dispositivos_conectados[device_id]
-            print(f"🗑️ Removendo {device_info['tipo']} {device_id} (inativo)")
-            del self.dispositivos_conectados[device_id]
+            device_info = self.dispositivos_conectados.remover(device_id)
+            if not device_info:
+                continue  # já removido por uma redescoberta durante a varredura
+            log.aviso('dispositivo_removido', "🗑️ Removendo {tipo} {device_id} (inativo)",
+                      tipo=device_info['tipo'], device_id=device_id)
+            enderecos_removidos.add(device_info['endereco'])
+            self.comandos.esquecer(device_id)
+            self.cache_status.esquecer(device_id)
+        self._liberar_canais(enderecos_removidos)
         
         if dispositivos_inativos:
-            print(f"📊 Dispositivos ativos restantes: {len(self.dispositivos_conectados)}")
+            log.info('dispositivos_restantes', "📊 Dispositivos ativos restantes: {quantidade}",
+                     quantidade=len(self.dispositivos_conectados))
         else:
-            print("✅ Todos os dispositivos estão saudáveis")
+            log.info('health_check_ok', "✅ Todos os dispositivos estão saudáveis")
 
 if __name__ == "__main__":
-    gateway = GatewayInteligente()
+    import sys
+    
+    # Uso: python Gateway.py [WORKERS_INGESTAO]
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    gateway = GatewayInteligente(workers_ingestao=workers)
     gateway.iniciar_gateway()
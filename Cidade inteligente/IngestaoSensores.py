@@ -0,0 +1,408 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import pika
+from datetime import datetime
+from LogCidade import obter_logger
+from FormatoSensores import decodificar_leitura
+
+log = obter_logger('ingestao')
+
+# ================================
+# CONSUMIDOR DAS FILAS DE SENSORES
+# ================================
+class ConsumidorSensores:
+    """Consome as filas dos sensores com prefetch, ack em lote, dead-lettering e reconexão.
+
+    `processadores` mapeia fila -> funcao(body, properties). Uma exceção no
+    processador manda a mensagem para a fila de mortas (com a causa nos headers)
+    em vez de deixá-la presa sem ack. Mensagens processadas são confirmadas em
+    lote com `multiple=True`, a cada `lote_ack` mensagens ou `intervalo_ack` segundos.
+
+    Usa SelectConnection em uma thread própria: se o broker cair, a conexão é
+    reaberta com backoff exponencial, as filas são redeclaradas e o consumo retomado.
+    """
+    def __init__(self, processadores, host='localhost', prefetch=200, lote_ack=50,
+                 intervalo_ack=0.5, fila_mortas='sensores_mortas', backoff_inicial=1, backoff_maximo=30):
+        self.processadores = dict(processadores)
+        self.host = host
+        self.prefetch = prefetch
+        self.lote_ack = lote_ack
+        self.intervalo_ack = intervalo_ack
+        self.fila_mortas = fila_mortas
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.connection = None
+        self.channel = None
+        self._thread = None
+        self._parando = threading.Event()
+        self._consumindo = threading.Event()
+
+        # Ack em lote: maior delivery_tag processado ainda não confirmado (por canal)
+        self._ultimo_tag = None
+        self._pendentes = 0
+
+        # Estado da conexão
+        self.estado = 'parado'   # conectando, consumindo, desconectado, parado
+        self.reconexoes = 0
+        self.ultimo_erro = None
+        self._desconectado_desde = None
+        self._tempo_desconectado = 0.0
+
+        self.estatisticas_consumo = {
+            'recebidas': 0,
+            'processadas': 0,
+            'falhas': 0,
+            'mortas': 0,
+            'acks_enviados': 0,
+            'formatos': {}   # content_type -> mensagens recebidas
+        }
+
+    # ---------- ciclo de conexão ----------
+    def iniciar(self):
+        self._parando.clear()
+        self._marcar_desconectado()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def aguardar_conexao(self, timeout=None):
+        """Bloqueia até o consumo começar; retorna False se o tempo esgotar"""
+        return self._consumindo.wait(timeout)
+
+    def _executar(self):
+        backoff = self.backoff_inicial
+        while not self._parando.is_set():
+            self.estado = 'conectando'
+            self.connection = pika.SelectConnection(
+                pika.ConnectionParameters(self.host, heartbeat=30),
+                on_open_callback=self._ao_abrir_conexao,
+                on_open_error_callback=self._ao_falhar_conexao,
+                on_close_callback=self._ao_fechar_conexao
+            )
+            self.connection.ioloop.start()   # retorna quando a conexão cai ou parar() é chamado
+
+            if self._consumindo.is_set():
+                backoff = self.backoff_inicial   # chegou a consumir: recomeça o backoff
+            self._consumindo.clear()
+            self._marcar_desconectado()
+            if self._parando.is_set():
+                break
+
+            self.reconexoes += 1
+            log.aviso('broker_reconectando', "⚠️ Broker indisponível ({erro}); nova tentativa em {backoff}s",
+                      erro=self.ultimo_erro, backoff=backoff)
+            self._parando.wait(backoff)
+            backoff = min(backoff * 2, self.backoff_maximo)
+        self.estado = 'parado'
+
+    def _ao_abrir_conexao(self, connection):
+        connection.channel(on_open_callback=self._ao_abrir_canal)
+
+    def _ao_falhar_conexao(self, connection, erro):
+        self.ultimo_erro = str(erro) or erro.__class__.__name__
+        connection.ioloop.stop()
+
+    def _ao_fechar_conexao(self, connection, motivo):
+        self.channel = None
+        if not self._parando.is_set():
+            self.ultimo_erro = str(motivo) or motivo.__class__.__name__
+            log.erro('broker_desconectado', "❌ Conexão com o broker perdida: {motivo}", motivo=self.ultimo_erro)
+        connection.ioloop.stop()
+
+    def _ao_abrir_canal(self, channel):
+        self.channel = channel
+        # Delivery tags são por canal: um lote pendente do canal anterior não pode ser confirmado
+        self._ultimo_tag = None
+        self._pendentes = 0
+        channel.add_on_close_callback(self._ao_fechar_canal)
+        self._declarar_filas(list(self.processadores) + [self.fila_mortas])
+
+    def _ao_fechar_canal(self, channel, motivo):
+        self.channel = None
+        if self.connection and self.connection.is_open:
+            self.ultimo_erro = str(motivo)
+            self.connection.close()
+
+    def _declarar_filas(self, filas):
+        if not filas:
+            # Limita mensagens em voo por consumidor (sem isso o broker empurra a fila inteira)
+            self.channel.basic_qos(prefetch_count=self.prefetch, callback=self._ao_configurar_qos)
+            return
+        self.channel.queue_declare(
+            queue=filas[0], durable=True,
+            callback=lambda _frame: self._declarar_filas(filas[1:])
+        )
+
+    def _ao_configurar_qos(self, _frame):
+        for fila, processador in self.processadores.items():
+            self.channel.basic_consume(queue=fila, on_message_callback=self._callback(fila, processador))
+        self.connection.ioloop.call_later(self.intervalo_ack, self._confirmar_periodicamente)
+        self._marcar_conectado()
+        log.info('consumo_iniciado', "🎯 Consumindo dados dos sensores (prefetch={prefetch}, lote de ack={lote})",
+                 prefetch=self.prefetch, lote=self.lote_ack)
+
+    def _marcar_conectado(self):
+        if self._desconectado_desde is not None:
+            self._tempo_desconectado += time.monotonic() - self._desconectado_desde
+            self._desconectado_desde = None
+        self.estado = 'consumindo'
+        self._consumindo.set()
+
+    def _marcar_desconectado(self):
+        if self._desconectado_desde is None:
+            self._desconectado_desde = time.monotonic()
+        self.estado = 'desconectado'
+
+    # ---------- processamento ----------
+    def _callback(self, fila, processador):
+        def callback(ch, method, properties, body):
+            self.estatisticas_consumo['recebidas'] += 1
+            formatos = self.estatisticas_consumo['formatos']
+            content_type = properties.content_type or 'application/json'
+            formatos[content_type] = formatos.get(content_type, 0) + 1
+            try:
+                processador(body, properties)
+                self.estatisticas_consumo['processadas'] += 1
+            except Exception as e:
+                self.estatisticas_consumo['falhas'] += 1
+                log.erro('leitura_invalida', "❌ Erro ao processar mensagem de {fila}: {e}", fila=fila, e=e)
+                self._descartar(ch, method, properties, body, fila, e)
+                return
+            self._ultimo_tag = method.delivery_tag
+            self._pendentes += 1
+            if self._pendentes >= self.lote_ack:
+                self._confirmar()
+        return callback
+
+    def _descartar(self, ch, method, properties, body, fila, erro):
+        """Encaminha a mensagem para a fila de mortas e a retira da fila original"""
+        # Confirma antes o lote pendente: os tags anteriores já foram processados
+        self._confirmar()
+        headers = dict(properties.headers or {})
+        headers.update({
+            'x-fila-origem': fila,
+            'x-erro': str(erro)[:500],
+            'x-morta-em': datetime.now().isoformat()
+        })
+        try:
+            ch.basic_publish(
+                exchange='',
+                routing_key=self.fila_mortas,
+                body=body,
+                properties=pika.BasicProperties(
+                    content_type=properties.content_type,
+                    headers=headers,
+                    delivery_mode=2
+                )
+            )
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            self.estatisticas_consumo['mortas'] += 1
+        except Exception as e:
+            # Sem fila de mortas: rejeita sem recolocar (vai para o DLX da fila, se houver)
+            log.erro('dead_letter_erro', "❌ Erro ao enviar para {fila_mortas}: {e}", fila_mortas=self.fila_mortas, e=e)
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+    def _confirmar(self):
+        if self._ultimo_tag is None or self.channel is None or not self.channel.is_open:
+            return
+        self.channel.basic_ack(delivery_tag=self._ultimo_tag, multiple=True)
+        self.estatisticas_consumo['acks_enviados'] += 1
+        self._ultimo_tag = None
+        self._pendentes = 0
+
+    def _confirmar_periodicamente(self):
+        # Garante o ack de lotes incompletos quando o tráfego é baixo
+        if self.channel is None:
+            return
+        self._confirmar()
+        self.connection.ioloop.call_later(self.intervalo_ack, self._confirmar_periodicamente)
+
+    def parar(self):
+        self._parando.set()
+        connection = self.connection
+        if connection is None:
+            return
+
+        def encerrar():
+            self._confirmar()
+            if connection.is_open:
+                connection.close()
+            else:
+                connection.ioloop.stop()
+
+        try:
+            connection.ioloop.add_callback_threadsafe(encerrar)
+            if self._thread:
+                self._thread.join(timeout=5)
+        except Exception:
+            pass
+
+    def estatisticas(self):
+        tempo_desconectado = self._tempo_desconectado
+        if self._desconectado_desde is not None:
+            tempo_desconectado += time.monotonic() - self._desconectado_desde
+        return {
+            **self.estatisticas_consumo,
+            'formatos': dict(self.estatisticas_consumo['formatos']),
+            'estado': self.estado,
+            'reconexoes': self.reconexoes,
+            'tempo_desconectado_s': round(tempo_desconectado, 1),
+            'ultimo_erro': self.ultimo_erro,
+            'pendentes_ack': self._pendentes,
+            'prefetch': self.prefetch,
+            'lote_ack': self.lote_ack
+        }
+
+# ================================
+# PROCESSOS DE INGESTÃO
+# ================================
+def _executar_worker(indice, filas, esquemas, diretorio_dados, saida, parar, host, prefetch, lote_ack, lote_saida, intervalo_saida):
+    """Processo de ingestão: consome as filas, decodifica, persiste no seu próprio
+    armazém e envia as leituras em lotes para o processo da API"""
+    from ArmazenamentoSensores import ArmazemSegmentos
+
+    log_worker = obter_logger(f'ingestao.{indice}')
+    armazens = {
+        tipo: ArmazemSegmentos(os.path.join(diretorio_dados, f'worker_{indice}', tipo), **esquema)
+        for tipo, esquema in esquemas.items()
+    }
+    lotes = {tipo: [] for tipo in esquemas}
+    lock = threading.Lock()
+
+    def enviar_lotes():
+        with lock:
+            prontos = [(tipo, leituras) for tipo, leituras in lotes.items() if leituras]
+            for tipo, _ in prontos:
+                lotes[tipo] = []
+        for tipo, leituras in prontos:
+            saida.put((tipo, leituras))
+
+    def processador(tipo):
+        armazem = armazens[tipo]
+        def processar(body, properties):
+            dados = decodificar_leitura(tipo, body, properties.content_type)
+            armazem.adicionar(dados)
+            with lock:
+                lotes[tipo].append(dados)
+                cheio = len(lotes[tipo]) >= lote_saida
+            if cheio:
+                enviar_lotes()
+        return processar
+
+    consumidor = ConsumidorSensores(
+        {fila: processador(tipo) for fila, tipo in filas.items()},
+        host=host, prefetch=prefetch, lote_ack=lote_ack
+    )
+    consumidor.iniciar()
+    log_worker.info('worker_iniciado', "⚙️ Worker de ingestão {indice} iniciado (pid {pid})", indice=indice, pid=os.getpid())
+
+    while not parar.wait(intervalo_saida):
+        enviar_lotes()
+        saida.put(('__estatisticas__', (indice, consumidor.estatisticas())))
+
+    consumidor.parar()
+    enviar_lotes()
+    for armazem in armazens.values():
+        armazem.fechar()
+
+class PoolIngestao:
+    """N processos de ingestão consumindo as mesmas filas em paralelo.
+
+    O broker distribui as mensagens entre os processos (consumidores concorrentes).
+    Cada processo decodifica e grava em `diretorio_dados/worker_<n>/<tipo>`; o
+    processo da API lê esses armazéns e recebe as leituras já decodificadas em
+    lotes, chamando `aplicar(tipo, leituras)` em uma thread de drenagem.
+    """
+    def __init__(self, workers, filas, esquemas, diretorio_dados, aplicar, host='localhost',
+                 prefetch=200, lote_ack=50, lote_saida=100, intervalo_saida=0.2):
+        self.workers = workers
+        self.filas = dict(filas)          # fila -> tipo
+        self.esquemas = dict(esquemas)    # tipo -> kwargs de ArmazemSegmentos
+        self.diretorio_dados = diretorio_dados
+        self.aplicar = aplicar
+        self.host = host
+        self.prefetch = prefetch
+        self.lote_ack = lote_ack
+        self.lote_saida = lote_saida
+        self.intervalo_saida = intervalo_saida
+        # spawn: não herda as threads do Flask/health check do processo da API
+        self._contexto = multiprocessing.get_context('spawn')
+        self._saida = self._contexto.Queue(maxsize=10000)
+        self._parar = self._contexto.Event()
+        self._processos = []
+        self._drenagem = None
+        self._estatisticas_workers = {}
+        self.lotes_recebidos = 0
+        self.leituras_recebidas = 0
+
+    def iniciar(self):
+        for indice in range(self.workers):
+            processo = self._contexto.Process(
+                target=_executar_worker,
+                args=(indice, self.filas, self.esquemas, self.diretorio_dados, self._saida, self._parar,
+                      self.host, self.prefetch, self.lote_ack, self.lote_saida, self.intervalo_saida),
+                name=f'ingestao_{indice}',
+                daemon=True
+            )
+            processo.start()
+            self._processos.append(processo)
+        self._drenagem = threading.Thread(target=self._drenar, daemon=True)
+        self._drenagem.start()
+        log.info('pool_ingestao_iniciado', "⚙️ {workers} processos de ingestão iniciados", workers=self.workers)
+
+    def _drenar(self):
+        while not self._parar.is_set() or not self._saida.empty():
+            try:
+                tipo, conteudo = self._saida.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if tipo == '__estatisticas__':
+                indice, estatisticas = conteudo
+                self._estatisticas_workers[indice] = estatisticas
+                continue
+            self.lotes_recebidos += 1
+            self.leituras_recebidas += len(conteudo)
+            try:
+                self.aplicar(tipo, conteudo)
+            except Exception as e:
+                log.erro('lote_invalido', "❌ Erro ao aplicar lote de {tipo}: {e}", tipo=tipo, e=e)
+
+    def aguardar_conexao(self, timeout=None):
+        """True quando algum worker informou que está consumindo"""
+        limite = time.monotonic() + (timeout or 0)
+        while True:
+            if any(e.get('estado') == 'consumindo' for e in self._estatisticas_workers.values()):
+                return True
+            if timeout is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(0.1)
+
+    @property
+    def ultimo_erro(self):
+        erros = [e.get('ultimo_erro') for e in self._estatisticas_workers.values() if e.get('ultimo_erro')]
+        return erros[0] if erros else None
+
+    def parar(self):
+        self._parar.set()
+        for processo in self._processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        if self._drenagem:
+            self._drenagem.join(timeout=2)
+
+    def estatisticas(self):
+        workers = [
+            {'worker': indice, 'pid': processo.pid, 'vivo': processo.is_alive(),
+             **self._estatisticas_workers.get(indice, {})}
+            for indice, processo in enumerate(self._processos)
+        ]
+        return {
+            'estado': 'consumindo' if any(w.get('estado') == 'consumindo' for w in workers) else 'desconectado',
+            'workers': workers,
+            'lotes_recebidos': self.lotes_recebidos,
+            'leituras_recebidas': self.leituras_recebidas
+        }
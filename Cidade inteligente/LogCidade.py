@@ -0,0 +1,222 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+# ================================
+# LOGGING ESTRUTURADO DA CIDADE INTELIGENTE
+# ================================
+# Uso:
+#   log = obter_logger('gateway')
+#   configurar_evento('temperatura_recebida', amostragem=0.1, por_segundo=5)
+#   log.info('temperatura_recebida', "📊 Temperatura recebida: {valor}°C de {sensor_id}",
+#            valor=dados['valor'], sensor_id=dados['sensor_id'])
+#
+# O chamador só paga pela checagem de nível/amostragem e por um enqueue; a
+# formatação da mensagem e a escrita no console acontecem em uma thread de fundo.
+#
+# Variáveis de ambiente:
+#   CIDADE_LOG_NIVEL    DEBUG, INFO (padrão), AVISO, ERRO
+#   CIDADE_LOG_FORMATO  texto (padrão) ou json (uma linha JSON por evento)
+
+NIVEIS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'AVISO': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERRO': logging.ERROR,
+    'ERROR': logging.ERROR
+}
+
+NOME_RAIZ = 'cidade'
+
+class MensagemEvento:
+    """Mensagem com formatação adiada (str() só é chamado na thread de escrita)"""
+    __slots__ = ('modelo', 'campos')
+
+    def __init__(self, modelo, campos):
+        self.modelo = modelo
+        self.campos = campos
+
+    def __str__(self):
+        if not self.campos:
+            return self.modelo
+        try:
+            return self.modelo.format(**self.campos)
+        except (KeyError, IndexError, ValueError):
+            return self.modelo
+
+class LimiteEvento:
+    """Amostragem + limite de taxa (token bucket) de um tipo de evento"""
+    def __init__(self, amostragem=1.0, por_segundo=None, rajada=None):
+        self.amostragem = amostragem
+        self.por_segundo = por_segundo
+        self.rajada = rajada if rajada is not None else (por_segundo or 0)
+        self.tokens = self.rajada
+        self.atualizado_em = time.monotonic()
+        self.suprimidos = 0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Retorna (permitido, suprimidos_desde_o_ultimo_permitido)"""
+        with self._lock:
+            if self.amostragem < 1.0 and random.random() >= self.amostragem:
+                self.suprimidos += 1
+                return False, 0
+            if self.por_segundo is not None:
+                agora = time.monotonic()
+                self.tokens = min(self.rajada, self.tokens + (agora - self.atualizado_em) * self.por_segundo)
+                self.atualizado_em = agora
+                if self.tokens < 1:
+                    self.suprimidos += 1
+                    return False, 0
+                self.tokens -= 1
+            suprimidos, self.suprimidos = self.suprimidos, 0
+            return True, suprimidos
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """QueueHandler que não formata no chamador e descarta quando a fila enche"""
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+class FormatoTexto(logging.Formatter):
+    """Mesma saída dos antigos print(), com aviso de eventos suprimidos"""
+    def format(self, record):
+        mensagem = record.getMessage()
+        suprimidos = getattr(record, 'suprimidos', 0)
+        if suprimidos:
+            mensagem += f" (+{suprimidos} suprimidos)"
+        if record.exc_info:
+            mensagem += '\n' + self.formatException(record.exc_info)
+        return mensagem
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por evento, com os campos estruturados"""
+    def format(self, record):
+        entrada = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+            'nivel': record.levelname,
+            'componente': record.name,
+            'evento': getattr(record, 'evento', None),
+            'mensagem': record.getMessage()
+        }
+        campos = getattr(record, 'campos', None)
+        if campos:
+            entrada['campos'] = campos
+        suprimidos = getattr(record, 'suprimidos', 0)
+        if suprimidos:
+            entrada['suprimidos'] = suprimidos
+        if record.exc_info:
+            entrada['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(entrada, ensure_ascii=False, default=str)
+
+class LoggerCidade:
+    """Logger de um componente; eventos nomeados com campos estruturados"""
+    def __init__(self, nome):
+        self.nome = nome
+        self._logger = logging.getLogger(f"{NOME_RAIZ}.{nome}")
+
+    def _log(self, nivel, evento, modelo, campos, exc_info=None):
+        if not self._logger.isEnabledFor(nivel):
+            return
+        suprimidos = 0
+        limite = _limites.get(evento)
+        if limite is not None:
+            permitido, suprimidos = limite.permitir()
+            if not permitido:
+                return
+        self._logger.log(
+            nivel, MensagemEvento(modelo, campos), exc_info=exc_info,
+            extra={'evento': evento, 'campos': campos, 'suprimidos': suprimidos}
+        )
+
+    def debug(self, evento, modelo, **campos):
+        self._log(logging.DEBUG, evento, modelo, campos)
+
+    def info(self, evento, modelo, **campos):
+        self._log(logging.INFO, evento, modelo, campos)
+
+    def aviso(self, evento, modelo, **campos):
+        self._log(logging.WARNING, evento, modelo, campos)
+
+    def erro(self, evento, modelo, exc_info=None, **campos):
+        self._log(logging.ERROR, evento, modelo, campos, exc_info=exc_info)
+
+    def ativo(self, nivel):
+        """True se o nível está habilitado (para evitar montar campos caros)"""
+        return self._logger.isEnabledFor(NIVEIS.get(nivel, nivel) if isinstance(nivel, str) else nivel)
+
+# ================================
+# CONFIGURAÇÃO
+# ================================
+_limites = {}
+_config_lock = threading.Lock()
+_listener = None
+_handler = None
+
+def configurar_evento(evento, amostragem=1.0, por_segundo=None, rajada=None):
+    """Define amostragem (0..1) e/ou limite de eventos por segundo para um tipo de evento"""
+    _limites[evento] = LimiteEvento(amostragem, por_segundo, rajada)
+
+def configurar_logs(nivel=None, formato=None, saida=None, tamanho_fila=10000):
+    """(Re)configura o handler assíncrono do logger raiz 'cidade'"""
+    global _listener, _handler
+    nivel = nivel or os.environ.get('CIDADE_LOG_NIVEL', 'INFO')
+    formato = formato or os.environ.get('CIDADE_LOG_FORMATO', 'texto')
+
+    with _config_lock:
+        raiz = logging.getLogger(NOME_RAIZ)
+        if _listener is not None:
+            _listener.stop()
+            raiz.removeHandler(_handler)
+
+        destino = logging.StreamHandler(saida or sys.stdout)
+        destino.setFormatter(FormatoJSON() if formato == 'json' else FormatoTexto())
+
+        fila = queue.Queue(maxsize=tamanho_fila)
+        _handler = HandlerFila(fila)
+        _listener = logging.handlers.QueueListener(fila, destino, respect_handler_level=False)
+        _listener.start()
+
+        raiz.addHandler(_handler)
+        raiz.setLevel(NIVEIS.get(str(nivel).upper(), logging.INFO))
+        raiz.propagate = False
+
+def encerrar_logs():
+    """Esvazia a fila e para a thread de escrita"""
+    global _listener
+    with _config_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def estatisticas_logs():
+    return {
+        'pendentes': _handler.queue.qsize() if _handler else 0,
+        'descartados': _handler.descartados if _handler else 0,
+        'suprimidos': {evento: limite.suprimidos for evento, limite in _limites.items() if limite.suprimidos}
+    }
+
+def obter_logger(nome):
+    if _listener is None:
+        configurar_logs()
+    return LoggerCidade(nome)
+
+atexit.register(encerrar_logs)
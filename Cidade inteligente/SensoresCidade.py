@@ -1,14 +1,353 @@
 import pika
+import asyncio
+import bisect
+import collections
 import json
 import time
 import random
 import threading
 import socket
 from datetime import datetime
+from LogCidade import obter_logger, configurar_evento
+from FormatoSensores import codificar_leitura, formato_padrao
+
+log = obter_logger('sensores')
+# Muitos sensores no mesmo processo: limita as linhas de publicação no console
+configurar_evento('temperatura_publicada', por_segundo=5)
+configurar_evento('qualidade_ar_publicada', por_segundo=5)
+
+# ================================
+# PUBLICAÇÃO EM LOTE COM CONFIRMAÇÕES
+# ================================
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+class PublicadorSensores:
+    """Publica leituras em lote com publisher confirms, em uma conexão própria.
+
+    `publicar()` só enfileira em memória e retorna na hora; uma thread com
+    SelectConnection envia o buffer quando ele atinge `lote` mensagens ou a cada
+    `intervalo` segundos, sem esperar o broker entre uma mensagem e outra. O
+    broker confirma (ack/nack, muitas vezes com `multiple`) e pode agrupar a
+    gravação em disco das mensagens persistentes.
+
+    No máximo `max_em_voo` mensagens ficam sem confirmação; mensagens rejeitadas
+    ou em voo quando a conexão cai voltam para o início do buffer (entrega
+    pelo menos uma vez). Com o buffer em `limite_buffer`, `publicar()` retorna False.
+    """
+    def __init__(self, host='localhost', lote=100, intervalo=0.2, limite_buffer=10000,
+                 max_em_voo=1000, backoff_inicial=1, backoff_maximo=30):
+        self.host = host
+        self.lote = lote
+        self.intervalo = intervalo
+        self.limite_buffer = limite_buffer
+        self.max_em_voo = max_em_voo
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.connection = None
+        self.channel = None
+        self._thread = None
+        self._parando = threading.Event()
+        self._pronto = threading.Event()
+
+        self._lock = threading.Lock()
+        self._buffer = collections.deque()   # (fila, body, content_type, aceita_em)
+        self._envio_agendado = False
+        self._em_voo = {}                    # delivery_tag -> (fila, body, content_type, aceita_em)
+        self._proximo_tag = 1
+        self._filas = set()
+        self._latencias = collections.deque(maxlen=1000)   # aceita -> confirmada, em segundos
+
+        self.estado = 'parado'
+        self.reconexoes = 0
+        self.ultimo_erro = None
+        self.estatisticas_publicacao = {
+            'aceitas': 0,
+            'descartadas': 0,
+            'publicadas': 0,
+            'confirmadas': 0,
+            'rejeitadas': 0,
+            'reenviadas': 0,
+            'lotes': 0
+        }
+
+    # ---------- API para os sensores (qualquer thread) ----------
+    def declarar_fila(self, fila):
+        with self._lock:
+            nova = fila not in self._filas
+            self._filas.add(fila)
+        if nova and self._pronto.is_set():
+            self._no_loop(lambda: self.channel and self.channel.queue_declare(queue=fila, durable=True))
+
+    def publicar(self, fila, body, content_type=None):
+        """Enfileira uma mensagem persistente; False se o buffer estiver cheio"""
+        with self._lock:
+            if len(self._buffer) >= self.limite_buffer:
+                self.estatisticas_publicacao['descartadas'] += 1
+                return False
+            self._buffer.append((fila, body, content_type, time.monotonic()))
+            self.estatisticas_publicacao['aceitas'] += 1
+            agendar = len(self._buffer) >= self.lote and not self._envio_agendado
+            if agendar:
+                self._envio_agendado = True
+        if agendar:
+            self._no_loop(self._enviar)
+        return True
+
+    def _no_loop(self, funcao):
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            connection.ioloop.add_callback_threadsafe(funcao)
+        except Exception:
+            pass   # conexão sendo recriada: o envio periódico da nova conexão cobre o buffer
+
+    # ---------- ciclo de conexão ----------
+    def iniciar(self):
+        self._parando.clear()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def aguardar_conexao(self, timeout=None):
+        return self._pronto.wait(timeout)
+
+    def _executar(self):
+        backoff = self.backoff_inicial
+        while not self._parando.is_set():
+            self.estado = 'conectando'
+            self.connection = pika.SelectConnection(
+                pika.ConnectionParameters(self.host, heartbeat=30),
+                on_open_callback=lambda conexao: conexao.channel(on_open_callback=self._ao_abrir_canal),
+                on_open_error_callback=self._ao_falhar_conexao,
+                on_close_callback=self._ao_fechar_conexao
+            )
+            self.connection.ioloop.start()
+
+            if self._pronto.is_set():
+                backoff = self.backoff_inicial
+            self._pronto.clear()
+            self._devolver_em_voo()
+            if self._parando.is_set():
+                break
+
+            self.estado = 'desconectado'
+            self.reconexoes += 1
+            log.aviso('broker_reconectando', "⚠️ Publicador sem broker ({erro}); nova tentativa em {backoff}s",
+                      erro=self.ultimo_erro, backoff=backoff)
+            self._parando.wait(backoff)
+            backoff = min(backoff * 2, self.backoff_maximo)
+        self.estado = 'parado'
+
+    def _ao_falhar_conexao(self, connection, erro):
+        self.ultimo_erro = str(erro) or erro.__class__.__name__
+        connection.ioloop.stop()
+
+    def _ao_fechar_conexao(self, connection, motivo):
+        self.channel = None
+        if not self._parando.is_set():
+            self.ultimo_erro = str(motivo) or motivo.__class__.__name__
+            log.erro('broker_desconectado', "❌ Publicador perdeu a conexão com o broker: {motivo}", motivo=self.ultimo_erro)
+        connection.ioloop.stop()
+
+    def _ao_abrir_canal(self, channel):
+        self.channel = channel
+        # Delivery tags recomeçam em 1 a cada canal
+        self._proximo_tag = 1
+        channel.add_on_close_callback(self._ao_fechar_canal)
+        with self._lock:
+            filas = list(self._filas)
+        for fila in filas:
+            channel.queue_declare(queue=fila, durable=True)
+        channel.confirm_delivery(ack_nack_callback=self._ao_confirmar, callback=self._ao_ativar_confirmacoes)
+
+    def _ao_fechar_canal(self, channel, motivo):
+        self.channel = None
+        if self.connection and self.connection.is_open:
+            self.ultimo_erro = str(motivo)
+            self.connection.close()
+
+    def _ao_ativar_confirmacoes(self, _frame):
+        self.estado = 'publicando'
+        self._pronto.set()
+        log.info('publicador_conectado', "🔗 Publicador conectado (lote={lote}, intervalo={intervalo}s, confirms ativos)",
+                 lote=self.lote, intervalo=self.intervalo)
+        self._enviar_periodicamente()
+
+    # ---------- envio e confirmações (thread do ioloop) ----------
+    def _enviar(self):
+        with self._lock:
+            self._envio_agendado = False
+        if self.channel is None or not self.channel.is_open:
+            return
+        enviadas = 0
+        while len(self._em_voo) < self.max_em_voo:
+            with self._lock:
+                if not self._buffer:
+                    break
+                mensagem = self._buffer.popleft()
+            fila, body, content_type, _aceita_em = mensagem
+            try:
+                self.channel.basic_publish(
+                    exchange='',
+                    routing_key=fila,
+                    body=body,
+                    properties=pika.BasicProperties(content_type=content_type, delivery_mode=2)  # Persistente
+                )
+            except Exception as e:
+                # Canal/conexão caindo: a mensagem volta para o início do buffer e sai na próxima conexão
+                with self._lock:
+                    self._buffer.appendleft(mensagem)
+                self.ultimo_erro = str(e) or e.__class__.__name__
+                log.aviso('publicacao_falhou', "⚠️ Falha ao publicar ({erro}); {n} mensagens aguardam no buffer",
+                          erro=self.ultimo_erro, n=len(self._buffer))
+                break
+            self._em_voo[self._proximo_tag] = mensagem
+            self._proximo_tag += 1
+            enviadas += 1
+        if enviadas:
+            self.estatisticas_publicacao['publicadas'] += enviadas
+            self.estatisticas_publicacao['lotes'] += 1
+
+    def _enviar_periodicamente(self):
+        if self.channel is None:
+            return
+        self._enviar()
+        self.connection.ioloop.call_later(self.intervalo, self._enviar_periodicamente)
+
+    def _ao_confirmar(self, frame):
+        metodo = frame.method
+        confirmado = isinstance(metodo, pika.spec.Basic.Ack)
+        if metodo.multiple:
+            tags = []
+            for tag in self._em_voo:   # em ordem crescente de tag
+                if tag > metodo.delivery_tag:
+                    break
+                tags.append(tag)
+        else:
+            tags = [metodo.delivery_tag]
+
+        agora = time.monotonic()
+        rejeitadas = []
+        for tag in tags:
+            mensagem = self._em_voo.pop(tag, None)
+            if mensagem is None:
+                continue
+            if confirmado:
+                self._latencias.append(agora - mensagem[3])
+            else:
+                rejeitadas.append(mensagem)
+
+        if confirmado:
+            self.estatisticas_publicacao['confirmadas'] += len(tags)
+        else:
+            self.estatisticas_publicacao['rejeitadas'] += len(rejeitadas)
+            log.aviso('publicacao_rejeitada', "⚠️ Broker rejeitou {n} mensagens; reenviando", n=len(rejeitadas))
+            self._reenfileirar(rejeitadas)
+
+        # Abriu espaço na janela de mensagens em voo
+        if self._buffer and len(self._em_voo) < self.max_em_voo:
+            self._enviar()
+
+    def _reenfileirar(self, mensagens):
+        if not mensagens:
+            return
+        with self._lock:
+            self._buffer.extendleft(reversed(mensagens))
+        self.estatisticas_publicacao['reenviadas'] += len(mensagens)
+
+    def _devolver_em_voo(self):
+        """Mensagens sem confirmação de uma conexão perdida voltam para o buffer"""
+        mensagens = list(self._em_voo.values())
+        self._em_voo.clear()
+        self._reenfileirar(mensagens)
+
+    # ---------- encerramento e métricas ----------
+    def parar(self, timeout=5):
+        """Envia o que resta no buffer, espera as confirmações (até `timeout`) e fecha"""
+        limite = time.monotonic() + timeout
+        if self._pronto.is_set():
+            self._no_loop(self._enviar)
+            while (self._buffer or self._em_voo) and time.monotonic() < limite:
+                time.sleep(0.05)
+        self._parando.set()
+        connection = self.connection
+        if connection is None:
+            return
+
+        def encerrar():
+            if connection.is_open:
+                connection.close()
+            else:
+                connection.ioloop.stop()
+
+        try:
+            connection.ioloop.add_callback_threadsafe(encerrar)
+            if self._thread:
+                self._thread.join(timeout=5)
+        except Exception:
+            pass
+
+    def estatisticas(self):
+        latencias = list(self._latencias)
+        def em_ms(valor):
+            return round(valor * 1000, 2) if valor is not None else None
+        return {
+            **self.estatisticas_publicacao,
+            'estado': self.estado,
+            'reconexoes': self.reconexoes,
+            'ultimo_erro': self.ultimo_erro,
+            'no_buffer': len(self._buffer),
+            'em_voo': len(self._em_voo),
+            'latencia_confirmacao_ms': {
+                'p50': em_ms(_percentil(latencias, 0.50)),
+                'p95': em_ms(_percentil(latencias, 0.95)),
+                'max': em_ms(max(latencias) if latencias else None)
+            }
+        }
+
+# ================================
+# QUALIDADE DO AR
+# ================================
+# Limites de pontuação (0 = excelente ... 4 = péssima) de cada poluente
+LIMITES_CO2 = (400, 600, 1000, 1500)    # ppm - padrões de conforto indoor/outdoor
+LIMITES_PM25 = (12, 25, 50, 100)        # µg/m³ - padrões OMS
+LIMITES_PM10 = (20, 40, 80, 150)        # µg/m³ - padrões OMS
+LIMITES_MEDIA = (0.5, 1.2, 2.0, 3.0)
+CLASSES_QUALIDADE = ("EXCELENTE", "BOA", "MODERADA", "RUIM", "PÉSSIMA")
+
+NIVEIS_RISCO = {
+    "EXCELENTE": "Baixo",
+    "BOA": "Baixo",
+    "MODERADA": "Médio",
+    "RUIM": "Alto",
+    "PÉSSIMA": "Muito Alto"
+}
+
+def classificar_qualidade_ar(co2, pm25, pm10):
+    """Classificação pela pontuação média dos três poluentes (padrões da OMS e EPA)"""
+    pontuacao = (bisect.bisect_left(LIMITES_CO2, co2) +
+                 bisect.bisect_left(LIMITES_PM25, pm25) +
+                 bisect.bisect_left(LIMITES_PM10, pm10))
+    return CLASSES_QUALIDADE[bisect.bisect_left(LIMITES_MEDIA, pontuacao / 3)]
+
+def faixas_variacao_ar(hora):
+    """Faixas de variação (co2, pm25, pm10) de uma leitura conforme o horário"""
+    if 6 <= hora <= 9 or 17 <= hora <= 20:  # Rush hours
+        return (20, 80), (2, 12), (3, 15)
+    if 22 <= hora or hora <= 5:  # Madrugada - melhor qualidade
+        return (-30, 10), (-3, 2), (-5, 3)
+    return (-20, 40), (-2, 8), (-3, 10)  # Demais horários
 
 class SensorTemperatura:
-    def __init__(self, sensor_id="TEMP001"):
+    def __init__(self, sensor_id="TEMP001", formato=None, publicador=None):
         self.sensor_id = sensor_id
+        self.formato = formato or formato_padrao()  # 'json' ou 'protobuf'
+        self.publicador = publicador  # PublicadorSensores compartilhado (modo em lote)
         self.temperatura = 20.0
         self.ativo = True
         self.intervalo = 15  # segundos
@@ -17,6 +356,11 @@ class SensorTemperatura:
         
     def conectar_broker(self, broker_host='localhost', queue='sensor_temperatura'):
         """Conecta ao broker RabbitMQ"""
+        if self.publicador:
+            # A conexão (e a reconexão) é do publicador compartilhado
+            self.publicador.declarar_fila(queue)
+            self.queue = queue
+            return True
         try:
             self.connection = pika.BlockingConnection(
                 pika.ConnectionParameters(broker_host)
@@ -24,10 +368,10 @@ class SensorTemperatura:
             self.channel = self.connection.channel()
             self.channel.queue_declare(queue=queue, durable=True)
             self.queue = queue
-            print(f"[{self.sensor_id}] Conectado ao broker RabbitMQ")
+            log.info('broker_conectado', "[{sensor_id}] Conectado ao broker RabbitMQ", sensor_id=self.sensor_id)
             return True
         except Exception as e:
-            print(f"[{self.sensor_id}] Erro ao conectar broker: {e}")
+            log.erro('broker_erro', "[{sensor_id}] Erro ao conectar broker: {e}", sensor_id=self.sensor_id, e=e)
             return False
     
     def gerar_leitura(self):
@@ -46,26 +390,32 @@ class SensorTemperatura:
         }
     
     def publicar_dados(self):
-        """Publica dados no broker"""
-        if not self.channel:
+        """Publica dados no broker (direto ou pelo buffer do publicador em lote)"""
+        if not self.channel and not self.publicador:
             return False
             
         try:
             dados = self.gerar_leitura()
-            message = json.dumps(dados)
+            message, content_type = codificar_leitura('temperatura', dados, self.formato)
             
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=self.queue,
-                body=message,
-                properties=pika.BasicProperties(delivery_mode=2)  # Persistente
-            )
+            if self.publicador:
+                if not self.publicador.publicar(self.queue, message, content_type):
+                    log.aviso('buffer_cheio', "[{sensor_id}] Buffer do publicador cheio; leitura descartada", sensor_id=self.sensor_id)
+                    return False
+            else:
+                self.channel.basic_publish(
+                    exchange='',
+                    routing_key=self.queue,
+                    body=message,
+                    properties=pika.BasicProperties(content_type=content_type, delivery_mode=2)  # Persistente
+                )
             
-            print(f"[{self.sensor_id}] 🌡️  Temperatura: {dados['valor']}°C")
+            log.info('temperatura_publicada', "[{sensor_id}] 🌡️  Temperatura: {valor}°C",
+                     sensor_id=self.sensor_id, valor=dados['valor'])
             return True
             
         except Exception as e:
-            print(f"[{self.sensor_id}] Erro ao publicar: {e}")
+            log.erro('publicacao_erro', "[{sensor_id}] Erro ao publicar: {e}", sensor_id=self.sensor_id, e=e)
             return False
     
     def iniciar_monitoramento(self):
@@ -75,7 +425,7 @@ class SensorTemperatura:
                 if self.publicar_dados():
                     time.sleep(self.intervalo)
                 else:
-                    print(f"[{self.sensor_id}] Tentando reconectar...")
+                    log.aviso('reconectando', "[{sensor_id}] Tentando reconectar...", sensor_id=self.sensor_id)
                     time.sleep(5)
                     if not self.conectar_broker():
                         time.sleep(10)
@@ -85,8 +435,10 @@ class SensorTemperatura:
         return sensor_thread
 
 class SensorQualidadeAr:
-    def __init__(self, sensor_id="AIR001"):
+    def __init__(self, sensor_id="AIR001", formato=None, publicador=None):
         self.sensor_id = sensor_id
+        self.formato = formato or formato_padrao()  # 'json' ou 'protobuf'
+        self.publicador = publicador  # PublicadorSensores compartilhado (modo em lote)
         self.co2 = 400.0  # ppm (partes por milhão)
         self.pm25 = 15.0  # µg/m³ (microgramas por metro cúbico)
         self.pm10 = 25.0  # µg/m³
@@ -97,6 +449,11 @@ class SensorQualidadeAr:
         
     def conectar_broker(self, broker_host='localhost', queue='sensor_qualidade_ar'):
         """Conecta ao broker RabbitMQ"""
+        if self.publicador:
+            # A conexão (e a reconexão) é do publicador compartilhado
+            self.publicador.declarar_fila(queue)
+            self.queue = queue
+            return True
         try:
             self.connection = pika.BlockingConnection(
                 pika.ConnectionParameters(broker_host)
@@ -104,10 +461,10 @@ class SensorQualidadeAr:
             self.channel = self.connection.channel()
             self.channel.queue_declare(queue=queue, durable=True)
             self.queue = queue
-            print(f"[{self.sensor_id}] Conectado ao broker RabbitMQ")
+            log.info('broker_conectado', "[{sensor_id}] Conectado ao broker RabbitMQ", sensor_id=self.sensor_id)
             return True
         except Exception as e:
-            print(f"[{self.sensor_id}] Erro ao conectar broker: {e}")
+            log.erro('broker_erro', "[{sensor_id}] Erro ao conectar broker: {e}", sensor_id=self.sensor_id, e=e)
             return False
     
     def gerar_leitura(self):
@@ -116,18 +473,10 @@ class SensorQualidadeAr:
         hora_atual = datetime.now().hour
         
         # Padrões de poluição mais realísticos
-        if 6 <= hora_atual <= 9 or 17 <= hora_atual <= 20:  # Rush hours
-            variacao_co2 = random.uniform(20, 80)
-            variacao_pm25 = random.uniform(2, 12)
-            variacao_pm10 = random.uniform(3, 15)
-        elif 22 <= hora_atual or hora_atual <= 5:  # Madrugada - melhor qualidade
-            variacao_co2 = random.uniform(-30, 10)
-            variacao_pm25 = random.uniform(-3, 2)
-            variacao_pm10 = random.uniform(-5, 3)
-        else:  # Demais horários
-            variacao_co2 = random.uniform(-20, 40)
-            variacao_pm25 = random.uniform(-2, 8)
-            variacao_pm10 = random.uniform(-3, 10)
+        faixa_co2, faixa_pm25, faixa_pm10 = faixas_variacao_ar(hora_atual)
+        variacao_co2 = random.uniform(*faixa_co2)
+        variacao_pm25 = random.uniform(*faixa_pm25)
+        variacao_pm10 = random.uniform(*faixa_pm10)
         
         # Aplica variações
         self.co2 = max(300, min(2000, self.co2 + variacao_co2))
@@ -151,68 +500,11 @@ class SensorQualidadeAr:
     
     def classificar_qualidade_ar(self):
         """Classifica a qualidade do ar baseada nos padrões internacionais"""
-        pontuacao = 0
-        
-        # CO2 (ppm) - Padrões de conforto indoor/outdoor
-        if self.co2 <= 400:
-            pontuacao += 0  # Excelente
-        elif self.co2 <= 600:
-            pontuacao += 1  # Boa
-        elif self.co2 <= 1000:
-            pontuacao += 2  # Moderada
-        elif self.co2 <= 1500:
-            pontuacao += 3  # Ruim
-        else:
-            pontuacao += 4  # Péssima
-        
-        # PM2.5 (µg/m³) - Padrões OMS
-        if self.pm25 <= 12:
-            pontuacao += 0  # Excelente
-        elif self.pm25 <= 25:
-            pontuacao += 1  # Boa
-        elif self.pm25 <= 50:
-            pontuacao += 2  # Moderada
-        elif self.pm25 <= 100:
-            pontuacao += 3  # Ruim
-        else:
-            pontuacao += 4  # Péssima
-        
-        # PM10 (µg/m³) - Padrões OMS
-        if self.pm10 <= 20:
-            pontuacao += 0  # Excelente
-        elif self.pm10 <= 40:
-            pontuacao += 1  # Boa
-        elif self.pm10 <= 80:
-            pontuacao += 2  # Moderada
-        elif self.pm10 <= 150:
-            pontuacao += 3  # Ruim
-        else:
-            pontuacao += 4  # Péssima
-        
-        # Classificação final baseada na pontuação média
-        media = pontuacao / 3
-        
-        if media <= 0.5:
-            return "EXCELENTE"
-        elif media <= 1.2:
-            return "BOA"
-        elif media <= 2.0:
-            return "MODERADA"
-        elif media <= 3.0:
-            return "RUIM"
-        else:
-            return "PÉSSIMA"
+        return classificar_qualidade_ar(self.co2, self.pm25, self.pm10)
     
     def obter_nivel_risco(self, qualidade):
         """Retorna nível de risco baseado na qualidade"""
-        niveis = {
-            "EXCELENTE": "Baixo",
-            "BOA": "Baixo", 
-            "MODERADA": "Médio",
-            "RUIM": "Alto",
-            "PÉSSIMA": "Muito Alto"
-        }
-        return niveis.get(qualidade, "Desconhecido")
+        return NIVEIS_RISCO.get(qualidade, "Desconhecido")
         
         return {
             'sensor_id': self.sensor_id,
@@ -226,20 +518,25 @@ class SensorQualidadeAr:
         }
     
     def publicar_dados(self):
-        """Publica dados no broker"""
-        if not self.channel:
+        """Publica dados no broker (direto ou pelo buffer do publicador em lote)"""
+        if not self.channel and not self.publicador:
             return False
             
         try:
             dados = self.gerar_leitura()
-            message = json.dumps(dados)
+            message, content_type = codificar_leitura('qualidade_ar', dados, self.formato)
             
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=self.queue,
-                body=message,
-                properties=pika.BasicProperties(delivery_mode=2)  # Persistente
-            )
+            if self.publicador:
+                if not self.publicador.publicar(self.queue, message, content_type):
+                    log.aviso('buffer_cheio', "[{sensor_id}] Buffer do publicador cheio; leitura descartada", sensor_id=self.sensor_id)
+                    return False
+            else:
+                self.channel.basic_publish(
+                    exchange='',
+                    routing_key=self.queue,
+                    body=message,
+                    properties=pika.BasicProperties(content_type=content_type, delivery_mode=2)  # Persistente
+                )
             
             # Emojis e cores baseadas na qualidade
             emojis = {
@@ -251,11 +548,13 @@ class SensorQualidadeAr:
             }
             
             emoji = emojis.get(dados['qualidade'], "⚪")
-            print(f"[{self.sensor_id}] {emoji} {dados['qualidade']} ({dados['nivel_risco']} risco) | CO2: {dados['co2']}ppm | PM2.5: {dados['pm25']}µg/m³ | PM10: {dados['pm10']}µg/m³")
+            log.info('qualidade_ar_publicada', "[{sensor_id}] {emoji} {qualidade} ({nivel_risco} risco) | CO2: {co2}ppm | PM2.5: {pm25}µg/m³ | PM10: {pm10}µg/m³",
+                     sensor_id=self.sensor_id, emoji=emoji, qualidade=dados['qualidade'], nivel_risco=dados['nivel_risco'],
+                     co2=dados['co2'], pm25=dados['pm25'], pm10=dados['pm10'])
             return True
             
         except Exception as e:
-            print(f"[{self.sensor_id}] Erro ao publicar: {e}")
+            log.erro('publicacao_erro', "[{sensor_id}] Erro ao publicar: {e}", sensor_id=self.sensor_id, e=e)
             return False
     
     def iniciar_monitoramento(self):
@@ -265,7 +564,7 @@ class SensorQualidadeAr:
                 if self.publicar_dados():
                     time.sleep(self.intervalo)
                 else:
-                    print(f"[{self.sensor_id}] Tentando reconectar...")
+                    log.aviso('reconectando', "[{sensor_id}] Tentando reconectar...", sensor_id=self.sensor_id)
                     time.sleep(5)
                     if not self.conectar_broker():
                         time.sleep(10)
@@ -297,9 +596,9 @@ class SensorMulticast:
                 mreq = socket.inet_aton(self.multicast_group) + socket.inet_aton('0.0.0.0')
                 sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
                 
-                print(f"[{self.sensor_id}] Escutando descoberta multicast em {self.multicast_group}:{self.multicast_port}")
+                log.info('descoberta_escutando', "[{sensor_id}] Escutando descoberta multicast em {multicast_group}:{multicast_port}", sensor_id=self.sensor_id, multicast_group=self.multicast_group, multicast_port=self.multicast_port)
             except Exception as e:
-                print(f"[{self.sensor_id}] Erro ao configurar multicast: {e}")
+                log.erro('descoberta_erro', "[{sensor_id}] Erro ao configurar multicast: {e}", sensor_id=self.sensor_id, e=e)
                 return
             
             while True:
@@ -308,7 +607,7 @@ class SensorMulticast:
                     message = json.loads(data.decode())
                     
                     if message.get('type') == 'DISCOVERY_REQUEST':
-                        print(f"[{self.sensor_id}] Recebida solicitação de descoberta de {addr}")
+                        log.debug('descoberta_recebida', "[{sensor_id}] Recebida solicitação de descoberta de {addr}", sensor_id=self.sensor_id, addr=addr)
                         
                         # Responder com informações do sensor
                         response = {
@@ -326,7 +625,7 @@ class SensorMulticast:
                             import requests
                             gateway_url = f"http://{addr[0]}:5000/api/discovery/register"
                             requests.post(gateway_url, json=response, timeout=2)
-                            print(f"[{self.sensor_id}] Registrado via HTTP no Gateway")
+                            log.debug('registrado_http', "[{sensor_id}] Registrado via HTTP no Gateway", sensor_id=self.sensor_id)
                         except:
                             pass  # Falha silenciosa se HTTP não funcionar
                         
@@ -341,33 +640,261 @@ class SensorMulticast:
                         )
                         response_sock.close()
                         
-                        print(f"[{self.sensor_id}] Resposta enviada para Gateway na porta {response_port}")
+                        log.debug('descoberta_respondida', "[{sensor_id}] Resposta enviada para Gateway na porta {response_port}", sensor_id=self.sensor_id, response_port=response_port)
                         
                 except Exception as e:
-                    print(f"[{self.sensor_id}] Erro na descoberta: {e}")
+                    log.erro('descoberta_erro', "[{sensor_id}] Erro na descoberta: {e}", sensor_id=self.sensor_id, e=e)
         
         discovery_thread = threading.Thread(target=listen_discovery, daemon=True)
         discovery_thread.start()
 
+# ================================
+# FROTA DE SENSORES VIRTUAIS
+# ================================
+class FrotaSensores:
+    """Milhares de sensores virtuais em um loop asyncio, para teste de carga do Gateway.
+
+    O estado de cada sensor fica em colunas (listas indexadas pelo sensor) e as
+    leituras são geradas em lote: a cada `tick`, um único passo atualiza todos
+    os sensores que vencem naquele intervalo (em média `taxa` leituras por
+    segundo por sensor). A frota é dividida entre `conexoes` publicadores em
+    lote (uma conexão AMQP cada, com confirms). Sensores virtuais não respondem
+    à descoberta multicast.
+    """
+    def __init__(self, temperatura=1000, qualidade_ar=1000, taxa=1.0, conexoes=2, lote=200,
+                 formato=None, host='localhost', prefixo_temperatura='TEMP', prefixo_qualidade_ar='AIR',
+                 inicio_id=1, tick=0.1, limite_buffer=50000):
+        self.taxa = taxa
+        self.tick = tick
+        self.formato = formato or formato_padrao()
+        self.publicadores = [
+            PublicadorSensores(host, lote=lote, limite_buffer=limite_buffer)
+            for _ in range(max(1, conexoes))
+        ]
+        for publicador in self.publicadores:
+            publicador.declarar_fila('sensor_temperatura')
+            publicador.declarar_fila('sensor_qualidade_ar')
+
+        self.ids = {
+            'temperatura': [f"{prefixo_temperatura}{inicio_id + i:05d}" for i in range(temperatura)],
+            'qualidade_ar': [f"{prefixo_qualidade_ar}{inicio_id + i:05d}" for i in range(qualidade_ar)]
+        }
+        # Estado inicial espalhado para os sensores não andarem juntos
+        self.temperaturas = [random.uniform(15.0, 30.0) for _ in range(temperatura)]
+        self.co2 = [random.uniform(380.0, 600.0) for _ in range(qualidade_ar)]
+        self.pm25 = [random.uniform(8.0, 30.0) for _ in range(qualidade_ar)]
+        self.pm10 = [random.uniform(15.0, 45.0) for _ in range(qualidade_ar)]
+
+        self._parar = None
+        self.iniciada_em = None
+        self.estatisticas_frota = {
+            'geradas': 0,
+            'descartadas': 0,   # buffer do publicador cheio
+            'ticks_atrasados': 0
+        }
+
+    # ---------- geração em lote ----------
+    def _gerar_temperatura(self, indices, timestamp):
+        ids = self.ids['temperatura']
+        valores = self.temperaturas
+        uniforme = random.uniform
+        leituras = []
+        for i in indices:
+            valor = valores[i] + uniforme(-2.0, 2.0)
+            valor = 5.0 if valor < 5.0 else 45.0 if valor > 45.0 else valor
+            valores[i] = valor
+            leituras.append({
+                'sensor_id': ids[i],
+                'tipo': 'temperatura',
+                'valor': round(valor, 2),
+                'unidade': '°C',
+                'timestamp': timestamp,
+                'localizacao': 'Rua Principal, Centro'
+            })
+        return leituras
+
+    def _gerar_qualidade_ar(self, indices, timestamp):
+        ids = self.ids['qualidade_ar']
+        co2, pm25, pm10 = self.co2, self.pm25, self.pm10
+        (co2_min, co2_max), (pm25_min, pm25_max), (pm10_min, pm10_max) = faixas_variacao_ar(datetime.now().hour)
+        uniforme = random.uniform
+        leituras = []
+        for i in indices:
+            c = min(2000.0, max(300.0, co2[i] + uniforme(co2_min, co2_max)))
+            p25 = min(200.0, max(5.0, pm25[i] + uniforme(pm25_min, pm25_max)))
+            p10 = min(300.0, max(8.0, pm10[i] + uniforme(pm10_min, pm10_max)))
+            co2[i], pm25[i], pm10[i] = c, p25, p10
+            qualidade = classificar_qualidade_ar(c, p25, p10)
+            leituras.append({
+                'sensor_id': ids[i],
+                'tipo': 'qualidade_ar',
+                'co2': round(c, 1),
+                'pm25': round(p25, 1),
+                'pm10': round(p10, 1),
+                'qualidade': qualidade,
+                'nivel_risco': NIVEIS_RISCO[qualidade],
+                'timestamp': timestamp,
+                'localizacao': 'Avenida Central, Centro'
+            })
+        return leituras
+
+    # ---------- loop asyncio ----------
+    async def _simular(self, tipo, fila, gerar):
+        total = len(self.ids[tipo])
+        if not total:
+            return
+        publicadores = self.publicadores
+        conexoes = len(publicadores)
+        por_tick = total * self.taxa * self.tick
+        acumulado = 0.0
+        cursor = 0
+        loop = asyncio.get_running_loop()
+        proximo = loop.time()
+
+        while not self._parar.is_set():
+            # Quantos sensores vencem neste tick; o cursor percorre a frota em rodízio
+            acumulado += por_tick
+            quantidade = int(acumulado)
+            acumulado -= quantidade
+            if quantidade:
+                indices = [(cursor + j) % total for j in range(quantidade)]
+                cursor = (cursor + quantidade) % total
+                for indice, dados in zip(indices, gerar(indices, datetime.now().isoformat())):
+                    body, content_type = codificar_leitura(tipo, dados, self.formato)
+                    if not publicadores[indice % conexoes].publicar(fila, body, content_type):
+                        self.estatisticas_frota['descartadas'] += 1
+                self.estatisticas_frota['geradas'] += quantidade
+
+            proximo += self.tick
+            espera = proximo - loop.time()
+            if espera < 0:
+                # Geração mais lenta que o tick: não acumula atraso infinito
+                self.estatisticas_frota['ticks_atrasados'] += 1
+                proximo = loop.time()
+                espera = 0
+            try:
+                await asyncio.wait_for(self._parar.wait(), espera)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _relatar(self, intervalo):
+        while not self._parar.is_set():
+            try:
+                await asyncio.wait_for(self._parar.wait(), intervalo)
+            except asyncio.TimeoutError:
+                pass
+            estatisticas = self.estatisticas()
+            log.info('frota_estatisticas', "🏙️  Frota: {taxa_real}/s geradas | {confirmadas} confirmadas | {em_voo} em voo | {no_buffer} no buffer | {descartadas} descartadas | p95 {p95} ms",
+                     taxa_real=estatisticas['leituras_por_segundo'], confirmadas=estatisticas['confirmadas'],
+                     em_voo=estatisticas['em_voo'], no_buffer=estatisticas['no_buffer'],
+                     descartadas=estatisticas['descartadas'], p95=estatisticas['latencia_confirmacao_p95_ms'])
+
+    async def _principal(self, duracao, intervalo_relatorio):
+        self._parar = asyncio.Event()
+        tarefas = [
+            asyncio.create_task(self._simular('temperatura', 'sensor_temperatura', self._gerar_temperatura)),
+            asyncio.create_task(self._simular('qualidade_ar', 'sensor_qualidade_ar', self._gerar_qualidade_ar)),
+            asyncio.create_task(self._relatar(intervalo_relatorio))
+        ]
+        try:
+            if duracao:
+                await asyncio.sleep(duracao)
+            else:
+                await asyncio.Event().wait()   # até Ctrl+C
+        finally:
+            self._parar.set()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+
+    def executar(self, duracao=None, intervalo_relatorio=10):
+        """Roda a frota por `duracao` segundos (ou até Ctrl+C) e retorna as estatísticas"""
+        for publicador in self.publicadores:
+            publicador.iniciar()
+        for publicador in self.publicadores:
+            if not publicador.aguardar_conexao(5):
+                log.aviso('broker_erro', "⚠️ Broker indisponível; as leituras ficam no buffer até a conexão voltar")
+                break
+        self.iniciada_em = time.monotonic()
+        try:
+            asyncio.run(self._principal(duracao, intervalo_relatorio))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for publicador in self.publicadores:
+                publicador.parar()
+        return self.estatisticas()
+
+    def estatisticas(self):
+        publicadores = [publicador.estatisticas() for publicador in self.publicadores]
+        decorrido = time.monotonic() - self.iniciada_em if self.iniciada_em else 0
+        p95 = [p['latencia_confirmacao_ms']['p95'] for p in publicadores if p['latencia_confirmacao_ms']['p95'] is not None]
+        return {
+            **self.estatisticas_frota,
+            'sensores': {tipo: len(ids) for tipo, ids in self.ids.items()},
+            'leituras_por_segundo': round(self.estatisticas_frota['geradas'] / decorrido, 1) if decorrido else 0,
+            'confirmadas': sum(p['confirmadas'] for p in publicadores),
+            'em_voo': sum(p['em_voo'] for p in publicadores),
+            'no_buffer': sum(p['no_buffer'] for p in publicadores),
+            'latencia_confirmacao_p95_ms': max(p95) if p95 else None,
+            'publicadores': publicadores
+        }
+
 def main():
     """Função principal para executar sensores"""
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="Sensores da Cidade Inteligente",
+        epilog="Exemplos: python SensoresCidade.py TEMPERATURA TEMP001 | "
+               "python SensoresCidade.py FROTA --temperatura 5000 --qualidade-ar 5000 --taxa 2"
+    )
+    parser.add_argument('tipo', type=str.upper, choices=['TEMPERATURA', 'QUALIDADE_AR', 'TODOS', 'FROTA'])
+    parser.add_argument('id', nargs='?', default=None)
+    # Formato binário (padrão: JSON ou CIDADE_SENSORES_FORMATO)
+    parser.add_argument('--protobuf', action='store_true', help='publica as leituras em protobuf')
+    parser.add_argument('--lote', type=int, default=0,
+                        help='publica em lotes de N mensagens com confirmação do broker')
+    parser.add_argument('--intervalo', type=float, default=None,
+                        help='segundos entre leituras de cada sensor')
+    frota = parser.add_argument_group('FROTA (sensores virtuais para teste de carga)')
+    frota.add_argument('--temperatura', type=int, default=1000, help='sensores de temperatura')
+    frota.add_argument('--qualidade-ar', type=int, default=1000, help='sensores de qualidade do ar')
+    frota.add_argument('--taxa', type=float, default=1.0, help='leituras por segundo de cada sensor')
+    frota.add_argument('--conexoes', type=int, default=2, help='conexões com o broker')
+    frota.add_argument('--inicio-id', type=int, default=1, help='número do primeiro ID (TEMP00001...)')
+    frota.add_argument('--duracao', type=float, default=None, help='segundos de simulação (padrão: até Ctrl+C)')
+    args = parser.parse_args()
     
-    if len(sys.argv) < 2:
-        print("Uso: python SensoresCidade.py <TIPO> [ID]")
-        print("Tipos: TEMPERATURA, QUALIDADE_AR, TODOS")
-        print("Exemplo: python SensoresCidade.py TEMPERATURA TEMP001")
-        sys.exit(1)
+    tipo = args.tipo
+    sensor_id = args.id
+    formato = 'protobuf' if args.protobuf else None
     
-    tipo = sys.argv[1].upper()
-    sensor_id = sys.argv[2] if len(sys.argv) > 2 else None
+    if tipo == "FROTA":
+        frota = FrotaSensores(
+            temperatura=args.temperatura, qualidade_ar=args.qualidade_ar, taxa=args.taxa,
+            conexoes=args.conexoes, lote=args.lote or 200, formato=formato, inicio_id=args.inicio_id
+        )
+        print(f"🏙️  Frota: {args.temperatura} sensores de temperatura + {args.qualidade_ar} de qualidade do ar "
+              f"a {args.taxa}/s cada, em {args.conexoes} conexões (Ctrl+C para parar)")
+        estatisticas = frota.executar(args.duracao)
+        print(f"📤 Geradas: {estatisticas['geradas']} | confirmadas: {estatisticas['confirmadas']} | "
+              f"descartadas: {estatisticas['descartadas']} | {estatisticas['leituras_por_segundo']}/s")
+        return
+    
+    publicador = None
+    if args.lote:
+        publicador = PublicadorSensores(lote=args.lote)
+        publicador.iniciar()
+        if not publicador.aguardar_conexao(5):
+            print("⚠️ Broker indisponível; as leituras ficam no buffer até a conexão voltar")
     
     sensors = []
     threads = []
     
     if tipo == "TEMPERATURA" or tipo == "TODOS":
         temp_id = sensor_id or "TEMP001"
-        sensor_temp = SensorTemperatura(temp_id)
+        sensor_temp = SensorTemperatura(temp_id, formato, publicador)
+        if args.intervalo:
+            sensor_temp.intervalo = args.intervalo
         
         # Descoberta multicast
         discovery_temp = SensorMulticast(temp_id, "TEMPERATURA")
@@ -380,7 +907,9 @@ def main():
         
     if tipo == "QUALIDADE_AR" or tipo == "TODOS":
         air_id = sensor_id or "AIR001"
-        sensor_air = SensorQualidadeAr(air_id)
+        sensor_air = SensorQualidadeAr(air_id, formato, publicador)
+        if args.intervalo:
+            sensor_air.intervalo = args.intervalo
         
         # Descoberta multicast
         discovery_air = SensorMulticast(air_id, "QUALIDADE_AR")
@@ -402,8 +931,15 @@ def main():
     
     try:
         # Manter o programa rodando
+        segundos = 0
         while True:
             time.sleep(1)
+            segundos += 1
+            if publicador and segundos % 30 == 0:
+                estatisticas = publicador.estatisticas()
+                log.info('publicacao_estatisticas', "📤 Publicador: {confirmadas} confirmadas | {em_voo} em voo | {no_buffer} no buffer | latência p50/p95: {p50}/{p95} ms",
+                         confirmadas=estatisticas['confirmadas'], em_voo=estatisticas['em_voo'], no_buffer=estatisticas['no_buffer'],
+                         p50=estatisticas['latencia_confirmacao_ms']['p50'], p95=estatisticas['latencia_confirmacao_ms']['p95'])
     except KeyboardInterrupt:
         print("\n🛑 Parando sensores...")
         for sensor in sensors:
@@ -411,6 +947,13 @@ def main():
             if sensor.connection:
                 sensor.connection.close()
         
+        if publicador:
+            publicador.parar()
+            estatisticas = publicador.estatisticas()
+            print(f"📤 Confirmadas: {estatisticas['confirmadas']}/{estatisticas['aceitas']} | "
+                  f"pendentes: {estatisticas['no_buffer'] + estatisticas['em_voo']} | "
+                  f"latência p95: {estatisticas['latencia_confirmacao_ms']['p95']} ms")
+        
         print("Sensores parados com sucesso!")
 
 if __name__ == "__main__":
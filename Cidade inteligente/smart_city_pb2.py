@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10smart_city.proto\x12\nsmart_city\"\x07\n\x05Vazio\"!\n\x0c\x43onfigCamera\x12\x11\n\tresolucao\x18\x01 \x01(\t\"C\n\x0cStatusCamera\x12\x0e\n\x06ligada\x18\x01 \x01(\x08\x12\x11\n\tresolucao\x18\x02 \x01(\t\x12\x10\n\x08gravando\x18\x03 \x01(\x08\":\n\x0bStatusPoste\x12\x16\n\x0elampada_ligada\x18\x01 \x01(\x08\x12\x13\n\x0bintensidade\x18\x02 \x01(\x05\"\"\n\x0b\x43onfigPoste\x12\x13\n\x0bintensidade\x18\x01 \x01(\x05\"\x7f\n\x0eStatusSemaforo\x12\x14\n\x0c\x65stado_atual\x18\x01 \x01(\t\x12\x16\n\x0etempo_vermelho\x18\x02 \x01(\x05\x12\x13\n\x0btempo_verde\x18\x03 \x01(\x05\x12\x15\n\rtempo_amarelo\x18\x04 \x01(\x05\x12\x13\n\x0b\x66uncionando\x18\x05 \x01(\x08\"T\n\x0e\x43onfigSemaforo\x12\x16\n\x0etempo_vermelho\x18\x01 \x01(\x05\x12\x13\n\x0btempo_verde\x18\x02 \x01(\x05\x12\x15\n\rtempo_amarelo\x18\x03 \x01(\x05\":\n\x10\x44\x61\x64osTemperatura\x12\x13\n\x0btemperatura\x18\x01 \x01(\x02\x12\x11\n\ttimestamp\x18\x02 \x01(\t\"N\n\x10\x44\x61\x64osQualidadeAr\x12\x0b\n\x03\x63o2\x18\x01 \x01(\x02\x12\x0c\n\x04pm25\x18\x02 \x01(\x02\x12\x0c\n\x04pm10\x18\x03 \x01(\x02\x12\x11\n\ttimestamp\x18\x04 \x01(\t2\xdc\x02\n\x06\x43\x61mera\x12/\n\x05Ligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x32\n\x08\x44\x65sligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12=\n\x0cSetResolucao\x12\x18.smart_city.ConfigCamera\x1a\x11.smart_city.Vazio\"\x00\x12\x39\n\x0fIniciarGravacao\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x37\n\rPararGravacao\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12:\n\tgetStatus\x12\x11.smart_city.Vazio\x1a\x18.smart_city.StatusCamera\"\x00\x32\xf5\x01\n\x05Poste\x12\x36\n\x0cLigarLampada\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x39\n\x0f\x44\x65sligarLampada\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12>\n\x0eSetIntensidade\x12\x17.smart_city.ConfigPoste\x1a\x11.smart_city.Vazio\"\x00\x12\x39\n\tgetStatus\x12\x11.smart_city.Vazio\x1a\x17.smart_city.StatusPoste\"\x00\x32\xa5\x02\n\x08Semaforo\x12/\n\x05Ligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x32\n\x08\x44\x65sligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12<\n\tSetTempos\x12\x1a.smart_city.ConfigSemaforo\x1a\x11.smart_city.Vazio\"\x00\x12\x38\n\x0eModoEmergencia\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12<\n\tgetStatus\x12\x11.smart_city.Vazio\x1a\x1a.smart_city.StatusSemaforo\"\x00\x32Z\n\x11SensorTemperatura\x12\x45\n\x10getUltimaLeitura\x12\x11.smart_city.Vazio\x1a\x1c.smart_city.DadosTemperatura\"\x00\x32Z\n\x11SensorQualidadeAr\x12\x45\n\x10getUltimaLeitura\x12\x11.smart_city.Vazio\x1a\x1c.smart_city.DadosQualidadeAr\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10smart_city.proto\x12\nsmart_city\"\x07\n\x05Vazio\"!\n\x0c\x43onfigCamera\x12\x11\n\tresolucao\x18\x01 \x01(\t\"C\n\x0cStatusCamera\x12\x0e\n\x06ligada\x18\x01 \x01(\x08\x12\x11\n\tresolucao\x18\x02 \x01(\t\x12\x10\n\x08gravando\x18\x03 \x01(\x08\"z\n\x12\x45ventoStatusCamera\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\x11\n\tsequencia\x18\x02 \x01(\x04\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x03\x12(\n\x06status\x18\x04 \x01(\x0b\x32\x18.smart_city.StatusCamera\"O\n\x0bStatusPoste\x12\x16\n\x0elampada_ligada\x18\x01 \x01(\x08\x12\x13\n\x0bintensidade\x18\x02 \x01(\x05\x12\x13\n\x0bposte_ativo\x18\x03 \x01(\x08\"x\n\x11\x45ventoStatusPoste\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\x11\n\tsequencia\x18\x02 \x01(\x04\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x03\x12\'\n\x06status\x18\x04 \x01(\x0b\x32\x17.smart_city.StatusPoste\"\"\n\x0b\x43onfigPoste\x12\x13\n\x0bintensidade\x18\x01 \x01(\x05\"\x98\x01\n\x0eStatusSemaforo\x12\x14\n\x0c\x65stado_atual\x18\x01 \x01(\t\x12\x16\n\x0etempo_vermelho\x18\x02 \x01(\x05\x12\x13\n\x0btempo_verde\x18\x03 \x01(\x05\x12\x15\n\rtempo_amarelo\x18\x04 \x01(\x05\x12\x13\n\x0b\x66uncionando\x18\x05 \x01(\x08\x12\x17\n\x0fmodo_emergencia\x18\x06 \x01(\x08\"~\n\x14\x45ventoStatusSemaforo\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\x11\n\tsequencia\x18\x02 \x01(\x04\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x03\x12*\n\x06status\x18\x04 \x01(\x0b\x32\x1a.smart_city.StatusSemaforo\"T\n\x0e\x43onfigSemaforo\x12\x16\n\x0etempo_vermelho\x18\x01 \x01(\x05\x12\x13\n\x0btempo_verde\x18\x02 \x01(\x05\x12\x15\n\rtempo_amarelo\x18\x03 \x01(\x05\"b\n\x10\x44\x61\x64osTemperatura\x12\x13\n\x0btemperatura\x18\x01 \x01(\x02\x12\x11\n\ttimestamp\x18\x02 \x01(\t\x12\x11\n\tsensor_id\x18\x03 \x01(\t\x12\x13\n\x0blocalizacao\x18\x04 \x01(\t\"\x9e\x01\n\x10\x44\x61\x64osQualidadeAr\x12\x0b\n\x03\x63o2\x18\x01 \x01(\x02\x12\x0c\n\x04pm25\x18\x02 \x01(\x02\x12\x0c\n\x04pm10\x18\x03 \x01(\x02\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x11\n\tsensor_id\x18\x05 \x01(\t\x12\x13\n\x0blocalizacao\x18\x06 \x01(\t\x12\x11\n\tqualidade\x18\x07 \x01(\t\x12\x13\n\x0bnivel_risco\x18\x08 \x01(\t2\xa2\x03\n\x06\x43\x61mera\x12/\n\x05Ligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x32\n\x08\x44\x65sligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12=\n\x0cSetResolucao\x12\x18.smart_city.ConfigCamera\x1a\x11.smart_city.Vazio\"\x00\x12\x39\n\x0fIniciarGravacao\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x37\n\rPararGravacao\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12:\n\tgetStatus\x12\x11.smart_city.Vazio\x1a\x18.smart_city.StatusCamera\"\x00\x12\x44\n\x0bWatchStatus\x12\x11.smart_city.Vazio\x1a\x1e.smart_city.EventoStatusCamera\"\x00\x30\x01\x32\xba\x02\n\x05Poste\x12\x36\n\x0cLigarLampada\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x39\n\x0f\x44\x65sligarLampada\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12>\n\x0eSetIntensidade\x12\x17.smart_city.ConfigPoste\x1a\x11.smart_city.Vazio\"\x00\x12\x39\n\tgetStatus\x12\x11.smart_city.Vazio\x1a\x17.smart_city.StatusPoste\"\x00\x12\x43\n\x0bWatchStatus\x12\x11.smart_city.Vazio\x1a\x1d.smart_city.EventoStatusPoste\"\x00\x30\x01\x32\xed\x02\n\x08Semaforo\x12/\n\x05Ligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12\x32\n\x08\x44\x65sligar\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12<\n\tSetTempos\x12\x1a.smart_city.ConfigSemaforo\x1a\x11.smart_city.Vazio\"\x00\x12\x38\n\x0eModoEmergencia\x12\x11.smart_city.Vazio\x1a\x11.smart_city.Vazio\"\x00\x12<\n\tgetStatus\x12\x11.smart_city.Vazio\x1a\x1a.smart_city.StatusSemaforo\"\x00\x12\x46\n\x0bWatchStatus\x12\x11.smart_city.Vazio\x1a .smart_city.EventoStatusSemaforo\"\x00\x30\x01\x32Z\n\x11SensorTemperatura\x12\x45\n\x10getUltimaLeitura\x12\x11.smart_city.Vazio\x1a\x1c.smart_city.DadosTemperatura\"\x00\x32Z\n\x11SensorQualidadeAr\x12\x45\n\x10getUltimaLeitura\x12\x11.smart_city.Vazio\x1a\x1c.smart_city.DadosQualidadeAr\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -37,26 +37,32 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_CONFIGCAMERA']._serialized_end=74
   _globals['_STATUSCAMERA']._serialized_start=76
   _globals['_STATUSCAMERA']._serialized_end=143
-  _globals['_STATUSPOSTE']._serialized_start=145
-  _globals['_STATUSPOSTE']._serialized_end=203
-  _globals['_CONFIGPOSTE']._serialized_start=205
-  _globals['_CONFIGPOSTE']._serialized_end=239
-  _globals['_STATUSSEMAFORO']._serialized_start=241
-  _globals['_STATUSSEMAFORO']._serialized_end=368
-  _globals['_CONFIGSEMAFORO']._serialized_start=370
-  _globals['_CONFIGSEMAFORO']._serialized_end=454
-  _globals['_DADOSTEMPERATURA']._serialized_start=456
-  _globals['_DADOSTEMPERATURA']._serialized_end=514
-  _globals['_DADOSQUALIDADEAR']._serialized_start=516
-  _globals['_DADOSQUALIDADEAR']._serialized_end=594
-  _globals['_CAMERA']._serialized_start=597
-  _globals['_CAMERA']._serialized_end=945
-  _globals['_POSTE']._serialized_start=948
-  _globals['_POSTE']._serialized_end=1193
-  _globals['_SEMAFORO']._serialized_start=1196
-  _globals['_SEMAFORO']._serialized_end=1489
-  _globals['_SENSORTEMPERATURA']._serialized_start=1491
-  _globals['_SENSORTEMPERATURA']._serialized_end=1581
-  _globals['_SENSORQUALIDADEAR']._serialized_start=1583
-  _globals['_SENSORQUALIDADEAR']._serialized_end=1673
+  _globals['_EVENTOSTATUSCAMERA']._serialized_start=145
+  _globals['_EVENTOSTATUSCAMERA']._serialized_end=267
+  _globals['_STATUSPOSTE']._serialized_start=269
+  _globals['_STATUSPOSTE']._serialized_end=348
+  _globals['_EVENTOSTATUSPOSTE']._serialized_start=350
+  _globals['_EVENTOSTATUSPOSTE']._serialized_end=470
+  _globals['_CONFIGPOSTE']._serialized_start=472
+  _globals['_CONFIGPOSTE']._serialized_end=506
+  _globals['_STATUSSEMAFORO']._serialized_start=509
+  _globals['_STATUSSEMAFORO']._serialized_end=661
+  _globals['_EVENTOSTATUSSEMAFORO']._serialized_start=663
+  _globals['_EVENTOSTATUSSEMAFORO']._serialized_end=789
+  _globals['_CONFIGSEMAFORO']._serialized_start=791
+  _globals['_CONFIGSEMAFORO']._serialized_end=875
+  _globals['_DADOSTEMPERATURA']._serialized_start=877
+  _globals['_DADOSTEMPERATURA']._serialized_end=975
+  _globals['_DADOSQUALIDADEAR']._serialized_start=978
+  _globals['_DADOSQUALIDADEAR']._serialized_end=1136
+  _globals['_CAMERA']._serialized_start=1139
+  _globals['_CAMERA']._serialized_end=1557
+  _globals['_POSTE']._serialized_start=1560
+  _globals['_POSTE']._serialized_end=1874
+  _globals['_SEMAFORO']._serialized_start=1877
+  _globals['_SEMAFORO']._serialized_end=2242
+  _globals['_SENSORTEMPERATURA']._serialized_start=2244
+  _globals['_SENSORTEMPERATURA']._serialized_end=2334
+  _globals['_SENSORQUALIDADEAR']._serialized_start=2336
+  _globals['_SENSORQUALIDADEAR']._serialized_end=2426
 # @@protoc_insertion_point(module_scope)
@@ -64,6 +64,11 @@ class CameraStub(object):
                 request_serializer=smart__city__pb2.Vazio.SerializeToString,
                 response_deserializer=smart__city__pb2.StatusCamera.FromString,
                 _registered_method=True)
+        self.WatchStatus = channel.unary_stream(
+                '/smart_city.Camera/WatchStatus',
+                request_serializer=smart__city__pb2.Vazio.SerializeToString,
+                response_deserializer=smart__city__pb2.EventoStatusCamera.FromString,
+                _registered_method=True)
 
 
 class CameraServicer(object):
@@ -105,6 +110,12 @@ class CameraServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CameraServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -138,6 +149,11 @@ def add_CameraServicer_to_server(servicer, server):
                     request_deserializer=smart__city__pb2.Vazio.FromString,
                     response_serializer=smart__city__pb2.StatusCamera.SerializeToString,
             ),
+            'WatchStatus': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchStatus,
+                    request_deserializer=smart__city__pb2.Vazio.FromString,
+                    response_serializer=smart__city__pb2.EventoStatusCamera.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'smart_city.Camera', rpc_method_handlers)
@@ -311,6 +327,33 @@ class Camera(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def WatchStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/smart_city.Camera/WatchStatus',
+            smart__city__pb2.Vazio.SerializeToString,
+            smart__city__pb2.EventoStatusCamera.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class PosteStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -341,6 +384,11 @@ class PosteStub(object):
                 request_serializer=smart__city__pb2.Vazio.SerializeToString,
                 response_deserializer=smart__city__pb2.StatusPoste.FromString,
                 _registered_method=True)
+        self.WatchStatus = channel.unary_stream(
+                '/smart_city.Poste/WatchStatus',
+                request_serializer=smart__city__pb2.Vazio.SerializeToString,
+                response_deserializer=smart__city__pb2.EventoStatusPoste.FromString,
+                _registered_method=True)
 
 
 class PosteServicer(object):
@@ -370,6 +418,12 @@ class PosteServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_PosteServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -393,6 +447,11 @@ def add_PosteServicer_to_server(servicer, server):
                     request_deserializer=smart__city__pb2.Vazio.FromString,
                     response_serializer=smart__city__pb2.StatusPoste.SerializeToString,
             ),
+            'WatchStatus': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchStatus,
+                    request_deserializer=smart__city__pb2.Vazio.FromString,
+                    response_serializer=smart__city__pb2.EventoStatusPoste.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'smart_city.Poste', rpc_method_handlers)
@@ -512,6 +571,33 @@ class Poste(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def WatchStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/smart_city.Poste/WatchStatus',
+            smart__city__pb2.Vazio.SerializeToString,
+            smart__city__pb2.EventoStatusPoste.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class SemaforoStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -547,6 +633,11 @@ class SemaforoStub(object):
                 request_serializer=smart__city__pb2.Vazio.SerializeToString,
                 response_deserializer=smart__city__pb2.StatusSemaforo.FromString,
                 _registered_method=True)
+        self.WatchStatus = channel.unary_stream(
+                '/smart_city.Semaforo/WatchStatus',
+                request_serializer=smart__city__pb2.Vazio.SerializeToString,
+                response_deserializer=smart__city__pb2.EventoStatusSemaforo.FromString,
+                _registered_method=True)
 
 
 class SemaforoServicer(object):
@@ -582,6 +673,12 @@ class SemaforoServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_SemaforoServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -610,6 +707,11 @@ def add_SemaforoServicer_to_server(servicer, server):
                     request_deserializer=smart__city__pb2.Vazio.FromString,
                     response_serializer=smart__city__pb2.StatusSemaforo.SerializeToString,
             ),
+            'WatchStatus': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchStatus,
+                    request_deserializer=smart__city__pb2.Vazio.FromString,
+                    response_serializer=smart__city__pb2.EventoStatusSemaforo.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'smart_city.Semaforo', rpc_method_handlers)
@@ -756,6 +858,33 @@ class Semaforo(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def WatchStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/smart_city.Semaforo/WatchStatus',
+            smart__city__pb2.Vazio.SerializeToString,
+            smart__city__pb2.EventoStatusSemaforo.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class SensorTemperaturaStub(object):
     """Serviços de sensores (se necessário para status)